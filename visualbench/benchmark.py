@@ -3,7 +3,7 @@ import time
 import warnings
 from abc import ABC, abstractmethod
 from collections import defaultdict
-from collections.abc import Iterable, Callable, Sequence
+from collections.abc import Iterable, Iterator, Callable, Sequence
 from typing import Any, Literal, final
 
 import numpy as np
@@ -12,7 +12,8 @@ import torch
 from . import utils
 from .logger import Logger
 from .rng import RNG
-from .utils import _benchmark_utils, plt_tools, python_tools, torch_tools, _benchmark_plotting, _benchmark_video
+from .utils import _benchmark_utils, plt_tools, python_tools, _benchmark_plotting, _benchmark_video, _benchmark_profiling, _benchmark_flat, _benchmark_images, _benchmark_trajectory, _benchmark_noise, _benchmark_testing, _benchmark_checkpoint, _benchmark_best, _benchmark_memory
+from .utils._benchmark_projections import ProjectionEngine
 from .utils.autograd_counter import AutogradCounter
 
 #class StopCondition(BaseException): pass
@@ -43,6 +44,9 @@ class Benchmark(torch.nn.Module, ABC):
         self._dltest: Iterable | None = dltest
         self._param_noise_alpha: float = param_noise
         self._grad_noise_alpha: float = grad_noise
+        self._regenerate_noise: bool = False
+        self._param_noise_buffers: dict[tuple[torch.device, torch.dtype], torch.Tensor] = {}
+        self._grad_noise_buffers: dict[tuple[torch.device, torch.dtype], torch.Tensor] = {}
         self._log_params: bool | None = log_params
         self._num_projections: int = num_projections
         self._seed: int | None | RNG = seed
@@ -62,18 +66,47 @@ class Benchmark(torch.nn.Module, ABC):
         self._plot_keys: python_tools.SortedSet[str] = python_tools.SortedSet()
         """keys to display line charts for"""
 
-        self._basis: torch.Tensor | None = None
+        self._projection_engine: ProjectionEngine = 'bernoulli'
+        self._projector: Callable[[torch.Tensor], torch.Tensor] | None = None
         self._print_interval_s: float | None = 0.1
         self._print_timeout: bool = False
         self._plot_perturbed: bool = False
         self._benchmark_mode: bool = False
         self._show_titles_on_video: bool = True
+        self._deferred_chunk_size: int | None = None
+        self._profiler: _benchmark_profiling.Profiler = _benchmark_profiling.Profiler()
+        self._profiling: bool = False
+        self._exclude_overhead: bool = False
+        self._update_profiler()
+        self._flat_params: bool = False
+        self._flat_x: torch.Tensor | None = None
+        self._flat_grad: torch.Tensor | None = None
+        self._vmap_supported: bool | None = None
+        self._image_worker: _benchmark_images.ImageWorker | None = None
+        self._image_budget: int | None = None
+        self._image_schedule: Literal['linear', 'log'] = 'linear'
+        self._deferred_images: bool = False
+        self._trajectory: _benchmark_trajectory.TrajectoryRecorder | None = None
+        self._test_worker: _benchmark_images.ImageWorker | None = None
+        self._test_shadow: "list[Benchmark]" = [] # in a list so that it isn't registered as a submodule
+        self._checkpoint_path: str | None = None
+        self._checkpoint_every_steps: int | None = None
+        self._checkpoint_every_seconds: float | None = None
+        self._run_kwargs: dict[str, Any] = {}
+        self._compiled_get_loss: Callable | None = None
+        self._best_states: dict[str, _benchmark_best.BestState] = {}
+        self._memory_accounting: bool = False
 
         self.reset()
 
     @torch.no_grad
     def reset(self):
+        # workers may still be writing to the old logger
+        _benchmark_images._join_images_(self)
+        _benchmark_testing._join_tests_(self)
         self.rng: RNG = RNG(self._seed)
+        self._rng_step: int = 0
+        """number of training ``pre_step`` calls, counter for ``step_rng``"""
 
         # --------------------------------- trackers --------------------------------- #
         self.num_forwards: int = 0
@@ -86,10 +119,17 @@ class Benchmark(torch.nn.Module, ABC):
         self.num_steps: int = 0
         self.num_epochs: int = 0
         self.start_time: float | None = None
+        self._category_totals_at_start: dict[str, float] = {}
         self._current_time: float = time.time()
         self._last_train_loss: float | None = None
         self._last_test_loss: float | None = None
         self._last_print_time: float = 0
+        self._last_checkpoint_time: float = time.time()
+        self._epoch_start_step: int = 0
+        self._skip_batches: int = 0 # batches of interrupted epoch which were done before checkpoint
+        self._dltrain_state: Any = None # state of dataloader shuffling at the start of run
+        self._epoch_rng_state: torch.Tensor | None = None # state of global torch generator at the start of epoch
+        self._resume_batches: Iterator | None = None # remaining batches of interrupted epoch
         self.batch = None
 
         # ------------------------------ stop conditions ----------------------------- #
@@ -113,11 +153,16 @@ class Benchmark(torch.nn.Module, ABC):
         self._test_other_metrics: dict[str, Any] = {}
         self._previous_images: dict[str, torch.Tensor | np.ndarray] = {} # for logging differences
         self._is_perturbed = False
+        self._deferred_metrics: dict[str, tuple[torch.Tensor, list[int]]] = {} # metric: (on-device buffer, steps)
+        self._profiler.clear()
+        _benchmark_images._reset_frames_(self)
+        if self._trajectory is not None: self._trajectory.clear()
+        for state in self._best_states.values(): state.clear()
 
-        # restore original parameters on reset
-        if self._initial_state_dict is not None:
-            self.load_state_dict(utils.torch_tools.copy_state_dict(self._initial_state_dict, device=self.device), assign=True)
+        # restore original parameters on reset, parameters and buffers are updated in place
+        if self._initial_state_dict is not None: _benchmark_utils._restore_initial_state_dict_(self)
 
+        if self._flat_params: _benchmark_flat._flatten_(self)
         return self
 
     @property
@@ -131,8 +176,12 @@ class Benchmark(torch.nn.Module, ABC):
 
     @property
     def seconds_passed(self):
+        """seconds since timer started, if ``set_exclude_overhead`` was called,
+        this excludes framework overhead (logging, images, test epochs, callbacks)."""
         if self.start_time is None: return None
-        return self._current_time - self.start_time
+        seconds = self._current_time - self.start_time
+        if self._exclude_overhead: seconds -= _benchmark_profiling._category_seconds(self, 'framework')
+        return seconds
 
     @property
     def ndim(self):
@@ -143,9 +192,19 @@ class Benchmark(torch.nn.Module, ABC):
     def lowest_loss(self):
         return float(self.logger.min("train loss"))
 
-    def set_noise(self, p: float | None = None, g: float | None = None):
+    def set_noise(self, p: float | None = None, g: float | None = None, regenerate: bool | None = None):
+        """Sets magnitude of parameter noise ``p`` and gradient noise ``g``. Noise is redrawn on each step
+        into a flat buffer for parameters and one for gradients.
+
+        Noise is drawn from ``rng.stream`` keyed by the number of steps, so it doesn't depend on other random calls.
+        If ``regenerate`` is True, noise is not stored and instead is regenerated each time it is applied,
+        so noisy benchmarks don't use more memory than noiseless ones. Noise is the same in both modes."""
         if p is not None: self._param_noise_alpha = p
         if g is not None: self._grad_noise_alpha = g
+        if regenerate is not None:
+            self._regenerate_noise = regenerate
+            self._param_noise_buffers.clear()
+            self._grad_noise_buffers.clear()
         return self
 
     def set_print_inverval(self, s: float | None = None):
@@ -156,8 +215,19 @@ class Benchmark(torch.nn.Module, ABC):
         self._log_params = enable
         return self
 
-    def set_num_projections(self, num_projections: int):
+    def set_num_projections(self, num_projections: int, engine: ProjectionEngine = 'bernoulli'):
+        """Logs ``num_projections`` random projections of parameters each forward pass for plotting trajectories.
+
+        Engines:
+            - ``'bernoulli'`` - dense basis of complementary bernoulli masks, O(k·ndim) memory and time per step.
+            - ``'sparse'`` - CountSketch, each parameter is added with a random sign to one projection, O(ndim).
+            - ``'srht'`` - subsampled randomized Hadamard transform, O(ndim) memory and O(ndim·log(ndim)) time.
+            - ``'seeded'`` - random sign basis regenerated from a seed in chunks, never stored, O(k·ndim) time.
+        """
+        if engine not in ('bernoulli', 'sparse', 'srht', 'seeded'): raise ValueError(f"unknown projection engine {engine}")
         self._num_projections = num_projections
+        self._projection_engine = engine
+        self._projector = None
         return self
 
     def set_plot_perturbed(self, enable: bool = True):
@@ -173,6 +243,188 @@ class Benchmark(torch.nn.Module, ABC):
         self._make_images = not enable
         return self
 
+    def set_deferred_metrics(self, enable: bool = True, chunk_size: int = 256):
+        """If enabled, scalar tensor metrics logged while training, including the loss, are written to a preallocated
+        on-device buffer and flushed to the logger every ``chunk_size`` forward passes, avoiding a device->host sync
+        on every closure evaluation. Stop conditions that depend on the loss (``target_loss``) are checked
+        at flush boundaries. The buffer is always flushed at the end of ``run``."""
+        if not enable: _benchmark_utils._flush_deferred_metrics_(self)
+        self._deferred_chunk_size = chunk_size if enable else None
+        return self
+
+    def set_flat_params(self, enable: bool = True):
+        """If enabled, all trainable parameters and their gradients are stored as views into two contiguous buffers,
+        so ``get_x0``, ``loss_at`` and ``loss_grad_at`` don't need to concatenate and split parameters and gradients,
+        and ``flat_params`` and ``flat_grad`` return them without copying.
+        All trainable parameters must be on the same device and have the same dtype.
+
+        Gradients are zeroed in place instead of being set to None. If something replaces the parameters
+        (e.g. ``.to``) or their gradients, they are flattened again on the next evaluation."""
+        self._flat_params = enable
+        if enable: _benchmark_flat._flatten_(self)
+        else: self._flat_x = self._flat_grad = None
+        return self
+
+    def set_async_images(self, enable: bool = True, max_queue: int = 64):
+        """If enabled, images passed to ``log_image`` are converted, normalized and written to the logger on a background thread.
+        Tasks can pass a function which draws the frame instead of an image, so drawing also happens on the worker.
+        If the worker falls ``max_queue`` images behind, ``log_image`` blocks until it catches up.
+
+        Images are waited for at the end of ``run``, and before ``render`` and ``plot_summary``."""
+        _benchmark_images._join_images_(self)
+        self._image_worker = _benchmark_images.ImageWorker(max_queue) if enable else None
+        return self
+
+    def set_image_budget(self, max_frames: int | None = 600, schedule: Literal['linear', 'log'] = 'linear'):
+        """Limits number of steps on which images are logged during training to ``max_frames``,
+        on other steps ``make_images`` is disabled during ``get_loss``.
+
+        With ``'linear'`` schedule images are logged every k-th step, with ``'log'`` schedule interval between
+        frames grows with number of steps so that there are more frames in the beginning.
+        Whenever number of frames exceeds ``max_frames``, every other frame is removed and the interval is doubled.
+
+        Images with ``show_best=True`` are still made on every step when there are any,
+        and kept if loss improved, so that best image is always available. Only one such image is kept between
+        each two frames, so in that case, and with ``set_deferred_images``, frames get half of ``max_frames``,
+        and each image key has at most ``max_frames`` images. If ``max_frames`` is None, the budget is disabled."""
+        if schedule not in ('linear', 'log'): raise ValueError(f"schedule must be 'linear' or 'log', got {schedule}")
+        self._image_budget = max_frames
+        self._image_schedule = schedule
+        _benchmark_images._reset_frames_(self)
+        return self
+
+    def set_deferred_images(self, enable: bool = True):
+        """If enabled, ``log_param_images`` is not called during training, instead a copy of trainable parameters is stored
+        on steps where images would be logged (all steps, or frames if ``set_image_budget`` is used) and on steps where loss improved.
+        Images are made from the snapshots when ``render`` or ``plot_summary`` is called.
+
+        Snapshots are kept on the same device as parameters, so using an image budget is recommended."""
+        self._deferred_images = enable
+        return self
+
+    def set_async_test(self, enable: bool = True):
+        """If enabled, test epochs run on a background thread on a copy of the benchmark while training continues,
+        on CUDA they also run on a separate stream. Parameters and buffers are copied into the copy when test epoch
+        would start, and test metrics are logged at that step. Time spent in test epochs doesn't count towards ``seconds``
+        even without ``set_exclude_overhead``.
+
+        Only one test epoch runs at a time, if next one is due before previous one finished, training waits for it.
+        Test epochs are waited for at the end of ``run``. Stop conditions based on test loss use loss from last finished test epoch."""
+        _benchmark_testing._join_tests_(self)
+        self._test_worker = _benchmark_images.ImageWorker(max_queue=1) if enable else None
+        self._test_shadow = []
+        return self
+
+    def set_compile(self, enable: bool = True, mode: str | None = None, **compile_kwargs):
+        """If enabled, ``get_loss`` is compiled with ``torch.compile``, ``log`` and ``log_image`` always run eagerly
+        (they cause graph breaks), and ``log_param_images`` is not compiled.
+
+        Compilation happens on first evaluations, which are not counted towards ``seconds`` as timer starts after 2nd forward pass.
+        The compiled function persists through ``reset`` since parameters are restored in place, so it doesn't need
+        to be recompiled on subsequent runs. It is also shared with copies of the benchmark."""
+        self._compiled_get_loss = None
+        if enable:
+            # compiling unbound method so that it isn't tied to this instance and works on copies
+            self._compiled_get_loss = torch.compile(type(self).get_loss, mode=mode, **compile_kwargs)
+        return self
+
+    def set_checkpointing(self, path: str | None, every_steps: int | None = None, every_seconds: float | None = 600):
+        """If ``path`` is not None, during ``run`` a checkpoint is written to ``path`` every ``every_steps`` steps
+        and/or every ``every_seconds`` seconds. The checkpoint has parameters and buffers, optimizer state dict, logger,
+        random generator states, counters and ``run`` arguments, it is written to a temporary file and then renamed
+        so that interrupting while writing doesn't corrupt previous checkpoint. Use ``resume`` to continue the run.
+        Trajectory recorder is not saved, so a run with it enabled can't be resumed."""
+        self._checkpoint_path = path
+        self._checkpoint_every_steps = every_steps
+        self._checkpoint_every_seconds = every_seconds
+        self._last_checkpoint_time = time.time()
+        return self
+
+    def save_checkpoint(self, path: str, optimizer: torch.optim.Optimizer | None = None):
+        """writes a checkpoint to ``path``, see ``set_checkpointing``"""
+        _benchmark_checkpoint.save_checkpoint(self, path, optimizer)
+        return self
+
+    def resume(
+        self,
+        path: str,
+        optimizer: torch.optim.Optimizer,
+        step_callbacks: "Callable[[Benchmark], Any] | Sequence[Callable[[Benchmark], Any]] | None" = None,
+    ):
+        """Loads a checkpoint written by ``set_checkpointing`` and continues the run with same arguments.
+        This benchmark has to be created same way as the one that was checkpointed, and ``optimizer`` has to be created
+        on parameters of this benchmark. Step callbacks are not saved in checkpoints so they have to be passed again."""
+        run_kwargs = _benchmark_checkpoint.load_checkpoint_(self, path, optimizer)
+        return self.run(optimizer, **run_kwargs, step_callbacks=step_callbacks)
+
+    def set_trajectory_recorder(
+        self,
+        enable: bool = True,
+        dtype: Any = np.float16,
+        stride: int = 1,
+        subsample: int | None = None,
+        directory: str | None = None,
+    ):
+        """If enabled, parameter vectors are written to a memory-mapped file on disk instead of the logger,
+        so that ``plot_trajectory`` and ``best_params`` work for models with millions of parameters.
+        ``plot_trajectory`` fits PCA incrementally by reading the file in chunks.
+
+        Args:
+            dtype (Any): dtype of stored values. Defaults to float16.
+            stride (int): records every ``stride``-th train forward pass. Defaults to 1.
+            subsample (int | None): if not None, only records this many randomly chosen coordinates,
+                ``best_params`` then can't be used. Defaults to None.
+            directory (str | None): directory for the file, if None uses default temporary directory.
+                The file is removed on ``reset`` and when the benchmark is garbage collected.
+        """
+        if self._trajectory is not None: self._trajectory.clear()
+        self._trajectory = None
+        if enable: self._trajectory = _benchmark_trajectory.TrajectoryRecorder(dtype=dtype, stride=stride, subsample=subsample, directory=directory)
+        return self
+
+    def set_profiling(self, enable: bool = True, memory: bool = False):
+        """If enabled, time spent in each phase of a step (``get_loss``, ``backward``, ``optimizer``, ``images``, ``logging``,
+        ``test epoch``, etc) is measured and logged as ``time/{phase}`` metrics (cumulative seconds).
+        Time of nested phases is not counted towards the outer phase, so ``optimizer`` is time spent
+        in ``optimizer.step`` excluding closure evaluations.
+
+        If ``memory`` is True, also records peak allocations per phase via ``tracemalloc`` (and CUDA memory stats if available),
+        note that ``tracemalloc`` makes everything slower.
+
+        Use ``profiling_table`` to get a table with totals."""
+        self._profiling = enable
+        self._profiler.memory = memory
+        self._update_profiler()
+        return self
+
+    def set_memory_accounting(self, enable: bool = True):
+        """If enabled, at the end of each run logs peak resident set size of the process, peak CUDA memory allocated by torch
+        (if CUDA is available), total size of tensors in optimizer state and size of the logger, all in megabytes,
+        as ``memory/peak rss``, ``memory/peak cuda``, ``memory/optimizer state`` and ``memory/logger`` metrics.
+        Since they are logged, they are saved to run stats and can be compared between runs like any other metric.
+
+        Peak RSS is reset at the start of each run on Linux, on other platforms it is peak of the whole process."""
+        self._memory_accounting = enable
+        return self
+
+    def set_exclude_overhead(self, enable: bool = True):
+        """If enabled, time spent on framework side (logging, images, test epochs, callbacks) is excluded
+        from ``seconds`` metric and ``max_seconds`` budget. Time spent in objective (``get_loss``, ``backward``, ``pre_step``)
+        and in optimizer is also logged separately to ``objective seconds`` and ``optimizer seconds``.
+
+        This enables the profiler, which adds a few microseconds per phase. Disabled by default so that ``seconds``
+        means wall time as in runs saved before this option existed, don't compare ``seconds`` between runs with and without it."""
+        self._exclude_overhead = enable
+        self._update_profiler()
+        return self
+
+    def _update_profiler(self):
+        self._profiler.enabled = self._profiling or self._exclude_overhead
+
+    def profiling_table(self) -> str:
+        """returns a table with time spent in each phase, requires ``set_profiling`` to be enabled before running."""
+        return self._profiler.table()
+
     def set_multiobjective(self, multiobjective: bool = True):
         self._multiobjective = multiobjective
         return self
@@ -181,9 +433,42 @@ class Benchmark(torch.nn.Module, ABC):
         self._multiobjective_func = func
         return self
 
+    def set_track_best(self, metrics: str | Sequence[str] | None = "train loss", maximize: bool = False):
+        """Keeps a copy of trainable parameters where best value of each of ``metrics`` was reached in a buffer on the same device,
+        it is updated in place only when the metric improves. ``best_params`` then uses it, so it works for any number of parameters
+        without logging them. Can be called multiple times to track metrics with different ``maximize``, None removes all tracked metrics.
+
+        Metrics must be scalars logged while training (e.g. ``"train loss"``), or test metrics (e.g. ``"test loss"``).
+        In deferred metrics mode the comparison happens on device, so parameters are copied on every forward pass but there is no sync."""
+        if metrics is None:
+            self._best_states.clear()
+            return self
+        if isinstance(metrics, str): metrics = [metrics]
+        for metric in metrics: self._best_states[metric] = _benchmark_best.BestState(maximize)
+        return self
+
     def best_params(self, metric:str = "train loss", maximize:bool=False):
-        if maximize: v = self.logger.closest(metric, self.logger.stepmax(metric))
-        else: v = self.logger.closest("params", self.logger.stepmin(metric))
+        _benchmark_testing._join_tests_(self)
+        state = self._best_states.get(metric, None)
+        best_step = state.best_step() if state is not None else None
+        if state is not None and state.maximize == maximize and state.params is not None and best_step is not None and best_step >= 0:
+            params = [p.detach().clone().cpu() for p in self.parameters()]
+            torch.nn.utils.vector_to_parameters(state.params.cpu(), [p for p, q in zip(params, self.parameters()) if q.requires_grad])
+            return params
+
+        recorded = self._trajectory is not None and len(self._trajectory) != 0
+        if not (recorded or "params" in self.logger):
+            raise RuntimeError(f"{metric} never improved or its best parameters weren't recorded, "
+                               "use `set_track_best`, `set_log_params` or `set_trajectory_recorder`")
+
+        step = self.logger.stepmax(metric) if maximize else self.logger.stepmin(metric)
+        if recorded:
+            assert self._trajectory is not None
+            if self._trajectory.subsample is not None and self._trajectory.subsample < self.ndim:
+                raise RuntimeError("best_params can't be used when trajectory recorder subsamples parameters")
+            v = torch.from_numpy(self._trajectory.closest(step))
+        else:
+            v = self.logger.closest("params", step)
 
         params = [p.detach().clone().cpu() for p in self.parameters()]
         torch.nn.utils.vector_to_parameters(v, params)
@@ -211,6 +496,7 @@ class Benchmark(torch.nn.Module, ABC):
             raise RuntimeError(f"Reference image needs to be in uint8 dtype, or to_uint8 needs to be True, got {image.dtype}")
         self._reference_images[name] = image.cpu()
 
+    @torch.compiler.disable
     @torch.no_grad
     def log(self, metric: str, value: Any, plot: bool = True):
         """
@@ -236,11 +522,18 @@ class Benchmark(torch.nn.Module, ABC):
         if plot:
             self._plot_keys.add(_benchmark_utils._remove_prefix(metric))
 
+        if self.training and self._deferred_chunk_size is not None and isinstance(value, torch.Tensor) and value.numel() == 1:
+            if not metric.startswith(('train ', 'test ')): metric = f'train {metric}'
+            if metric in self._best_states: _benchmark_best._update_best_(self, metric, value)
+            _benchmark_utils._defer_metric_(self, metric, value)
+            return
+
         if isinstance(value, torch.Tensor): value = value.detach().cpu()
         value = utils.format.maybe_tofloat(value)
 
         if self.training:
             if not metric.startswith(('train ', 'test ')): metric = f'train {metric}'
+            if metric in self._best_states: _benchmark_best._update_best_(self, metric, value)
             self.logger.log(self.num_forwards, metric, value)
 
         else:
@@ -249,6 +542,7 @@ class Benchmark(torch.nn.Module, ABC):
             if utils.format.is_scalar(value): self._test_scalar_metrics[metric].append(value)
             else: self._test_other_metrics[metric] = value
 
+    @torch.compiler.disable
     @torch.no_grad
     def log_image(
         self,
@@ -264,7 +558,9 @@ class Benchmark(torch.nn.Module, ABC):
 
         Args:
             name (str): name of the image
-            image (np.ndarray | torch.Tensor): image
+            image (np.ndarray | torch.Tensor | Callable):
+                image, or a function with no arguments which returns the image. With ``set_async_images``
+                the function is called on the worker thread, so it shouldn't depend on parameters that will be modified.
             to_uint8 (bool): if True, image will be normalized and converted to uin8. Otherwise it has to already be in uint8. Defaults to False.
             min (float | None, optional):
                 only if to_uint8=True, defines minimal value, if None this is calculated as image.min(). Defaults to None.
@@ -277,6 +573,10 @@ class Benchmark(torch.nn.Module, ABC):
             show_best (DisplayType | None, optional):
                 if enabled, will add a display of the image corresponding to the best loss so far.
         """
+        with self._profiler.phase('images'):
+            self._log_image(name=name, image=image, to_uint8=to_uint8, min=min, max=max, log_difference=log_difference, show_best=show_best)
+
+    def _log_image(self, name: str, image, to_uint8: bool, min, max, log_difference: bool, show_best: bool):
         if not self._make_images: warnings.warn(f'logging image {name} with make_images=False')
         if self._benchmark_mode: warnings.warn(f'logging image {name} in BENCHMARK_MODE')
         if self._is_perturbed:
@@ -284,36 +584,46 @@ class Benchmark(torch.nn.Module, ABC):
             log_difference=False; show_best=False
 
         self._image_keys.add(name)
+        if log_difference: self._image_keys.add(f'{name} (difference)')
         if show_best: self._image_lowest_keys.add(name)
 
-        if not to_uint8:
-            if image.dtype not in (np.uint8, torch.uint8):
-                raise RuntimeError(f"image needs to be in uint8 dtype, or to_uint8 needs to be True, got {image.dtype}")
         if (not to_uint8) and (min is not None or max is not None): raise RuntimeError("min and max are only for to_uint8=True")
 
-        if isinstance(image, torch.Tensor): image = image.detach().cpu().clone()
+        # on steps that are not frames only show_best images are kept, and only if loss improved
+        if self._pending_best_images is not None:
+            if isinstance(image, torch.Tensor): image = image.detach().clone()
+            if show_best: self._pending_best_images.append((name, image, to_uint8, min, max, False))
+            return
 
-        # difference
-        k = difference = None
-        if log_difference:
-            k = f'{name} (difference)'
+        if self._image_worker is None:
+            if callable(image): image = image()
+            if isinstance(image, torch.Tensor): image = image.detach().cpu().clone()
+            _benchmark_images._process_image_(self, self.num_forwards, name, image, to_uint8, min, max, log_difference)
+            return
+
+        # tensor is copied on its device, worker moves it to cpu
+        if isinstance(image, torch.Tensor): image = image.detach().clone()
 
-            if name not in self._previous_images: difference = image
-            else: difference = self._previous_images[name] - image
+        # create histories here so that the worker doesn't add keys to the logger
+        if name not in self.logger: self.logger[name] = {}
+        if log_difference and f'{name} (difference)' not in self.logger: self.logger[f'{name} (difference)'] = {}
 
-            self._previous_images[name] = image
-            if to_uint8: difference = utils.format.normalize_to_uint8(difference)
+        self._image_worker.submit(
+            _benchmark_images._process_image_, self, self.num_forwards, name, image, to_uint8, min, max, log_difference
+        )
 
-        # value
-        if to_uint8:
-            image = utils.format.normalize_to_uint8(image, min=min, max=max)
+    def log_param_images(self):
+        """Override to log images that only depend on parameters (and constant buffers) with ``log_image``.
 
-        self.logger.log(self.num_forwards, name, image)
+        This is called after ``get_loss`` on training steps when images are enabled.
+        With ``set_deferred_images`` it is instead called when ``render`` or ``plot_summary`` is called,
+        with parameters set to each stored snapshot."""
 
-        # log difference after image so that order is better
-        if (k is not None) and (difference is not None):
-            self._image_keys.add(k)
-            self.logger.log(self.num_forwards, k, difference)
+    def step_rng(self, name: str, device: Any = None) -> torch.Generator:
+        """Generator for sampling in ``pre_step``, seeded from benchmark seed, ``name`` and number of training steps,
+        so samples don't depend on order of execution and are the same in sequential, batched and resumed runs.
+        During test epochs it returns same generator as on the last training step."""
+        return self.rng.stream(name, self._rng_step, device)
 
     def pre_step(self):
         pass
@@ -328,41 +638,62 @@ class Benchmark(torch.nn.Module, ABC):
         # store initial state dict on 1st step
         # this also gets called at the beginning of run to make time more accurate
         # but this is for when function is evaluated manually
-        if self._initial_state_dict is None:
-            _benchmark_utils._update_noise_(self)
-            self._initial_state_dict = torch_tools.copy_state_dict(self.state_dict(), device='cpu')
+        if self._initial_state_dict is None: _benchmark_utils._store_initial_state_dict_(self)
 
         # terminate if stop condition reached
         if self.training:
             msg = _benchmark_utils._should_stop(self)
             if msg is not None: raise StopCondition(msg)
-            if self._is_perturbed: _benchmark_utils._add_param_noise_(self, sub=False)
+            if self._is_perturbed: _benchmark_noise._add_param_noise_(self, sub=False)
+
+        # with image budget images are only made on some steps
+        make_images = self._make_images
+        if make_images and self._image_budget is not None and self.training:
+            if not (_benchmark_images._is_frame_step(self) and _benchmark_images._add_frame_step_(self)):
+                if len(self._image_lowest_keys) != 0: self._pending_best_images = []
+                else: self._make_images = False
 
         # get loss and log it
-        with torch.enable_grad():
-            ret = self.get_loss()
-            if ret.numel() > 1:
-                if self._multiobjective_func is None:
-                    raise RuntimeError(f"{self.__class__.__name__} returned multiple values but multiobjective "
-                                       "function is not set. Add `self.set_multiobjective_func` to `__init__`.")
-                loss = self._multiobjective_func(ret)
-            else: loss = ret
-
-        cpu_loss = utils.format.tofloat(loss)
-        self.log('loss', cpu_loss)
+        try:
+            with torch.enable_grad(), self._profiler.phase('get_loss'):
+                ret = self.get_loss() if self._compiled_get_loss is None else self._compiled_get_loss(self)
+                if ret.numel() > 1:
+                    if self._multiobjective_func is None:
+                        raise RuntimeError(f"{self.__class__.__name__} returned multiple values but multiobjective "
+                                           "function is not set. Add `self.set_multiobjective_func` to `__init__`.")
+                    loss = self._multiobjective_func(ret)
+                else: loss = ret
+
+            if self._make_images and self.training and not self._deferred_images:
+                with self._profiler.phase('images'): self.log_param_images()
+        finally:
+            self._make_images = make_images
+            pending_images = self._pending_best_images
+            self._pending_best_images = None
+
+        # in deferred mode loss stays on device and _last_train_loss is updated when metrics are flushed
+        deferred = self.training and self._deferred_chunk_size is not None
+        with self._profiler.phase('logging'):
+            cpu_loss = loss if deferred else utils.format.tofloat(loss)
+            self.log('loss', cpu_loss)
 
         if self._is_perturbed:
-            _benchmark_utils._add_param_noise_(self, sub=True)
+            _benchmark_noise._add_param_noise_(self, sub=True)
             if self._multiobjective: return ret
             return loss
 
         if self.training:
-            self._last_train_loss = cpu_loss
+            if not deferred: self._last_train_loss = cpu_loss
+            if make_images and self._image_budget is not None:
+                with self._profiler.phase('images'): _benchmark_images._update_best_images_(self, cpu_loss, pending_images)
+            if make_images and self._deferred_images:
+                is_frame = self._image_budget is None or (len(self._frame_steps) != 0 and self._frame_steps[-1] == self.num_forwards)
+                with self._profiler.phase('images'): _benchmark_images._snapshot_params_(self, cpu_loss, is_frame)
 
             # start timer right after forward pass before 3rd optimizer step to let things compile and warm up.
             # plus it runs the 1st test epoch
             if self.num_forwards == 2:
-                self.start_time = time.time()
+                _benchmark_profiling._start_timer_(self)
 
         else:
             self._last_test_loss = cpu_loss
@@ -375,7 +706,7 @@ class Benchmark(torch.nn.Module, ABC):
         """post closure logic that must be called by closure, but that way any custom closure can be used like
         gauss newton one as long as it calls this before returning whatever it returns."""
         if backward:
-            _benchmark_utils._add_grad_noise_(self)
+            _benchmark_noise._add_grad_noise_(self)
 
         if self._is_perturbed:
             if backward: self.num_backwards += 1 # num_forwards incremented by closure(False)
@@ -387,11 +718,17 @@ class Benchmark(torch.nn.Module, ABC):
         self._current_time = time.time()
         if self.training:
             # log params (conditons are in the method)
-            _benchmark_utils._log_params_and_projections_(self)
-
-            self.logger.log(self.num_forwards, "seconds", self.seconds_passed if self.seconds_passed is not None else 0)
-            self.logger.log(self.num_forwards, "num passes", self.num_passes)
-            self.logger.log(self.num_forwards, "num batches", self.num_steps)
+            with self._profiler.phase('params'):
+                _benchmark_utils._log_params_and_projections_(self)
+
+            with self._profiler.phase('logging'):
+                self.logger.log(self.num_forwards, "seconds", self.seconds_passed if self.seconds_passed is not None else 0)
+                self.logger.log(self.num_forwards, "num passes", self.num_passes)
+                self.logger.log(self.num_forwards, "num batches", self.num_steps)
+                if self._exclude_overhead:
+                    self.logger.log(self.num_forwards, "objective seconds", _benchmark_profiling._category_seconds(self, 'objective'))
+                    self.logger.log(self.num_forwards, "optimizer seconds", _benchmark_profiling._category_seconds(self, 'optimizer'))
+                if self._profiling: _benchmark_profiling._log_profiling_(self)
 
             # this runs before first num forwards is incremented
             # so it usually on 1st step as 0%x = 0
@@ -403,14 +740,17 @@ class Benchmark(torch.nn.Module, ABC):
             self.num_forwards += 1
             if backward: self.num_backwards += 1
 
-        if self._print_interval_s is not None: _benchmark_utils._print_progress_(self)
+        if self._print_interval_s is not None:
+            with self._profiler.phase('logging'): _benchmark_utils._print_progress_(self)
 
     def closure(self, backward=True, retain_graph=None, create_graph=False) -> torch.Tensor:
 
         if backward:
-            self.zero_grad()
+            if self._flat_params: _benchmark_flat._zero_grad_(self)
+            else: self.zero_grad()
             loss = self.forward()
-            loss.backward(retain_graph=retain_graph, create_graph=create_graph)
+            with self._profiler.phase('backward'):
+                loss.backward(retain_graph=retain_graph, create_graph=create_graph)
         else:
             loss = self.forward()
 
@@ -419,46 +759,102 @@ class Benchmark(torch.nn.Module, ABC):
         return loss
 
     def get_x0(self):
+        if self._flat_params: return self.flat_params().clone()
         return torch.nn.utils.parameters_to_vector(p for p in self.parameters() if p.requires_grad)
 
-    def loss_at(self, x: Any):
+    @torch.no_grad
+    def _set_x_(self, x: Any):
         xt = utils.totensor(x, device=self.device, dtype=self.dtype)
-        torch.nn.utils.vector_to_parameters(xt, (p for p in self.parameters() if p.requires_grad))
+        if self._flat_params:
+            flat = self.flat_params()
+            if xt.data_ptr() != flat.data_ptr(): flat.copy_(xt.view_as(flat))
+        else:
+            # copy instead of vector_to_parameters so that parameters don't share memory with x
+            params = [p for p in self.parameters() if p.requires_grad]
+            torch._foreach_copy_(params, [v.reshape_as(p) for v, p in zip(xt.split([p.numel() for p in params]), params)])
+
+    def loss_at(self, x: Any):
+        self._set_x_(x)
         return utils.tofloat(self.closure(backward=False))
 
     def loss_grad_at(self, x:Any):
-        xt = utils.totensor(x, device=self.device, dtype=self.dtype)
-        torch.nn.utils.vector_to_parameters(xt, (p for p in self.parameters() if p.requires_grad))
+        self._set_x_(x)
         loss = utils.tofloat(self.closure(backward=True))
-        grad = torch.cat(
-            [p.grad.ravel() if p.grad is not None else torch.zeros_like(p) for p in self.parameters() if p.requires_grad]
-        )
+        if self._flat_params:
+            # copy because optimizers may keep the previous gradient (e.g. scipy BFGS)
+            grad = self.flat_grad().clone()
+        else:
+            grad = torch.cat(
+                [p.grad.ravel() if p.grad is not None else torch.zeros_like(p) for p in self.parameters() if p.requires_grad]
+            )
         if isinstance(x, torch.Tensor): return loss, grad.to(x)
         return loss, utils.tonumpy(grad)
 
+    def loss_at_batch(self, X: Any) -> Any:
+        """Evaluates loss at each row of ``(P, ndim)`` population ``X``, returns vector of ``P`` losses.
+        Each evaluation counts as a forward pass and is logged same as with ``loss_at``, after this parameters are set to the last row.
+
+        If possible, all points are evaluated in a single ``torch.vmap`` call, otherwise this falls back to calling ``loss_at`` in a loop.
+        Vectorized evaluation is not used when images are enabled, since images are made on every forward pass,
+        or when parameter noise is used. So benchmark mode is recommended."""
+        from .utils._benchmark_ensemble import _loss_at_batch
+        return _loss_at_batch(self, X)
+
+    def flat_params(self, numpy: bool = False) -> Any:
+        """Returns vector with all trainable parameters. Requires ``set_flat_params``.
+
+        This is a view of the storage of parameters, modifying it modifies the parameters.
+        If ``numpy`` is True, returns a numpy array which shares memory with the parameters (CPU only)."""
+        if not self._flat_params: raise RuntimeError("flat_params requires `set_flat_params(True)`")
+        _benchmark_flat._flatten_(self)
+        assert self._flat_x is not None
+        if numpy: return self._flat_x.numpy()
+        return self._flat_x
+
+    def flat_grad(self, numpy: bool = False) -> Any:
+        """Returns vector with gradients of all trainable parameters. Requires ``set_flat_params``.
+
+        This is a view of the storage of gradients which is overwritten on each backward pass.
+        If ``numpy`` is True, returns a numpy array which shares memory with the gradients (CPU only)."""
+        if not self._flat_params: raise RuntimeError("flat_grad requires `set_flat_params(True)`")
+        grad = _benchmark_flat._flat_grad(self)
+        if numpy: return grad.numpy()
+        return grad
+
     def one_step(self, optimizer):
         """one batch or one step"""
-        _benchmark_utils._update_noise_(self)
-        self.pre_step()
+        with self._profiler.phase('pre_step'):
+            if self.training:
+                self._rng_step += 1
+                _benchmark_noise._update_noise_(self)
+            self.pre_step()
 
         if self.training:
             if self._param_noise_alpha != 0: self._is_perturbed = True
             else: self._is_perturbed = False
 
-            optimizer.step(self.closure)
+            with self._profiler.phase('optimizer'):
+                optimizer.step(self.closure)
+
             self.num_steps += 1
             self.num_extra += self._extra_passes_per_step
-            for cb in self._post_step_callbacks: cb(self)
+            with self._profiler.phase('callbacks'):
+                for cb in self._post_step_callbacks: cb(self)
             self._is_perturbed = False
 
+            if self._checkpoint_path is not None:
+                with self._profiler.phase('checkpoint'): _benchmark_checkpoint._maybe_checkpoint_(self, optimizer)
+
         else:
             self._is_perturbed = False
             self.closure(False)
 
     def train_epoch(self, optimizer):
+        # when resuming, batches that were done before checkpoint are skipped
+        batches = _benchmark_checkpoint._start_epoch_(self) if self.training else self._dltrain
         if self._dltrain is None: self.one_step(optimizer)
         else:
-            for batch in self._dltrain:
+            for batch in batches:
                 self.batch = batch
                 self.one_step(optimizer)
 
@@ -466,6 +862,11 @@ class Benchmark(torch.nn.Module, ABC):
             self.num_epochs += 1
 
     def test_epoch(self):
+        with self._profiler.phase('test epoch', absorb=True):
+            if self._test_worker is not None and self.training: _benchmark_testing._submit_test_epoch_(self)
+            else: self._test_epoch()
+
+    def _test_epoch(self):
         assert self._dltest is not None
         self.eval()
         batch_backup = self.batch
@@ -498,6 +899,54 @@ class Benchmark(torch.nn.Module, ABC):
         num_extra_passes: float | Callable[[int], float] = 0,
         step_callbacks: "Callable[[Benchmark], Any] | Sequence[Callable[[Benchmark], Any]] | None" = None,
     ):
+        self._setup_run_(
+            max_passes=max_passes, max_forwards=max_forwards, max_steps=max_steps, max_epochs=max_epochs,
+            max_seconds=max_seconds, test_every_forwards=test_every_forwards, test_every_batches=test_every_batches,
+            test_every_epochs=test_every_epochs, test_every_seconds=test_every_seconds, target_loss=target_loss,
+            num_extra_passes=num_extra_passes, step_callbacks=step_callbacks,
+        )
+
+        try:
+            for _ in range(max_epochs) if max_epochs is not None else itertools.count():
+                self.train_epoch(optimizer)
+
+        except (StopCondition, KeyboardInterrupt):
+            pass
+
+        self._finish_run_(optimizer)
+        return self
+
+    def run_ensemble(
+        self,
+        opt_fn: Callable[[list[torch.Tensor], Any], torch.optim.Optimizer],
+        values: Iterable[Any],
+        **run_kwargs,
+    ) -> "list[Benchmark]":
+        """Runs a copy of this benchmark for each value in ``values`` with optimizer ``opt_fn(params, value)``.
+        Losses of all copies are evaluated in a single ``torch.vmap`` pass when ``get_loss`` supports it,
+        otherwise copies are stepped one after another.
+
+        Each copy has its own logger, stop conditions and counters. Returns list of copies.
+        ``run_kwargs`` are passed to ``run``."""
+        from .utils._benchmark_ensemble import _run_ensemble
+        return _run_ensemble(self, opt_fn=opt_fn, values=values, **run_kwargs)
+
+    def _setup_run_(
+        self,
+        max_passes: int | None = None,
+        max_forwards: int | None = None,
+        max_steps: int | None = None,
+        max_epochs: int | None = None,
+        max_seconds: float | None = None,
+        test_every_forwards: int | None = None,
+        test_every_batches: int | None = None,
+        test_every_epochs: int | None = None,
+        test_every_seconds: float | None = None,
+        target_loss: float | None = None,
+        num_extra_passes: float | Callable[[int], float] = 0,
+        step_callbacks: "Callable[[Benchmark], Any] | Sequence[Callable[[Benchmark], Any]] | None" = None,
+    ):
+        """sets stop conditions, test epoch conditions and callbacks, stores initial state dict and switches to train mode"""
         self._max_passes = max_passes; self._max_forwards = max_forwards
         self._max_steps = max_steps; self._max_epochs = max_epochs
         self._max_seconds = max_seconds; self._target_loss = target_loss
@@ -511,26 +960,28 @@ class Benchmark(torch.nn.Module, ABC):
         self._test_every_forwards = test_every_forwards; self._test_every_steps = test_every_batches
         self._test_every_epochs = test_every_epochs; self._test_every_seconds = test_every_seconds
 
+        # saved in checkpoints to resume with same arguments
+        self._run_kwargs = dict(
+            max_passes=max_passes, max_forwards=max_forwards, max_steps=max_steps, max_epochs=max_epochs,
+            max_seconds=max_seconds, test_every_forwards=test_every_forwards, test_every_batches=test_every_batches,
+            test_every_epochs=test_every_epochs, test_every_seconds=test_every_seconds, target_loss=target_loss,
+            num_extra_passes=self._extra_passes_per_step,
+        )
+
         # make sure to store initial state dict
-        if self._initial_state_dict is None:
-            _benchmark_utils._update_noise_(self)
-            self._initial_state_dict = torch_tools.copy_state_dict(self.state_dict(), device='cpu')
+        if self._initial_state_dict is None: _benchmark_utils._store_initial_state_dict_(self)
 
+        _benchmark_memory._reset_peaks_(self)
         self.train()
 
-        try:
-            for _ in range(max_epochs) if max_epochs is not None else itertools.count():
-                self.train_epoch(optimizer)
-
-        except (StopCondition, KeyboardInterrupt):
-            if self._dltest is not None: self.test_epoch()
-            if self._print_interval_s: _benchmark_utils._print_final_report(self)
-
-        else:
-            if self._dltest is not None: self.test_epoch()
-            if self._print_interval_s: _benchmark_utils._print_final_report(self)
-
-        return self
+    def _finish_run_(self, optimizer: torch.optim.Optimizer | None):
+        """flushes deferred metrics, waits for images, runs final test epoch, logs memory and prints final report"""
+        _benchmark_utils._flush_deferred_metrics_(self)
+        _benchmark_images._join_images_(self)
+        if self._dltest is not None: self.test_epoch()
+        _benchmark_testing._join_tests_(self)
+        _benchmark_memory._log_memory_(self, optimizer)
+        if self._print_interval_s: _benchmark_utils._print_final_report(self)
 
     def plot_loss(self, ylim: Literal['auto'] | tuple[float,float] | None = 'auto',
                   yscale=None, smoothing: float | tuple[float,float,float] = 0, ax=None):
@@ -554,9 +1005,15 @@ class Benchmark(torch.nn.Module, ABC):
         dpi: float | None = None,
         fig=None,
     ):
+        _benchmark_utils._flush_deferred_metrics_(self)
+        _benchmark_images._materialize_images_(self)
+        _benchmark_images._join_images_(self)
         _benchmark_plotting.plot_summary(self, ylim=ylim, yscale=yscale, smoothing=smoothing, axsize=axsize, dpi=dpi, fig=fig)
 
     def render(self, file: str, fps: int = 60, scale: int | float = 1, progress=True):
+        _benchmark_utils._flush_deferred_metrics_(self)
+        _benchmark_images._materialize_images_(self)
+        _benchmark_images._join_images_(self)
         _benchmark_video._render(self, file, fps=fps, scale=scale, progress=progress)
 
 
@@ -575,6 +1032,7 @@ class Benchmark(torch.nn.Module, ABC):
         rounding: float = 10,
         root: str | None = None,
         print_progress: bool = False,
+        num_workers: int | None = None,
 
         **run_kwargs
     ):
@@ -601,6 +1059,7 @@ class Benchmark(torch.nn.Module, ABC):
             root=root,
             print_progress=print_progress,
             load_existing=False,
+            num_workers=num_workers,
         )
 
         metric = next(iter(metrics.keys()))
@@ -1,52 +1,306 @@
+import sys
 import warnings
 from collections import UserDict
-from collections.abc import Mapping
+from collections.abc import Mapping, MutableMapping
 from typing import Any
 
 import numpy as np
 import torch
 
 
-class Logger(UserDict[str, dict[int, Any]]):
+def _is_scalar(value: Any) -> bool:
+    return isinstance(value, (int, float, np.integer, np.floating)) and not isinstance(value, (bool, np.bool_))
+
+def _is_int(value: Any) -> bool:
+    return isinstance(value, (int, np.integer))
+
+def _nbytes(value: Any) -> int:
+    if isinstance(value, torch.Tensor): return value.numel() * value.element_size()
+    if isinstance(value, np.ndarray): return value.nbytes
+    return sys.getsizeof(value)
+
+class ScalarColumn(MutableMapping[int, Any]):
+    """History of a scalar metric stored in two growable numpy arrays (steps and values), behaves like ``dict[int, float]``.
+
+    Setting a step appends it in amortized O(1) without any lookups. If steps are set out of order or overwritten,
+    arrays are sorted and overwritten values are dropped lazily, when a query needs sorted steps.
+    Lookups are binary searches, running minimum and maximum are cached."""
+    __slots__ = ("_steps", "_values", "_n", "_last_step", "_sorted", "_float", "_argmin", "_argmax", "_min", "_max", "_num_nans", "_valid")
+
+    def __init__(self, capacity: int = 64, dtype: Any = np.float64):
+        self._steps = np.empty(capacity, dtype=np.int64)
+        self._values = np.empty(capacity, dtype=dtype)
+        self._n = 0
+        self._last_step: int | None = None
+        self._sorted = True
+        """whether steps are sorted and unique, if not ``_sort_`` has to be called before reading"""
+        self._float = bool(np.issubdtype(self._values.dtype, np.floating))
+        self._argmin: int | None = None
+        self._argmax: int | None = None
+        self._min: Any = None
+        self._max: Any = None
+        self._num_nans = 0
+        self._valid = True
+        """whether _argmin, _argmax, _min, _max and _num_nans are up to date"""
+
+    @classmethod
+    def from_arrays(cls, steps: np.ndarray, values: np.ndarray):
+        order = np.argsort(steps, kind='stable')
+        column = cls(capacity=max(len(steps), 1), dtype=np.int64 if np.issubdtype(values.dtype, np.integer) else np.float64)
+        column._steps[:len(steps)] = steps[order]
+        column._values[:len(steps)] = values[order]
+        column._n = len(steps)
+        if len(steps) != 0: column._last_step = int(column._steps[len(steps)-1])
+        column._valid = False
+        return column
+
+    # ---------------------------------- storage --------------------------------- #
+    def _grow(self):
+        capacity = max(len(self._steps) * 2, 1)
+        steps = np.empty(capacity, dtype=np.int64); steps[:self._n] = self._steps[:self._n]
+        values = np.empty(capacity, dtype=self._values.dtype); values[:self._n] = self._values[:self._n]
+        self._steps = steps; self._values = values
+
+    def _promote(self, value: Any):
+        """converts integer column to float column if ``value`` is not an integer"""
+        if not (self._float or _is_int(value)):
+            self._values = self._values.astype(np.float64)
+            self._float = True
+
+    def _sort_(self):
+        """sorts steps and drops overwritten values, in place so that references to arrays stay valid"""
+        if self._sorted: return
+        n = self._n
+        order = np.argsort(self._steps[:n], kind='stable')
+        steps = self._steps[:n][order]
+        # stable sort keeps order in which same step was set, so last one is the latest value
+        keep = np.ones(n, dtype=bool)
+        keep[:-1] = steps[1:] != steps[:-1]
+        m = int(keep.sum())
+        self._values[:m] = self._values[:n][order][keep]
+        self._steps[:m] = steps[keep]
+        self._n = m
+        self._last_step = int(self._steps[m-1])
+        self._sorted = True
+        self._valid = False
+
+    def _update_stats(self, idx: int, value: Any):
+        if not self._valid: return
+        if value != value: # nan
+            self._num_nans += 1
+            return
+        if self._argmin is None or value < self._min: self._argmin = idx; self._min = value
+        if self._argmax is None or value > self._max: self._argmax = idx; self._max = value
+
+    def _recompute_stats(self):
+        self._sort_()
+        values = self._values[:self._n]
+        nans = np.isnan(values) if self._float else np.zeros(len(values), dtype=bool)
+        self._num_nans = int(nans.sum())
+        if self._num_nans == self._n: self._argmin = self._argmax = self._min = self._max = None
+        else:
+            self._argmin = int(np.nanargmin(values))
+            self._argmax = int(np.nanargmax(values))
+            self._min = values[self._argmin].item()
+            self._max = values[self._argmax].item()
+        self._valid = True
+
+    def _index(self, step: int) -> int:
+        """index of ``step`` or -1 if it isn't present"""
+        self._sort_()
+        n = self._n
+        if n != 0 and self._last_step == step: return n - 1
+        idx = int(np.searchsorted(self._steps[:n], step))
+        if idx < n and self._steps[idx] == step: return idx
+        return -1
+
+    # ---------------------------------- mapping --------------------------------- #
+    def __setitem__(self, step: int, value: Any):
+        self._promote(value)
+        n = self._n
+        if n == len(self._steps): self._grow()
+        self._steps[n] = step
+        self._values[n] = value
+        self._n = n + 1
+
+        if self._sorted and (self._last_step is None or step > self._last_step):
+            self._last_step = step
+            self._update_stats(n, value)
+        else:
+            self._sorted = self._valid = False
+
+    def __getitem__(self, step: int):
+        idx = self._index(step)
+        if idx == -1: raise KeyError(step)
+        return self._values[idx].item()
+
+    def __delitem__(self, step: int):
+        idx = self._index(step)
+        if idx == -1: raise KeyError(step)
+        n = self._n
+        self._steps[idx:n-1] = self._steps[idx+1:n].copy()
+        self._values[idx:n-1] = self._values[idx+1:n].copy()
+        self._n -= 1
+        self._last_step = int(self._steps[self._n-1]) if self._n != 0 else None
+        self._valid = False
+
+    def __iter__(self): return iter(self.keys())
+    def __len__(self):
+        self._sort_()
+        return self._n
+    def __repr__(self): return f"ScalarColumn({dict(self.items())})"
+
+    def keys(self): # pyright:ignore[reportIncompatibleMethodOverride]
+        self._sort_()
+        return self._steps[:self._n].tolist()
+    def values(self): # pyright:ignore[reportIncompatibleMethodOverride]
+        self._sort_()
+        return self._values[:self._n].tolist()
+    def items(self): return list(zip(self.keys(), self.values())) # pyright:ignore[reportIncompatibleMethodOverride]
+
+    # ---------------------------------- queries --------------------------------- #
+    def nbytes(self) -> int: return self._steps.nbytes + self._values.nbytes
+    def steps_array(self) -> np.ndarray:
+        self._sort_()
+        return self._steps[:self._n].copy()
+    def values_array(self) -> np.ndarray:
+        self._sort_()
+        return self._values[:self._n].copy()
+    def first(self):
+        self._sort_()
+        return self._values[0].item()
+    def last(self):
+        self._sort_()
+        return self._values[self._n-1].item()
+
+    def nanargmin(self) -> int:
+        if not self._valid: self._recompute_stats()
+        if self._argmin is None: raise ValueError("All-NaN slice encountered")
+        return self._argmin
+
+    def nanargmax(self) -> int:
+        if not self._valid: self._recompute_stats()
+        if self._argmax is None: raise ValueError("All-NaN slice encountered")
+        return self._argmax
+
+    def has_nan(self) -> bool:
+        if not self._valid: self._recompute_stats()
+        return self._num_nans != 0
+
+    def closest_index(self, step: int) -> int:
+        self._sort_()
+        n = self._n
+        idx = int(np.searchsorted(self._steps[:n], step))
+        if idx == 0: return 0
+        if idx == n: return n - 1
+        # on tie pick the lower step, same as argmin of distances
+        if step - self._steps[idx-1] <= self._steps[idx] - step: return idx - 1
+        return idx
+
+
+class Logger(UserDict[str, "dict[int, Any] | ScalarColumn"]):
+    """Stores history of each metric, scalar metrics are stored in ``ScalarColumn``, everything else in dicts."""
     def log(self, step: int, metric: str, value: Any):
-        if metric not in self: self[metric] = {step: value}
-        else: self[metric][step] = value
+        if metric not in self:
+            if _is_scalar(value):
+                column = self.data[metric] = ScalarColumn(dtype=np.int64 if _is_int(value) else np.float64)
+                column[step] = value
+            else: self[metric] = {step: value}
+            return
+
+        history = self.data[metric]
+        if isinstance(history, ScalarColumn):
+            if _is_scalar(value):
+                history[step] = value
+                return
+            history = self.data[metric] = dict(history.items())
+        history[step] = value
 
     def first(self, metric):
-        return next(iter(self[metric].values()))
+        history = self[metric]
+        if isinstance(history, ScalarColumn): return history.first()
+        return next(iter(history.values()))
 
     def last(self, metric):
-        return list(self[metric].values())[-1]
+        history = self[metric]
+        if isinstance(history, ScalarColumn): return history.last()
+        return next(reversed(history.values()))
 
     def list(self, metric): return list(self[metric].values())
-    def numpy(self, metric): return np.asarray(self.list(metric))
+    def numpy(self, metric):
+        history = self[metric]
+        if isinstance(history, ScalarColumn): return history.values_array()
+        return np.asarray(self.list(metric))
     def tensor(self, metric): return torch.from_numpy(self.numpy(metric).copy())
     def steps(self, metric): return list(self[metric].keys())
 
-    def min(self, metric): return np.min(self.list(metric))
-    def nanmin(self, metric): return np.nanmin(self.list(metric))
-    def max(self, metric): return np.max(self.list(metric))
-    def nanmax(self, metric): return np.nanmax(self.list(metric))
+    def min(self, metric):
+        history = self[metric]
+        if isinstance(history, ScalarColumn):
+            if history.has_nan(): return np.nan
+            return history._values[history.nanargmin()]
+        return np.min(self.list(metric))
+
+    def nanmin(self, metric):
+        history = self[metric]
+        if isinstance(history, ScalarColumn):
+            if history.has_nan() and history._num_nans == len(history): return np.nan
+            return history._values[history.nanargmin()]
+        return np.nanmin(self.list(metric))
+
+    def max(self, metric):
+        history = self[metric]
+        if isinstance(history, ScalarColumn):
+            if history.has_nan(): return np.nan
+            return history._values[history.nanargmax()]
+        return np.max(self.list(metric))
+
+    def nanmax(self, metric):
+        history = self[metric]
+        if isinstance(history, ScalarColumn):
+            if history.has_nan() and history._num_nans == len(history): return np.nan
+            return history._values[history.nanargmax()]
+        return np.nanmax(self.list(metric))
+
+    def nbytes(self) -> int:
+        """approximate number of bytes held by all metrics, including unused capacity of ``ScalarColumn`` arrays"""
+        total = 0
+        for history in self.values():
+            if isinstance(history, ScalarColumn): total += history.nbytes()
+            else: total += sys.getsizeof(history) + sum(_nbytes(v) for v in history.values())
+        return total
 
     def interp(self, metric: str) -> np.ndarray:
-        """Returns a list of values for a given key, interpolating missing steps."""
-        steps = range(max(len(v) for v in self.values()))
-        existing = self[metric]
-        return np.interp(steps, list(existing.keys()), list(existing.values()))
+        """Returns values of ``metric`` on every step from 0 to its last step, interpolating missing steps."""
+        history = self[metric]
+        if isinstance(history, ScalarColumn): steps, values = history.steps_array(), history.values_array()
+        else:
+            steps = np.asarray(list(history.keys()), dtype=np.int64)
+            order = np.argsort(steps, kind='stable')
+            steps, values = steps[order], np.asarray(list(history.values()))[order]
+        if len(steps) == 0: return np.empty(0)
+        return np.interp(np.arange(steps[-1] + 1), steps, values)
 
     def stepmin(self, metric:str) -> int:
+        history = self[metric]
+        if isinstance(history, ScalarColumn): return int(history._steps[history.nanargmin()])
         idx = np.nanargmin(self.list(metric)).item()
-        return list(self[metric].keys())[idx]
+        return list(history.keys())[idx]
 
     def stepmax(self, metric:str) -> int:
+        history = self[metric]
+        if isinstance(history, ScalarColumn): return int(history._steps[history.nanargmax()])
         idx = np.nanargmax(self.list(metric)).item()
-        return list(self[metric].keys())[idx]
+        return list(history.keys())[idx]
 
     def closest(self, metric: str, step: int):
         """same as logger[metric][step] but returns closest value if idx doesn't exist"""
+        history = self[metric]
+        if isinstance(history, ScalarColumn): return history._values[history.closest_index(step)].item()
+        if step in history: return history[step]
         steps = np.asarray(self.steps(metric), dtype=np.int64)
         idx = np.abs(steps - step).argmin().item()
-        return self[metric][steps[int(idx)]]
+        return history[steps[int(idx)]]
 
 
     def save(self, fname: str):
@@ -70,10 +324,13 @@ class Logger(UserDict[str, dict[int, Any]]):
             if k.startswith('__STEPS__.'):
                 name = k.replace("__STEPS__.", "")
                 values = arrays[f"__VALUES__.{name}"]
-                self[name] = dict(zip(array, values))
+                if values.ndim == 1 and (np.issubdtype(values.dtype, np.integer) or np.issubdtype(values.dtype, np.floating)):
+                    self[name] = ScalarColumn.from_arrays(array.astype(np.int64), values)
+                else:
+                    self[name] = dict(zip(array, values))
 
     @classmethod
     def from_file(cls, fname: str):
         logger = cls()
         logger.load(fname)
-        return logger
\ No newline at end of file
+        return logger
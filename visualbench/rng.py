@@ -1,18 +1,32 @@
+import hashlib
 import random
 from typing import Any
 import numpy as np
 import torch
 
 
+def stream_seed(key: int, name: str, step: int = 0) -> int:
+    """63-bit seed which only depends on ``key``, ``name`` and ``step``, same across processes and python versions"""
+    digest = hashlib.blake2b(f"{key}/{name}/{step}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'little') >> 1
+
+
 class RNG:
+    """Sequential generators (``random``, ``numpy`` and ``torch``) seeded with ``seed``, and counter-based streams.
+
+    Output of sequential generators depends on order of calls. ``stream(name, step)`` returns a generator seeded
+    from ``(key, name, step)``, where ``key`` is ``seed`` (or random if ``seed`` is None), so it is reproducible
+    regardless of what else was drawn before, i.e. in batched or parallel execution."""
     def __init__(self, seed: "int | None | RNG"):
         if isinstance(seed, RNG):
             self.seed = seed.seed
+            self.key = seed.key
             self.random = seed.random
             self.numpy = seed.numpy
             self._torch_generators = seed._torch_generators
         else:
             self.seed = seed
+            self.key: int = seed if seed is not None else random.getrandbits(63)
             self.random = random.Random(seed)
             self.numpy = np.random.default_rng(seed)
 
@@ -30,4 +44,13 @@ class RNG:
             self._torch_generators[key] = torch.Generator(device).manual_seed(self.seed) if self.seed is not None else None
         return self._torch_generators[key]
 
+    def stream(self, name: str, step: int = 0, device: Any = None) -> "torch.Generator":
+        """new torch generator on ``device`` seeded from ``(key, name, step)``, on CUDA this is a Philox generator"""
+        if device is None: device = torch.get_default_device()
+        return torch.Generator(device).manual_seed(stream_seed(self.key, name, step))
+
+    def numpy_stream(self, name: str, step: int = 0) -> np.random.Generator:
+        """new numpy Philox generator keyed by ``(key, name, step)``"""
+        return np.random.Generator(np.random.Philox(key=stream_seed(self.key, name, step)))
+
 Seed = int | RNG | None
\ No newline at end of file
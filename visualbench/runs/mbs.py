@@ -89,25 +89,46 @@ class MBS:
 
         return [(x1, 'binary'), (x2, 'binary')]
 
-    def _evaluate(self, fn, x):
-        """Evaluate a point, returns False if point is already in history"""
+    def _claim(self, x):
+        """Rounds a point and marks it as evaluated, returns None if point is already in history"""
         if self.rounding is not None: x = format_number(x, self.rounding)
-        if x in self.evaluated: return False
+        if x in self.evaluated: return None
         self.evaluated.add(x)
+        return x
 
-        if self.log_scale: vals = _tofloatlist(fn(10 ** x))
-        else: vals = _tofloatlist(fn(x))
-
-        for idx, v in enumerate(vals):
+    def _store(self, x, vals):
+        for idx, v in enumerate(_tofloatlist(vals)):
             if idx not in self.objectives: self.objectives[idx] = {}
             self.objectives[idx][x] = v
 
+    def _evaluate(self, fn, x):
+        """Evaluate a point, returns False if point is already in history"""
+        x = self._claim(x)
+        if x is None: return False
+        self._store(x, fn(10 ** x if self.log_scale else x))
         return True
 
-    def run(self, fn):
+    def _evaluate_batch(self, fn, xs: list, map_fn: Callable[[Callable, list], Iterable] | None):
+        """Evaluates claimed points, with ``map_fn`` they may be evaluated concurrently, results are stored in order of ``xs``"""
+        if len(xs) == 0: return
+        inputs = [10 ** x if self.log_scale else x for x in xs]
+        if map_fn is None: outputs = [fn(x) for x in inputs]
+        else: outputs = list(map_fn(fn, inputs))
+        for x, vals in zip(xs, outputs): self._store(x, vals)
+
+    def run(self, fn, map_fn: Callable[[Callable, list], Iterable] | None = None):
+        """Runs the search.
+
+        Args:
+            fn: objective function.
+            map_fn (optional):
+                ``map_fn(fn, xs)`` should return ``[fn(x) for x in xs]`` in the same order, for example ``executor.map``.
+                If specified, all points of each iteration are passed to it at once so that they can be evaluated
+                concurrently. Which points are evaluated doesn't depend on values of other points in the same iteration,
+                so the search evaluates same points as without ``map_fn``.
+        """
         # step 1 - grid search
-        for x in self.grid:
-            self._evaluate(fn, x)
+        self._evaluate_batch(fn, [x for x in (self._claim(x) for x in self.grid) if x is not None], map_fn)
 
         # step 2 - binary search
         while True:
@@ -134,12 +155,14 @@ class MBS:
             if any(t == 'expansion' for t in types):
                 candidates = [(x,t) for x,t in candidates if t == 'expansion']
 
-            # evaluate candidates
+            # select candidates to evaluate
             terminate = False
             at_least_one_evaluated = False
+            batch = []
             for x, t in candidates:
-                evaluated = self._evaluate(fn, x)
-                if not evaluated: continue
+                x = self._claim(x)
+                if x is None: continue
+                batch.append(x)
                 at_least_one_evaluated = True
 
                 if t == 'expansion': self.num_expansions -= 1
@@ -149,6 +172,9 @@ class MBS:
                     terminate = True
                     break
 
+            # evaluate candidates
+            self._evaluate_batch(fn, batch, map_fn)
+
             if terminate: break
             if not at_least_one_evaluated:
                 if self.rounding is None: break
@@ -168,9 +194,9 @@ class MBS:
 
         return ret
 
-def mbs_minimize(fn, grid: Iterable[float], step:float, num_candidates: int = 3, num_binary: int = 20, num_expansions: int = 20, rounding=2, log_scale=False):
+def mbs_minimize(fn, grid: Iterable[float], step:float, num_candidates: int = 3, num_binary: int = 20, num_expansions: int = 20, rounding=2, log_scale=False, map_fn=None):
     mbs = MBS(grid, step=step, num_candidates=num_candidates, num_binary=num_binary, num_expansions=num_expansions, rounding=rounding, log_scale=log_scale)
-    return mbs.run(fn)
+    return mbs.run(fn, map_fn=map_fn)
 
 def _unpack(x):
     if isinstance(x, tuple): return x
@@ -57,6 +57,7 @@ class MBSOptimizerBenchmark:
         accelerate: bool = True,
         load_existing: bool = True,
         render_vids: bool = True,
+        memory_accounting: bool = False,
 
         # pass stuff
         num_extra_passes: float | Callable[[int], float] = 0,
@@ -89,7 +90,7 @@ class MBSOptimizerBenchmark:
                 np.random.seed(0)
                 random.seed(0)
 
-                bench.reset().set_benchmark_mode().set_print_inverval(None)
+                bench.reset().set_benchmark_mode().set_print_inverval(None).set_memory_accounting(memory_accounting)
                 opt = opt_fn([p for p in bench.parameters() if p.requires_grad], value)
                 bench.run(opt, passes, max_seconds=sec, test_every_forwards=test_every, num_extra_passes=num_extra_passes, step_callbacks=step_callbacks)
                 if print_progress and bench.seconds_passed is not None and bench.seconds_passed > sec:
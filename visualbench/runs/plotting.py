@@ -21,6 +21,7 @@ from ..utils.python_tools import format_number, to_valid_fname
 if TYPE_CHECKING:
     from ..logger import Logger
     from ..runs.run import Run, Sweep, Task
+    from ..runs.store import ResultsDB
 
 # region reference opts
 REFERENCE_OPTS = (
@@ -610,11 +611,19 @@ def bar_chart(
 # endregion
 
 # region summary
-def summary_df(root:str = "optimizers", include_partial:bool=True):
-    from .run import Task
-    decoder = msgspec.msgpack.Decoder()
-    dirs = [os.path.join(root, d) for d in os.listdir(root)]
-    tasks = [Task.load(d, load_loggers=False, decoder=decoder) for d in dirs if os.path.isdir(d)]
+MEMORY_METRICS = ("memory/peak rss", "memory/peak cuda", "memory/optimizer state", "memory/logger")
+"""metrics logged by ``Benchmark.set_memory_accounting``"""
+
+def summary_df(root:str = "optimizers", include_partial:bool=True, memory:bool=False, db: "ResultsDB | None" = None):
+    """If ``memory`` is True, also adds ``{task} - {metric}`` rows with ``MEMORY_METRICS`` (max value, in megabytes)
+    of best run of each sweep by the first target metric, for runs where they were logged.
+
+    If ``db`` is specified, tasks are loaded from it instead of ``root``, otherwise from manifests of each task."""
+    from .run import load_best_task
+    if db is not None: tasks = [db.load_task(name) for name in db.task_names()]
+    else:
+        dirs = [os.path.join(root, d) for d in os.listdir(root)]
+        tasks = [load_best_task(d) for d in dirs if os.path.isdir(d)]
     tasks = [t for t in tasks if len(t) != 0]
 
     tasks_list = []
@@ -628,6 +637,8 @@ def summary_df(root:str = "optimizers", include_partial:bool=True):
             task_dict: dict = dict(name=row_name)
 
             for sweep in task.values():
+                # sweep folder is created before first run is saved
+                if len(sweep) == 0: continue
                 assert sweep.run_name is not None
                 assert sweep.target_metrics is not None
 
@@ -650,6 +661,13 @@ def summary_df(root:str = "optimizers", include_partial:bool=True):
 
             tasks_list.append(task_dict)
 
+        if memory:
+            target_metric, maximize = next(iter(task.target_metrics.items()))
+            best_runs = {sweep.run_name: sweep.best_runs(target_metric, maximize, 1)[0] for sweep in task.values() if len(sweep) != 0}
+            for metric in MEMORY_METRICS:
+                task_dict = {_wrap(name, 50): run.stats[metric]['max'] for name, run in best_runs.items() if metric in run.stats}
+                if len(task_dict) != 0: tasks_list.append(dict(name=f"{task.task_name} - {metric}", **task_dict))
+
     import polars as pl
     df = pl.from_dicts(tasks_list)
 
@@ -1,10 +1,14 @@
+import contextlib
+import multiprocessing
 import os
 import time
 import warnings
-from collections import UserDict, UserList
+from collections import OrderedDict, UserDict, UserList
 from collections.abc import Callable, Iterable, Mapping, Sequence
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from typing import TYPE_CHECKING, Any
 import random
+import threading
 
 import msgspec
 import numpy as np
@@ -18,6 +22,7 @@ from . import mbs
 
 if TYPE_CHECKING:
     from ..benchmark import Benchmark
+    from .store import ResultsDB
 
 def _txtwrite(file: str, text: str | bytes, mode: str):
     with open(file, mode, encoding='utf8' if isinstance(text, str) else None) as f:
@@ -28,6 +33,53 @@ def _msgpack_decode(file: str, decoder: msgspec.msgpack.Decoder | None = None):
     with open(file, 'rb') as f:
         return decode(f.read())
 
+_FILE_CACHE: "OrderedDict[str, tuple[int, bytes]]" = OrderedDict()
+"""contents of msgpack files by path with modification time of the file when it was read, least recently used first.
+Contents are cached instead of decoded values so that callers never share (and can modify) returned objects,
+decoding is about as fast as a shallow copy."""
+_file_cache_max_bytes = 64 * 2**20
+_file_cache_bytes = 0
+_FILE_CACHE_LOCK = threading.Lock()
+
+def _evict_(max_bytes: int):
+    global _file_cache_bytes
+    while _file_cache_bytes > max_bytes and len(_FILE_CACHE) != 0:
+        _file_cache_bytes -= len(_FILE_CACHE.popitem(last=False)[1][1])
+
+def set_file_cache_size(max_bytes: int):
+    """Sets maximal total size of msgpack files of runs (hyperparameters, stats, target metrics) that are kept in memory
+    so that loading them again doesn't read them if they weren't modified, 0 disables the cache. Defaults to 64 MB."""
+    global _file_cache_max_bytes
+    with _FILE_CACHE_LOCK:
+        _file_cache_max_bytes = max_bytes
+        _evict_(max_bytes)
+
+def clear_file_cache():
+    """Releases all msgpack files kept in memory by ``set_file_cache_size``."""
+    with _FILE_CACHE_LOCK: _evict_(0)
+
+def _msgpack_decode_cached(file: str, decoder: msgspec.msgpack.Decoder | None = None):
+    """same as ``_msgpack_decode`` but doesn't read the file if it wasn't modified since it was last read"""
+    global _file_cache_bytes
+    mtime = os.stat(file).st_mtime_ns
+    with _FILE_CACHE_LOCK:
+        cached = _FILE_CACHE.get(file, None)
+        if cached is not None and cached[0] == mtime: _FILE_CACHE.move_to_end(file)
+        else: cached = None
+
+    if cached is None:
+        with open(file, 'rb') as f: cached = (mtime, f.read())
+        with _FILE_CACHE_LOCK:
+            previous = _FILE_CACHE.pop(file, None)
+            if previous is not None: _file_cache_bytes -= len(previous[1])
+            if len(cached[1]) <= _file_cache_max_bytes:
+                _FILE_CACHE[file] = cached
+                _file_cache_bytes += len(cached[1])
+                _evict_(_file_cache_max_bytes)
+
+    decode = decoder.decode if decoder is not None else msgspec.msgpack.decode
+    return decode(cached[1])
+
 def _numel(x: np.ndarray | torch.Tensor):
     if isinstance(x,np.ndarray): return x.size
     return x.numel()
@@ -37,7 +89,8 @@ def _get_stats(logger: "Logger") -> dict[str, dict[str, float]]:
     stats: dict[str, dict[str, float]] = {}
     for metric, values in logger.items():
         if len(values) == 0: continue
-        if isinstance(values[0], (np.ndarray, torch.Tensor)) and _numel(values[0]) != 1: continue
+        first = logger.first(metric)
+        if isinstance(first, (np.ndarray, torch.Tensor)) and _numel(first) != 1: continue
 
         stats[metric] = {}
         try:
@@ -70,7 +123,9 @@ def _dict_to_str(d: dict):
 
 # region Run
 class Run:
-    """A finished run"""
+    """A finished run.
+
+    When loaded with ``Run.load``, ``hyperparams``, ``stats`` and ``target_metrics`` are decoded on first access."""
 
     def __init__(
         self,
@@ -80,19 +135,50 @@ class Run:
         target_metrics: str | Sequence[str] | dict[str, bool],
         id: Any,
     ):
-        self.hyperparams = hyperparams
+        self._hyperparams: dict[str, Any] | None = hyperparams
         self.logger = logger
-        self.stats = _get_stats(logger) if stats is None else stats
-        self.target_metrics = _target_metrics_to_dict(target_metrics)
+        self._stats: dict[str, dict[str, float]] | None = _get_stats(logger) if stats is None else stats
+        self._target_metrics: dict[str, bool] | None = _target_metrics_to_dict(target_metrics)
         self.id = str(time.time_ns()) if id is None else str(id)
+        self._decoder: msgspec.msgpack.Decoder | None = None
 
         self.root: str | None = None
         self.task_name: str | None = None
         self.run_name: str | None = None
         self.run_path: str | None = None
+        self._logger_loader: Callable[[], Logger] | None = None
+        """loads logger of runs which are not saved to a folder, e.g. ones stored in ``ResultsDB``"""
+
+    def _decode(self, name: str) -> Any:
+        if self.run_path is None: raise RuntimeError(f"trying to load {name} when self.run_path is None")
+        return _msgpack_decode_cached(os.path.join(self.run_path, f"{name}.msgpack"), decoder=self._decoder)
+
+    @property
+    def hyperparams(self) -> dict[str, Any]:
+        if self._hyperparams is None: self._hyperparams = self._decode("hyperparams")
+        return self._hyperparams
+    @hyperparams.setter
+    def hyperparams(self, value: dict[str, Any]): self._hyperparams = value
+
+    @property
+    def stats(self) -> dict[str, dict[str, float]]:
+        if self._stats is None: self._stats = self._decode("stats")
+        return self._stats
+    @stats.setter
+    def stats(self, value: dict[str, dict[str, float]]): self._stats = value
+
+    @property
+    def target_metrics(self) -> dict[str, bool]:
+        if self._target_metrics is None: self._target_metrics = self._decode("target_metrics")
+        return self._target_metrics
+    @target_metrics.setter
+    def target_metrics(self, value: dict[str, bool]): self._target_metrics = value
 
     def load_logger(self, lazy=True) -> Logger:
         if lazy and len(self.logger) > 0: return self.logger
+        if self._logger_loader is not None:
+            self.logger = self._logger_loader()
+            return self.logger
         if self.run_path is None: raise RuntimeError("trying to load Logger when self.run_path is None")
         self.logger = Logger.from_file(os.path.join(self.run_path, "logger.npz"))
         return self.logger
@@ -119,15 +205,15 @@ class Run:
 
     @classmethod
     def load(cls, folder, load_logger: bool, decoder: msgspec.msgpack.Decoder | None = None):
+        """loads run from ``folder``, metadata files are decoded when accessed"""
         if not os.path.isdir(folder): raise NotADirectoryError(folder)
 
         id = os.path.basename(folder)
         logger = Logger.from_file(os.path.join(folder, "logger.npz")) if load_logger else Logger()
-        hyperparams = _msgpack_decode(os.path.join(folder, "hyperparams.msgpack"), decoder=decoder)
-        stats = _msgpack_decode(os.path.join(folder, "stats.msgpack"), decoder=decoder)
-        target_metrics = _msgpack_decode(os.path.join(folder, "target_metrics.msgpack"), decoder=decoder)
 
-        run = cls(hyperparams=hyperparams, logger=logger, stats=stats, target_metrics=target_metrics, id=id)
+        run = cls(hyperparams={}, logger=logger, stats={}, target_metrics={}, id=id)
+        run._hyperparams = run._stats = run._target_metrics = None
+        run._decoder = decoder
         run.root, run.task_name, run.run_name, id = _unpack_path(folder)
         assert id == run.id
         run.run_path = folder
@@ -182,21 +268,20 @@ class Sweep(UserList[Run]):
             os.mkdir(run_path)
             run.save(run_path, encoder=encoder)
 
+        invalidate_manifest(os.path.dirname(os.path.abspath(folder)))
         self._update_paths()
 
     @classmethod
-    def load(cls, sweep_path: str, load_loggers: bool, decoder: msgspec.msgpack.Decoder | None):
+    def load(cls, sweep_path: str, load_loggers: bool, decoder: msgspec.msgpack.Decoder | None, num_workers: int | None = None):
+        """loads runs and their stats, other metadata is decoded when accessed.
+        If ``num_workers`` is more than 1, runs are loaded with that many threads, which is much faster on network storage."""
         if decoder is None: decoder = msgspec.msgpack.Decoder()
 
         if not os.path.exists(sweep_path):
             raise NotADirectoryError(f"Sweep path \"{sweep_path}\" doesn't exist")
 
-        runs = []
-        for id in os.listdir(sweep_path):
-            run = Run.load(os.path.join(sweep_path, id), load_logger=load_loggers, decoder=decoder)
-            runs.append(run)
-
-        return cls(runs)
+        folders = [os.path.join(sweep_path, id) for id in os.listdir(sweep_path)]
+        return cls(_load_runs(folders, load_loggers=load_loggers, decoder=decoder, num_workers=num_workers))
 
     def best_runs(self, metric: str, maximize: bool, n:int):
         k = 'max' if maximize else 'min'
@@ -227,18 +312,24 @@ class Task(UserDict[str, Sweep]):
             self.target_metrics = sweep1.target_metrics
 
     @classmethod
-    def load(cls, task_path: str, load_loggers: bool, decoder: msgspec.msgpack.Decoder | None):
+    def load(cls, task_path: str, load_loggers: bool, decoder: msgspec.msgpack.Decoder | None, num_workers: int | None = None):
+        """loads runs of all sweeps and their stats, other metadata is decoded when accessed.
+        If ``num_workers`` is more than 1, runs are loaded with that many threads, which is much faster on network storage."""
         if decoder is None: decoder = msgspec.msgpack.Decoder()
 
         if not os.path.exists(task_path):
             raise NotADirectoryError(f"Task path \"{task_path}\" doesn't exist")
 
-        sweeps = {}
-        for sweep_name in os.listdir(task_path):
-            sweep = Sweep.load(os.path.join(task_path, sweep_name), load_loggers=load_loggers, decoder=decoder)
-            sweeps[sweep_name] = sweep
+        # task folder also has the manifest
+        sweep_names = [name for name in os.listdir(task_path) if os.path.isdir(os.path.join(task_path, name))]
+        sweep_paths = [os.path.join(task_path, sweep_name) for sweep_name in sweep_names]
 
-        return cls(sweeps)
+        # list all sweeps and then load all runs in one pool
+        ids = _map(os.listdir, sweep_paths, num_workers)
+        folders = [os.path.join(sweep_path, id) for sweep_path, sweep_ids in zip(sweep_paths, ids) for id in sweep_ids]
+        runs = iter(_load_runs(folders, load_loggers=load_loggers, decoder=decoder, num_workers=num_workers))
+
+        return cls({sweep_name: Sweep([next(runs) for _ in sweep_ids]) for sweep_name, sweep_ids in zip(sweep_names, ids)})
 
     def n_runs(self):
         return sum(len(v) for v in self.values())
@@ -263,15 +354,204 @@ class Task(UserDict[str, Sweep]):
 # endregion
 
 
-def _allclose_dict(d1:dict, d2:dict):
-    """all keys from d1 must be in d2, but d2 is allowed to have extra keys, unless d1 is empty"""
-    if len(d1) == 0 and len(d2) != 0: return False
-    for k, v in d1.items():
-        if isinstance(v, float):
-            if format_number(v, 5) != format_number(d2[k], 5): return False
-        else:
-            if v != d2[k]: return False
-    return True
+# region Manifest
+MANIFEST = ".manifest.msgpack"
+"""name of the file in each task folder with number of runs and best runs of each sweep.
+
+``Search`` adds runs it saves to the manifest and ``Sweep.save`` deletes it so that it is rebuilt.
+Reading never writes anything, if the manifest doesn't exist or if sweep folders or numbers of runs in them
+don't match it, it is built in memory from all runs. Changes to an existing run are not detected,
+call ``invalidate_manifest`` or ``build_manifest`` after them. It is updated under a lock, which uses ``.manifest.lock`` file."""
+
+@contextlib.contextmanager
+def _manifest_lock(task_path: str):
+    """exclusive lock so that multiple processes saving runs to the same task don't overwrite each other's updates"""
+    try: import fcntl
+    except ImportError: # windows
+        yield
+        return
+
+    with open(os.path.join(task_path, ".manifest.lock"), "w", encoding="utf8") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try: yield
+        finally: fcntl.flock(f, fcntl.LOCK_UN)
+
+def _write_manifest(task_path: str, manifest: dict[str, Any], encoder: msgspec.msgpack.Encoder | None = None):
+    """writes to a temporary file and renames it so that readers never see a partially written manifest"""
+    if encoder is None: encoder = msgspec.msgpack.Encoder()
+    file = os.path.join(task_path, MANIFEST)
+    _txtwrite(f"{file}.tmp", encoder.encode(manifest), 'wb')
+    os.replace(f"{file}.tmp", file)
+
+def _add_to_manifest(manifest: dict[str, Any], run: Run, sweep_name: str):
+    """``manifest["sweeps"][sweep_name]`` has ``num_runs`` and ``best``, which is ``{metric: {"min": entry, "max": entry}}``
+    for each target metric, where entry is ``{"value", "id", "stats", "target_metrics"}`` of the best run.
+    Runs where value is nan are only recorded if there is no other run, so that each sweep has at least one run."""
+    sweep = manifest["sweeps"].setdefault(sweep_name, {"num_runs": 0, "best": {}})
+    sweep["num_runs"] += 1
+    for metric in run.target_metrics:
+        if metric not in run.stats: continue
+        best = sweep["best"].setdefault(metric, {})
+        for key in ("min", "max"):
+            value = run.stats[metric].get(key, None)
+            if value is None or (value != value and key in best): continue # nan
+            if key in best and (value >= best[key]["value"] if key == "min" else value <= best[key]["value"]): continue
+            best[key] = {"value": value, "id": run.id, "stats": run.stats, "target_metrics": run.target_metrics}
+
+def _build_manifest(task_path: str) -> dict[str, Any]:
+    """creates manifest of a task by loading all runs without writing it"""
+    task = Task.load(task_path, load_loggers=False, decoder=None)
+    manifest: dict[str, Any] = {"sweeps": {}}
+    for sweep_name, sweep in task.items():
+        manifest["sweeps"][sweep_name] = {"num_runs": 0, "best": {}}
+        for run in sweep: _add_to_manifest(manifest, run, sweep_name)
+    return manifest
+
+def _is_current(task_path: str, manifest: dict[str, Any]) -> bool:
+    """whether sweep folders and numbers of runs in them match ``manifest``, only lists directories"""
+    sweeps = manifest["sweeps"]
+    sweep_names = [name for name in os.listdir(task_path) if os.path.isdir(os.path.join(task_path, name))]
+    if set(sweep_names) != set(sweeps): return False
+    return all(len(os.listdir(os.path.join(task_path, name))) == sweeps[name]["num_runs"] for name in sweep_names)
+
+def build_manifest(task_path: str) -> dict[str, Any]:
+    """Creates manifest of a task by loading all runs and writes it to the task folder.
+    Runs ``Search`` saves are added to the manifest automatically, this is needed if existing runs were modified."""
+    manifest = _build_manifest(task_path)
+    _write_manifest(task_path, manifest)
+    return manifest
+
+def load_manifest(task_path: str) -> dict[str, Any]:
+    """Loads manifest of a task, if it doesn't exist or is stale builds it in memory from all runs.
+    This doesn't write anything so it works on read-only folders."""
+    file = os.path.join(task_path, MANIFEST)
+    if os.path.exists(file):
+        manifest = _msgpack_decode(file)
+        if _is_current(task_path, manifest): return manifest
+    return _build_manifest(task_path)
+
+def update_manifest(task_path: str, run: Run, sweep_name: str, encoder: msgspec.msgpack.Encoder | None = None):
+    """Adds a run that was saved to ``task_path/sweep_name`` to the manifest, builds it if it doesn't exist or is stale."""
+    file = os.path.join(task_path, MANIFEST)
+    with _manifest_lock(task_path):
+        # if manifest doesn't exist, this builds it from all runs including this one
+        if not os.path.exists(file):
+            build_manifest(task_path)
+            return
+
+        manifest = _msgpack_decode(file)
+        _add_to_manifest(manifest, run, sweep_name)
+        if not _is_current(task_path, manifest):
+            build_manifest(task_path)
+            return
+        _write_manifest(task_path, manifest, encoder=encoder)
+
+def invalidate_manifest(task_path: str):
+    """Deletes manifest so that it is rebuilt next time it is needed, call this after removing or renaming runs or sweeps."""
+    file = os.path.join(task_path, MANIFEST)
+    if os.path.exists(file): os.remove(file)
+
+def load_best_task(task_path: str) -> Task:
+    """Loads a task from its manifest, each sweep only has the best runs by each target metric.
+    Their stats are read from the manifest, other metadata is decoded when accessed.
+    This is enough for ``best_runs``, ``best_sweeps`` and ``best_sweep_runs``, and only reads one file."""
+    manifest = load_manifest(task_path)
+    sweeps = {}
+    for sweep_name, sweep in manifest["sweeps"].items():
+        runs = {}
+        for best in sweep["best"].values():
+            for entry in best.values():
+                if entry["id"] in runs: continue
+                run = Run(hyperparams={}, logger=Logger(), stats=entry["stats"], target_metrics=entry["target_metrics"], id=entry["id"])
+                run._hyperparams = None
+                run.run_path = os.path.join(task_path, sweep_name, entry["id"])
+                run.root, run.task_name, run.run_name, _ = _unpack_path(run.run_path)
+                runs[entry["id"]] = run
+
+        # names are set from the manifest since sweep can have no runs
+        sweeps[sweep_name] = _named_sweep(Sweep(runs.values()), task_path, sweep_name)
+
+    task = Task(sweeps)
+    task.root, task.task_name = os.path.split(os.path.normpath(task_path))
+    task.task_path = task_path
+    task.target_metrics = next((s.target_metrics for s in sweeps.values() if s.target_metrics is not None), None)
+    return task
+
+def _named_sweep(sweep: Sweep, task_path: str, sweep_name: str) -> Sweep:
+    sweep.root, sweep.task_name = os.path.split(os.path.normpath(task_path))
+    sweep.run_name = sweep_name
+    sweep.sweep_path = os.path.join(task_path, sweep_name)
+    if len(sweep) != 0: sweep.target_metrics = sweep[0].target_metrics
+    return sweep
+# endregion
+
+def _map(fn: Callable, iterable: Sequence, num_workers: int | None) -> list:
+    """``list(map(fn, iterable))`` with a thread pool, I/O on network storage is much faster with many threads.
+    Items are submitted in chunks since submitting each one separately is slower than reading a small local file."""
+    if num_workers is None or num_workers <= 1 or len(iterable) < 2: return [fn(i) for i in iterable]
+    num_workers = min(num_workers, len(iterable))
+    size = -(-len(iterable) // (num_workers * 4))
+    chunks = [iterable[i:i+size] for i in range(0, len(iterable), size)]
+    with ThreadPoolExecutor(num_workers) as pool:
+        return [r for chunk in pool.map(lambda chunk: [fn(i) for i in chunk], chunks) for r in chunk]
+
+def _load_runs(folders: Sequence[str], load_loggers: bool, decoder: msgspec.msgpack.Decoder | None, num_workers: int | None) -> list[Run]:
+    """loads runs and decodes their stats since they are needed for ``best_runs``"""
+    def load(folder: str):
+        run = Run.load(folder, load_logger=load_loggers, decoder=decoder)
+        run.stats # pylint:disable=pointless-statement
+        return run
+
+    return _map(load, folders, num_workers)
+
+def _canonical(value, is_float: bool):
+    """floats are compared up to 5 significant digits, other values as is"""
+    if is_float: return format_number(value, 5)
+    return value
+
+class _ExistingRuns:
+    """hash index of already evaluated hyperparameters.
+
+    Hyperparameters of a run match queried ones if they are equal on names which are in both,
+    except when run has no such names and query is not empty. Floats of the run are compared up to 5 significant digits.
+    If multiple runs match, the earliest one is returned.
+
+    Runs are grouped by their hyperparameter names, and for each group and each set of queried names
+    a dictionary of canonical values is built on first lookup, so lookups don't scan all runs."""
+    def __init__(self, existing_runs: Mapping[frozenset[tuple[str, Any]], list]):
+        self.groups: dict[frozenset[str], list[tuple[int, dict[str, Any], list]]] = {}
+        for i, (params, metric_values) in enumerate(existing_runs.items()):
+            hyperparams = dict(params)
+            self.groups.setdefault(frozenset(hyperparams), []).append((i, hyperparams, metric_values))
+
+        self.tables: dict[tuple[frozenset[str], tuple[str, ...]], dict[tuple[bool, ...], dict[tuple, tuple[int, list]]]] = {}
+
+    def _table(self, names: frozenset[str], shared: tuple[str, ...]):
+        tables = self.tables.get((names, shared))
+        if tables is not None: return tables
+
+        # runs with float and non-float values under same name are compared differently so they go to separate tables
+        tables = {}
+        for i, hyperparams, metric_values in self.groups[names]:
+            is_float = tuple(isinstance(hyperparams[k], float) for k in shared)
+            key = tuple(_canonical(hyperparams[k], f) for k, f in zip(shared, is_float))
+            tables.setdefault(is_float, {}).setdefault(key, (i, metric_values))
+
+        self.tables[(names, shared)] = tables
+        return tables
+
+    def find(self, hyperparams: dict[str, Any]) -> list | None:
+        """metric values of earliest run matching ``hyperparams``, or None"""
+        best = None
+        for names in self.groups:
+            shared = tuple(sorted(names.intersection(hyperparams)))
+            if len(shared) == 0 and len(hyperparams) != 0: continue
+
+            for is_float, table in self._table(names, shared).items():
+                found = table.get(tuple(_canonical(hyperparams[k], f) for k, f in zip(shared, is_float)))
+                if found is not None and (best is None or found[0] < best[0]): best = found
+
+        return None if best is None else best[1]
 
 
 def _maybe_format_number(x):
@@ -295,6 +575,7 @@ class Search:
         base_hyperparams: dict[str, Any] | None = None,
         pass_base_hyperparams: bool = False,
         load_existing: bool = True,
+        db: "ResultsDB | None" = None,
     ):
         metrics = _target_metrics_to_dict(metrics)
         if base_hyperparams is None: base_hyperparams = {}
@@ -310,6 +591,7 @@ class Search:
         self.base_hyperparams = base_hyperparams
         self.pass_base_hyperparams = pass_base_hyperparams
         self.load_existing = load_existing
+        self.db = db
 
         self.runs = []
         self.encoder = msgspec.msgpack.Encoder()
@@ -333,24 +615,35 @@ class Search:
         # ----------------------- load task stats for printing ----------------------- #
         self.best_metrics: dict[str, tuple[str, float]] | None = None
 
-        if print_records and self.task_path is not None:
+        if print_records and db is not None and task_name is not None:
+            self.best_metrics = {}
+            for metric, maximize in metrics.items():
+                best_runs = db.best_sweep_runs(task_name, metric, maximize, 1)
+                if len(best_runs) != 0: self.best_metrics[metric] = (str(best_runs[0].run_name), best_runs[0].stats[metric]['max' if maximize else 'min'])
+
+        elif print_records and self.task_path is not None:
             if os.path.exists(self.task_path):
                 self.best_metrics = {}
-                task = Task.load(self.task_path, load_loggers=False, decoder=None)
+                task = load_best_task(self.task_path)
                 if task.n_runs() > 0:
                     for metric, maximize in metrics.items():
-                        run = task.best_sweep_runs(metric, maximize, 1)[0]
+                        # sweeps where all runs are nan are also loaded
+                        key = 'max' if maximize else 'min'
+                        best_runs = [r for r in task.best_sweep_runs(metric, maximize, len(task)) if r.stats[metric][key] == r.stats[metric][key]]
+                        if len(best_runs) == 0: continue
+                        run = best_runs[0]
                         assert run.run_name is not None
-                        if maximize: self.best_metrics[metric] = (run.run_name, run.stats[metric]['max'])
-                        else: self.best_metrics[metric] = (run.run_name, run.stats[metric]['min'])
+                        self.best_metrics[metric] = (run.run_name, run.stats[metric][key])
             else:
                 if print_records:
                     warnings.warn(f"{self.task_path} doesn't exist")
 
         # load existing
         self.existing_runs: dict[frozenset[tuple[str, Any]], list] = {}
-        if load_existing and self.sweep_path is not None:
-            sweep = Sweep.load(self.sweep_path, load_loggers=False, decoder=None)
+        sweep = None
+        if load_existing and db is not None and task_name is not None and run_name is not None: sweep = db.load_sweep(task_name, run_name)
+        elif load_existing and self.sweep_path is not None: sweep = Sweep.load(self.sweep_path, load_loggers=False, decoder=None)
+        if sweep is not None:
             for run in sweep:
                 self.runs.append(run)
                 hyperparams = frozenset(run.hyperparams.items())
@@ -362,37 +655,69 @@ class Search:
                         if maximize: self.existing_runs[hyperparams].append(-stats['max'])
                         else: self.existing_runs[hyperparams].append(stats['min'])
 
+        # built on first objective call
+        self._existing_index: _ExistingRuns | None = None
+        self._existing_index_size = 0
 
-    def objective(self, hyperparameters) -> list[float]:
-        # - run -
-        all_hyperparams = self.base_hyperparams.copy()
-        all_hyperparams.update(hyperparameters)
 
-        # - check if hyperparams have already been evaluated -
-        for params, metric_values in self.existing_runs.items():
+    def _find_existing(self, all_hyperparams: dict[str, Any], hyperparameters: dict[str, Any]) -> list[float] | None:
+        """returns metric values if hyperparams have already been evaluated"""
+        if self._existing_index is None or self._existing_index_size != len(self.existing_runs):
+            self._existing_index = _ExistingRuns(self.existing_runs)
+            self._existing_index_size = len(self.existing_runs)
 
-            # extract hyperparameters that are given in all_hyperparams
-            existing_hyperparams = {param:value for param,value in params if param in all_hyperparams}
-            if _allclose_dict(existing_hyperparams, all_hyperparams):
+        metric_values = self._existing_index.find(all_hyperparams)
+        if metric_values is not None:
 
-                # print
-                if self.print_progress and random.random() > 0.9:
-                    text = f'LOADED {self.run_name} - "{self.task_name}"'
-                    if len(hyperparameters) > 0: text = f"{text}: {_maybe_format_number(next(iter(hyperparameters.values())))}"
-                    print(f"{text}                      \r", end='')
+            # print
+            if self.print_progress and random.random() > 0.9:
+                text = f'LOADED {self.run_name} - "{self.task_name}"'
+                if len(hyperparameters) > 0: text = f"{text}: {_maybe_format_number(next(iter(hyperparameters.values())))}"
+                print(f"{text}                      \r", end='')
 
-                return metric_values
+        return metric_values
 
-        # print
+    def _logger_kwargs(self, all_hyperparams: dict[str, Any], hyperparameters: dict[str, Any]) -> dict[str, Any]:
+        """prints progress and returns kwargs to pass to ``logger_fn``"""
         if self.print_progress:
             text = f'{self.run_name} - "{self.task_name}"'
             if len(hyperparameters) > 0: text = f"{text}: {_maybe_format_number(next(iter(hyperparameters.values())))}"
             print(f"{text}                      \r", end='')
 
+        if self.pass_base_hyperparams: return all_hyperparams
+        return hyperparameters
+
+    def objective(self, hyperparameters) -> list[float]:
+        all_hyperparams = self.base_hyperparams.copy()
+        all_hyperparams.update(hyperparameters)
+
+        metric_values = self._find_existing(all_hyperparams, hyperparameters)
+        if metric_values is not None: return metric_values
+
         # run the benchmark
-        if self.pass_base_hyperparams: logger = self.logger_fn(**all_hyperparams)
-        else: logger = self.logger_fn(**hyperparameters)
+        logger = self.logger_fn(**self._logger_kwargs(all_hyperparams, hyperparameters))
+        return self._add_run(all_hyperparams, logger)
+
+    def objective_map(self, hyperparameters: Sequence[dict[str, Any]], executor: Executor) -> list[list[float]]:
+        """Same as ``[self.objective(h) for h in hyperparameters]``, but new runs are evaluated concurrently by ``executor``.
+
+        ``executor`` calls ``logger_fn`` via ``_call_worker_fn``, so it has to be created by ``_worker_pool``.
+        Runs are saved and added to the database in this process in order of ``hyperparameters``."""
+        results: list[list[float] | None] = []
+        futures = {}
+        for i, h in enumerate(hyperparameters):
+            all_hyperparams = self.base_hyperparams.copy()
+            all_hyperparams.update(h)
+            results.append(self._find_existing(all_hyperparams, h))
+            if results[i] is None: futures[i] = (all_hyperparams, executor.submit(_call_worker_fn, self._logger_kwargs(all_hyperparams, h)))
 
+        for i, (all_hyperparams, future) in futures.items():
+            results[i] = self._add_run(all_hyperparams, future.result())
+
+        return results # type:ignore
+
+    def _add_run(self, all_hyperparams: dict[str, Any], logger: Logger) -> list[float]:
+        """saves a new run and returns its metric values"""
         run = Run(all_hyperparams, logger=logger, stats=None, target_metrics=self.target_metrics, id=None)
 
         # - save -
@@ -404,7 +729,9 @@ class Search:
             run_path = os.path.join(self.task_path, self.run_name, str(run.id))
             os.mkdir(run_path)
             run.save(run_path, encoder=self.encoder)
+            update_manifest(self.task_path, run, self.run_name, encoder=self.encoder)
 
+        if self.db is not None: self.db.add_run(run, task_name=self.task_name, sweep_name=self.run_name)
         self.runs.append(run)
 
         # - aggregate target values -
@@ -437,6 +764,30 @@ class Search:
         return values
 # endregion
 
+_WORKER_FN: Callable[..., Logger] | None = None
+"""``logger_fn`` of the search in worker processes, it is inherited via fork so it doesn't have to be picklable"""
+
+def _init_worker(logger_fn: Callable[..., Logger], num_threads: int):
+    global _WORKER_FN # pylint:disable=global-statement
+    _WORKER_FN = logger_fn
+    torch.set_num_threads(num_threads)
+
+def _call_worker_fn(kwargs: dict[str, Any]) -> Logger:
+    assert _WORKER_FN is not None
+    return _WORKER_FN(**kwargs)
+
+def _worker_pool(logger_fn: Callable[..., Logger], num_workers: int) -> ProcessPoolExecutor:
+    """pool of forked processes, each gets its own copy of everything ``logger_fn`` references
+    and an equal share of CPU threads."""
+    if "fork" not in multiprocessing.get_all_start_methods():
+        raise RuntimeError("num_workers requires the fork start method which is not available on this platform, set num_workers=None")
+    if torch.cuda.is_initialized():
+        raise RuntimeError("num_workers can't be used after CUDA was initialized in this process because CUDA doesn't work in "
+                           "forked processes, set num_workers=None or make sure nothing uses CUDA before the search")
+    num_threads = max(1, (os.cpu_count() or 1) // num_workers)
+    return ProcessPoolExecutor(num_workers, mp_context=multiprocessing.get_context("fork"),
+                               initializer=_init_worker, initargs=(logger_fn, num_threads))
+
 def mbs_search(
     logger_fn: Callable[[float], Logger],
     metrics: str | Sequence[str] | dict[str, bool],
@@ -460,7 +811,19 @@ def mbs_search(
     print_progress: bool = False,
     save: bool = False,
     load_existing: bool = True,
+    db: "ResultsDB | None" = None,
+    num_workers: int | None = None,
 ):
+    """Searches for best value of ``search_hyperparam`` via ``MBS``.
+
+    If ``num_workers`` is more than 1, points proposed on each MBS iteration are evaluated concurrently in a pool
+    of ``num_workers`` forked processes, and torch in each process uses an equal share of CPU threads.
+    Results are merged in order, so same points are evaluated and same runs are saved as with ``num_workers=None``.
+    Each run's logger is pickled back from its worker, and MBS only proposes a few points per iteration, so this is only
+    worth it when a single run takes seconds or more. For cheap benchmarks it is slower, e.g. on a small Rosenbrock
+    2 workers took 3.9s while ``num_workers=None`` took 2.4s. Requires the fork start method (not available on Windows)
+    and CUDA not being initialized in this process.
+    """
     grid = sorted(list(grid))
     if step is None:
         if len(grid) == 1: step = max(abs(grid[0]), 1)
@@ -482,21 +845,29 @@ def mbs_search(
         save=save,
         base_hyperparams=fixed_hyperparams,
         load_existing=load_existing,
+        db=db,
     )
 
     def objective(x: float):
         return search.objective({search_hyperparam: x})
 
-    mbs.mbs_minimize(
-        objective,
-        grid=grid,
-        step=step,
-        num_candidates=num_candidates,
-        num_binary=num_binary,
-        num_expansions=num_expansions,
-        rounding=rounding,
-        log_scale=log_scale,
-    )
+    with contextlib.ExitStack() as stack:
+        map_fn = None
+        if num_workers is not None and num_workers > 1:
+            executor = stack.enter_context(_worker_pool(hparam_fn, num_workers))
+            map_fn = lambda fn, xs: search.objective_map([{search_hyperparam: x} for x in xs], executor)
+
+        mbs.mbs_minimize(
+            objective,
+            grid=grid,
+            step=step,
+            num_candidates=num_candidates,
+            num_binary=num_binary,
+            num_expansions=num_expansions,
+            rounding=rounding,
+            log_scale=log_scale,
+            map_fn=map_fn,
+        )
 
     return Sweep(search.runs)
 
@@ -514,6 +885,7 @@ def single_run(
     print_progress: bool = False,
     save: bool = False,
     load_existing: bool = True,
+    db: "ResultsDB | None" = None,
 ):
     def hparam_fn(**hyperparameters):
         return logger_fn(0)
@@ -529,6 +901,7 @@ def single_run(
         save=save,
         base_hyperparams=fixed_hyperparams,
         load_existing=load_existing,
+        db=db,
     )
 
     search.objective({})
@@ -0,0 +1,233 @@
+"""SQLite index of runs, sweeps and tasks so that best runs and summaries don't need to walk the filesystem"""
+import io
+import os
+import sqlite3
+from collections.abc import Iterable
+
+import msgspec
+
+from ..logger import Logger
+from .run import Run, Sweep, Task
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    task TEXT NOT NULL,
+    sweep TEXT NOT NULL,
+    id TEXT NOT NULL,
+    hyperparams BLOB NOT NULL,
+    stats BLOB NOT NULL,
+    target_metrics BLOB NOT NULL,
+    path TEXT,
+    logger BLOB,
+    PRIMARY KEY (task, sweep, id)
+);
+CREATE TABLE IF NOT EXISTS stats (
+    task TEXT NOT NULL,
+    sweep TEXT NOT NULL,
+    id TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    min REAL,
+    max REAL,
+    PRIMARY KEY (task, sweep, id, metric)
+);
+CREATE INDEX IF NOT EXISTS stats_min ON stats (task, metric, min);
+CREATE INDEX IF NOT EXISTS stats_max ON stats (task, metric, max);
+"""
+
+_COLUMNS = ("task", "sweep", "id", "hyperparams", "stats", "target_metrics", "path")
+"""all columns except logger blob"""
+_SELECT = ", ".join(_COLUMNS)
+_SELECT_R = ", ".join(f"r.{c}" for c in _COLUMNS)
+
+
+class ResultsDB:
+    """Single-file SQLite index of runs with their hyperparameters, stats and target metrics.
+
+    Runs that were saved to a folder (``Run.save``) keep their ``logger.npz`` there and the database stores the path
+    relative to the database file, other runs have their logger stored in the database as a blob.
+    Loggers are only read when ``Run.load_logger`` is called.
+
+    Pass it as ``db`` to ``mbs_search``, ``single_run`` or ``Search`` to index new runs and to use it for loading
+    existing runs and records, and to ``summary_df``. Use ``index_root`` to add runs that are already saved to a root folder.
+
+    Args:
+        path (str): path to the database file, it is created if it doesn't exist.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.directory = os.path.dirname(os.path.abspath(path))
+        self.encoder = msgspec.msgpack.Encoder()
+        self.decoder = msgspec.msgpack.Decoder()
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn: self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self): return self
+    def __exit__(self, *args): self.close()
+
+    # ---------------------------------- writing --------------------------------- #
+    def add_run(self, run: Run, task_name: str | None = None, sweep_name: str | None = None):
+        """Adds ``run`` or replaces it if it is already in the database.
+        ``task_name`` and ``sweep_name`` default to ones of the run if it was saved to a folder."""
+        if task_name is None: task_name = run.task_name
+        if sweep_name is None: sweep_name = run.run_name
+        if task_name is None or sweep_name is None: raise RuntimeError(f"task and sweep names of run {run.id} are unknown")
+        with self._conn: self._insert(run, task_name, sweep_name)
+
+    def add_runs(self, runs: Iterable[Run], task_name: str | None = None, sweep_name: str | None = None):
+        """Adds multiple runs in a single transaction."""
+        with self._conn:
+            for run in runs:
+                task = run.task_name if task_name is None else task_name
+                sweep = run.run_name if sweep_name is None else sweep_name
+                if task is None or sweep is None: raise RuntimeError(f"task and sweep names of run {run.id} are unknown")
+                self._insert(run, task, sweep)
+
+    def _insert(self, run: Run, task_name: str, sweep_name: str):
+        path = logger = None
+        if run.run_path is not None: path = os.path.relpath(os.path.abspath(run.run_path), self.directory)
+        else:
+            buffer = io.BytesIO()
+            run.load_logger().save(buffer) # type:ignore
+            logger = buffer.getvalue()
+
+        self._conn.execute(
+            f"INSERT OR REPLACE INTO runs ({_SELECT}, logger) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (task_name, sweep_name, run.id, self.encoder.encode(run.hyperparams), self.encoder.encode(run.stats),
+             self.encoder.encode(run.target_metrics), path, logger),
+        )
+        self._conn.execute("DELETE FROM stats WHERE task = ? AND sweep = ? AND id = ?", (task_name, sweep_name, run.id))
+        self._conn.executemany(
+            "INSERT INTO stats (task, sweep, id, metric, min, max) VALUES (?, ?, ?, ?, ?, ?)",
+            [(task_name, sweep_name, run.id, metric, s.get('min', None), s.get('max', None)) for metric, s in run.stats.items()],
+        )
+
+    def delete_sweep(self, sweep_name: str, task_name: str | None = None):
+        """Removes all runs of sweep ``sweep_name`` from the database, from all tasks if ``task_name`` is None."""
+        where, args = _where(sweep=sweep_name, task=task_name)
+        with self._conn:
+            self._conn.execute(f"DELETE FROM runs WHERE {where}", args)
+            self._conn.execute(f"DELETE FROM stats WHERE {where}", args)
+
+    def rename_sweep(self, old: str, new: str, task_name: str | None = None):
+        """Renames sweep ``old`` to ``new``, in all tasks if ``task_name`` is None. Paths of runs saved to a folder
+        are changed to the renamed folder, so call this after renaming the folder (e.g. via ``rename_run`` from ``runs.utils``)."""
+        self._rename("sweep", old, new, task_name)
+
+    def rename_task(self, old: str, new: str):
+        """Renames task ``old`` to ``new``. Paths of runs saved to a folder are changed to the renamed folder."""
+        self._rename("task", old, new, None)
+
+    def _rename(self, column: str, old: str, new: str, task_name: str | None):
+        # path is relative path to ``task/sweep/id`` folder
+        part = {"task": -3, "sweep": -2}[column]
+        where, args = _where(task=old) if column == "task" else _where(sweep=old, task=task_name)
+        with self._conn:
+            rows = self._conn.execute(f"SELECT task, sweep, id, path FROM runs WHERE {where} AND path IS NOT NULL", args).fetchall()
+            for task, sweep, id, path in rows:
+                parts = os.path.normpath(path).split(os.sep)
+                if len(parts) >= -part and parts[part] == old: parts[part] = new
+                self._conn.execute("UPDATE runs SET path = ? WHERE task = ? AND sweep = ? AND id = ?", (os.path.join(*parts), task, sweep, id))
+
+            self._conn.execute(f"UPDATE OR REPLACE runs SET {column} = ? WHERE {where}", (new, *args))
+            self._conn.execute(f"UPDATE OR REPLACE stats SET {column} = ? WHERE {where}", (new, *args))
+
+    def index_root(self, root: str):
+        """Adds all runs saved in ``root`` which has ``root/task/sweep/run`` layout, runs that are already in the database are replaced."""
+        for task_name in os.listdir(root):
+            task_path = os.path.join(root, task_name)
+            if not os.path.isdir(task_path): continue
+            task = Task.load(task_path, load_loggers=False, decoder=self.decoder)
+            self.add_runs(run for sweep in task.values() for run in sweep)
+
+    # ---------------------------------- reading --------------------------------- #
+    def _run(self, row: tuple) -> Run:
+        task_name, sweep_name, id, hyperparams, stats, target_metrics, path = row
+        run = Run(hyperparams=self.decoder.decode(hyperparams), logger=Logger(), stats=self.decoder.decode(stats),
+                  target_metrics=self.decoder.decode(target_metrics), id=id)
+        run.task_name = task_name
+        run.run_name = sweep_name
+
+        if path is not None:
+            run.run_path = os.path.join(self.directory, path)
+            run.root = os.path.dirname(os.path.dirname(os.path.dirname(run.run_path)))
+        else:
+            run._logger_loader = lambda: self._load_logger_blob(task_name, sweep_name, id)
+
+        return run
+
+    def _load_logger_blob(self, task_name: str, sweep_name: str, id: str) -> Logger:
+        row = self._conn.execute("SELECT logger FROM runs WHERE task = ? AND sweep = ? AND id = ?", (task_name, sweep_name, id)).fetchone()
+        logger = Logger()
+        logger.load(io.BytesIO(row[0])) # type:ignore
+        return logger
+
+    def task_names(self) -> list[str]:
+        return [r[0] for r in self._conn.execute("SELECT DISTINCT task FROM runs ORDER BY task")]
+
+    def sweep_names(self, task_name: str) -> list[str]:
+        return [r[0] for r in self._conn.execute("SELECT DISTINCT sweep FROM runs WHERE task = ? ORDER BY sweep", (task_name, ))]
+
+    def n_runs(self, task_name: str | None = None) -> int:
+        if task_name is None: return self._conn.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+        return self._conn.execute("SELECT COUNT(*) FROM runs WHERE task = ?", (task_name, )).fetchone()[0]
+
+    def load_sweep(self, task_name: str, sweep_name: str) -> Sweep:
+        """loads runs of a sweep without loggers, same as ``Sweep.load`` with ``load_loggers=False``"""
+        rows = self._conn.execute(f"SELECT {_SELECT} FROM runs WHERE task = ? AND sweep = ?", (task_name, sweep_name))
+        return _sweep([self._run(r) for r in rows])
+
+    def load_task(self, task_name: str) -> Task:
+        """loads all runs of a task without loggers, same as ``Task.load`` with ``load_loggers=False``"""
+        sweeps: dict[str, list[Run]] = {}
+        for row in self._conn.execute(f"SELECT {_SELECT} FROM runs WHERE task = ?", (task_name, )):
+            sweeps.setdefault(row[1], []).append(self._run(row))
+
+        task = Task({k: _sweep(v) for k, v in sweeps.items()})
+        if len(task) != 0:
+            sweep1 = next(iter(task.values()))
+            task.task_name = sweep1.task_name
+            task.target_metrics = sweep1.target_metrics
+        return task
+
+    def best_runs(self, task_name: str, metric: str, maximize: bool, n: int = 1, sweep_name: str | None = None) -> list[Run]:
+        """best ``n`` runs of a task or of a sweep if ``sweep_name`` is specified"""
+        key, order = ("max", "DESC") if maximize else ("min", "ASC")
+        query = (f"SELECT {_SELECT_R} FROM stats s "
+                 "JOIN runs r ON r.task = s.task AND r.sweep = s.sweep AND r.id = s.id "
+                 f"WHERE s.task = ? AND s.metric = ? AND s.{key} IS NOT NULL")
+        args: tuple = (task_name, metric)
+        if sweep_name is not None:
+            query = f"{query} AND s.sweep = ?"
+            args = (*args, sweep_name)
+        rows = self._conn.execute(f"{query} ORDER BY s.{key} {order} LIMIT ?", (*args, n))
+        return [self._run(r) for r in rows]
+
+    def best_sweep_runs(self, task_name: str, metric: str, maximize: bool, n: int) -> list[Run]:
+        """best run of each sweep in a task, sorted, returns ``n`` best ones. Same as ``Task.best_sweep_runs``"""
+        key, agg, order = ("max", "MAX", "DESC") if maximize else ("min", "MIN", "ASC")
+        # with MIN/MAX sqlite takes other columns from the row with minimal/maximal value
+        best = (f"SELECT sweep, id, {agg}({key}) AS value FROM stats "
+                f"WHERE task = ? AND metric = ? AND {key} IS NOT NULL GROUP BY sweep")
+        query = (f"SELECT {_SELECT_R} FROM ({best}) b "
+                 f"JOIN runs r ON r.task = ? AND r.sweep = b.sweep AND r.id = b.id ORDER BY b.value {order} LIMIT ?")
+        rows = self._conn.execute(query, (task_name, metric, task_name, n))
+        return [self._run(r) for r in rows]
+
+
+def _where(**columns: str | None) -> tuple[str, tuple]:
+    """``WHERE`` clause which matches columns that are not None"""
+    columns = {k: v for k, v in columns.items() if v is not None}
+    return " AND ".join(f"{k} = ?" for k in columns), tuple(columns.values())
+
+def _sweep(runs: list[Run]) -> Sweep:
+    sweep = Sweep(runs)
+    if len(runs) != 0:
+        # runs with loggers stored in the database have no path so Sweep doesn't know their names
+        sweep.task_name = runs[0].task_name
+        sweep.run_name = runs[0].run_name
+        sweep.target_metrics = runs[0].target_metrics
+    return sweep
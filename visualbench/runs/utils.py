@@ -3,10 +3,11 @@ import os
 from typing import TYPE_CHECKING
 
 from ..utils.python_tools import format_number
-from .run import Task
+from .run import invalidate_manifest, load_best_task
 
 if TYPE_CHECKING:
     from ..benchmark import Benchmark
+    from .store import ResultsDB
 
 def _maybe_format(x):
     if isinstance(x, float): return format_number(x, 3)
@@ -16,7 +17,7 @@ def _dict_to_str(d: dict):
     return ' '.join([f"{k}={_maybe_format(v)}" for k,v in d.items()])
 
 def print_task_summary(task_name:str, metric: str = "train loss", maximize=False, root: str = "optimizers",) -> None:
-    task = Task.load(os.path.join(root, task_name), load_loggers=False, decoder=None)
+    task = load_best_task(os.path.join(root, task_name))
     sweeps = task.best_sweeps(metric, maximize, n=1000)
     runs = [s.best_runs(metric, maximize, n=1)[0] for s in sweeps]
 
@@ -27,15 +28,19 @@ def print_task_summary(task_name:str, metric: str = "train loss", maximize=False
         print(n.ljust(100)[:100], f"{format_number(r.stats[metric][key], 5)}")
 
 
-def rename_run(old: str, new:str, root:str = "optimizers") -> None:
+def rename_run(old: str, new:str, root:str = "optimizers", db: "ResultsDB | None" = None) -> None:
+    """renames run (sweep) folder ``old`` to ``new`` in all tasks in ``root`` and in summaries,
+    and in ``db`` if it is specified, otherwise a database that indexes ``root`` has to be updated via ``index_root``."""
     renamed = False
     for task in os.listdir(root):
         task_path = os.path.join(root, task)
+        if not os.path.isdir(task_path): continue
         for run in os.listdir(task_path):
             if run == old:
                 renamed = True
                 run_path = os.path.join(task_path, run)
                 os.rename(run_path, os.path.join(task_path, new))
+                invalidate_manifest(task_path)
 
     summaries_root = f'{root} - summaries'
     if os.path.exists(summaries_root):
@@ -45,18 +50,23 @@ def rename_run(old: str, new:str, root:str = "optimizers") -> None:
                 run_path = os.path.join(summaries_root, run)
                 os.rename(run_path, os.path.join(summaries_root, new))
 
+    if db is not None: db.rename_sweep(old, new)
     if not renamed:
         raise FileNotFoundError(f"{old} doesn't exist")
 
 
-def delete_run(name:str, root:str = "optimizers") -> None:
+def delete_run(name:str, root:str = "optimizers", db: "ResultsDB | None" = None) -> None:
+    """deletes run (sweep) folder ``name`` from all tasks in ``root`` and from summaries,
+    and from ``db`` if it is specified, otherwise its runs stay in a database that indexes ``root``."""
     deleted = False
     for task in os.listdir(root):
         task_path = os.path.join(root, task)
+        if not os.path.isdir(task_path): continue
         for run in os.listdir(task_path):
             if run == name:
                 deleted = True
                 shutil.rmtree(os.path.join(task_path, run))
+                invalidate_manifest(task_path)
 
     summaries_root = f'{root} - summaries'
     if os.path.exists(summaries_root):
@@ -65,10 +75,13 @@ def delete_run(name:str, root:str = "optimizers") -> None:
                 deleted = True
                 shutil.rmtree(os.path.join(summaries_root, run))
 
+    if db is not None: db.delete_sweep(name)
     if not deleted:
         raise FileNotFoundError(f"{name} doesn't exist")
 
-def rename_task(old: str, new:str, root:str = "optimizers") -> None:
+def rename_task(old: str, new:str, root:str = "optimizers", db: "ResultsDB | None" = None) -> None:
+    """renames task folder ``old`` to ``new`` in ``root`` and in summaries,
+    and in ``db`` if it is specified, otherwise a database that indexes ``root`` has to be updated via ``index_root``."""
     renamed = False
     for task in os.listdir(root):
         if task == old:
@@ -86,6 +99,6 @@ def rename_task(old: str, new:str, root:str = "optimizers") -> None:
                     task_path = os.path.join(run_path, task)
                     os.rename(task_path, os.path.join(run_path, f'{new}.png'))
 
-
+    if db is not None: db.rename_task(old, new)
     if not renamed:
         raise FileNotFoundError(f"{old} doesn't exist")
@@ -230,8 +230,11 @@ class DatasetBenchmark(Benchmark):
         if self.training and self._make_images and hasattr(self.model, "after_get_loss"):
             self.model.after_get_loss(self) # pyright:ignore[reportCallIssue]
 
+        return train_loss
+
+    def log_param_images(self):
         # decision boundary
-        if self.decision_boundary and self.training:
+        if self.decision_boundary:
             self.model.eval()
             with torch.inference_mode():
                 out: torch.Tensor = self.model(self.grid_points)
@@ -242,5 +245,3 @@ class DatasetBenchmark(Benchmark):
                 Z = torch.where(self.mask, self.data, Z)
                 Z = Z.clamp_(0, 255)
                 self.log_image("decision boundary", Z.to(torch.uint8), to_uint8=False, log_difference=True, show_best=True)
-
-        return train_loss
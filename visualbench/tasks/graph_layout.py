@@ -1,5 +1,6 @@
 import random
 from collections.abc import Sequence
+from functools import partial
 
 import cv2
 import numpy as np
@@ -248,7 +249,10 @@ class GraphLayout(Benchmark):
         if self._make_images:
             # update camera state smoothly before rendering
             self._update_camera()
-            frame = self._make_frame(self.node_positions.detach().cpu().numpy()) # pylint:disable=not-callable
+            frame = partial(
+                self._make_frame, self.node_positions.detach().cpu().numpy().copy(), # pylint:disable=not-callable
+                self.camera_center.cpu().numpy(), self.camera_scale.cpu().numpy(),
+            )
             self.log_image('graph', frame, to_uint8=False, show_best=True)
 
         return torch.stack([attraction, repulsion])
@@ -282,15 +286,12 @@ class GraphLayout(Benchmark):
         self.camera_scale = alpha * target_scale + (1 - alpha) * self.camera_scale
 
     @torch.no_grad
-    def _make_frame(self, pos: np.ndarray) -> np.ndarray:
+    def _make_frame(self, pos: np.ndarray, center_np: np.ndarray, scale_np: np.ndarray) -> np.ndarray:
         """Renders the graph from the camera's perspective."""
         canvas = np.full((self.canvas_size, self.canvas_size, 3), self.bg_color, dtype=np.uint8)
         if self.num_nodes == 0:
             return canvas
 
-        # get current camera state
-        center_np = self.camera_center.cpu().numpy()
-        scale_np = self.camera_scale.cpu().numpy()
         canvas_center = np.array([self.canvas_size / 2, self.canvas_size / 2])
 
         # transform node positions from world space to screen space
@@ -1,3 +1,5 @@
+from functools import partial
+
 import matplotlib.pyplot as plt
 
 import torch
@@ -165,7 +167,7 @@ class LennardJonesClusters(Benchmark):
 
     def get_loss(self):
         if self._make_images:
-            frame = visualize_cluster(self.positions.detach().cpu().view(-1)) # pylint:disable=not-callable
+            frame = partial(visualize_cluster, self.positions.detach().cpu().clone().view(-1)) # pylint:disable=not-callable
             self.log_image('cluster', frame, to_uint8=False)
 
         return cluster_potential(self.positions.unsqueeze(0))[0]
\ No newline at end of file
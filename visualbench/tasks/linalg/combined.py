@@ -53,14 +53,14 @@ class StochasticRLstsq(Benchmark):
         b, n, m = self.A.shape
         b, n, k = self.B.shape
         if self.vec:
-            self.V_a = self.sampler((self.batch_size, b, m, 1), device=self.A.device, dtype=self.A.dtype, generator=self.rng.torch(self.A.device))
+            self.V_a = self.sampler((self.batch_size, b, m, 1), device=self.A.device, dtype=self.A.dtype, generator=self.step_rng('V_a', self.A.device))
 
-            self.V_b = self.sampler((self.batch_size, b, k, 1), device=self.A.device, dtype=self.A.dtype, generator=self.rng.torch(self.A.device))
+            self.V_b = self.sampler((self.batch_size, b, k, 1), device=self.A.device, dtype=self.A.dtype, generator=self.step_rng('V_b', self.A.device))
 
         else:
-            self.V_a = self.sampler((self.batch_size, *self.A.mT.shape), device=self.A.device, dtype=self.A.dtype, generator=self.rng.torch(self.A.device))
+            self.V_a = self.sampler((self.batch_size, *self.A.mT.shape), device=self.A.device, dtype=self.A.dtype, generator=self.step_rng('V_a', self.A.device))
 
-            self.V_b = self.sampler((self.batch_size, *self.B.mT.shape), device=self.A.device, dtype=self.A.dtype, generator=self.rng.torch(self.A.device))
+            self.V_b = self.sampler((self.batch_size, *self.B.mT.shape), device=self.A.device, dtype=self.A.dtype, generator=self.step_rng('V_b', self.A.device))
 
     def get_loss(self):
         A = self.A; B = self.B; X = self.X
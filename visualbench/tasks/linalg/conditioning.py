@@ -74,7 +74,7 @@ class StochasticPreconditioner(Benchmark):
     def pre_step(self):
         b, m, n = self.A.shape
         k = max(m, n)
-        kw = {"device":self.A.device, "dtype":self.A.dtype, "generator":self.rng.torch(self.A.device)}
+        kw = {"device":self.A.device, "dtype":self.A.dtype, "generator":self.step_rng('v', self.A.device)}
         self.v = torch.randn(k, **kw)
         self.v_p = self.v + torch.randn(k, **kw) * self.sigma
 
@@ -41,13 +41,16 @@ class Inverse(Benchmark):
                 self.log_image('B', self.B, to_uint8=True, log_difference=True)
                 self.log_image('AB', AB, to_uint8=True)
                 self.log_image('BA', BA, to_uint8=True)
-                if self.algebra is None:
-                    B_inv = torch.linalg.inv_ex(self.B)[0] # pylint:disable=not-callable
-                    self.log_image('B inverse', B_inv, to_uint8=True, show_best=True, min=self.min, max=self.max)
-                    self.log_image('residual', (B_inv - self.A).abs_(), to_uint8=True)
 
         return torch.stack([loss1, loss2, loss3])
 
+    @torch.no_grad
+    def log_param_images(self):
+        if self.algebra is None:
+            B_inv = torch.linalg.inv_ex(self.B)[0] # pylint:disable=not-callable
+            self.log_image('B inverse', B_inv, to_uint8=True, show_best=True, min=self.min, max=self.max)
+            self.log_image('residual', (B_inv - self.A).abs_(), to_uint8=True)
+
 
 class StochasticInverse(Benchmark):
     """For a square ``A``, the objective is to find it's inverse ``B``
@@ -74,10 +77,10 @@ class StochasticInverse(Benchmark):
     def pre_step(self):
         if self.vec:
             b, n, n = self.A.shape # pylint:disable=redeclared-assigned-name
-            self.x = self.sampler((self.batch_size, b, n, 1), device=self.A.device, dtype=self.A.dtype, generator=self.rng.torch(self.A.device))
+            self.x = self.sampler((self.batch_size, b, n, 1), device=self.A.device, dtype=self.A.dtype, generator=self.step_rng('x', self.A.device))
 
         else:
-            self.x = self.sampler((self.batch_size, *self.A.shape), device=self.A.device, dtype=self.A.dtype, generator=self.rng.torch(self.A.device))
+            self.x = self.sampler((self.batch_size, *self.A.shape), device=self.A.device, dtype=self.A.dtype, generator=self.step_rng('x', self.A.device))
 
     def get_loss(self):
         A = self.A.unsqueeze(0); B = self.B.unsqueeze(0); x = self.x
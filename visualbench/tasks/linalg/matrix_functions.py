@@ -73,10 +73,10 @@ class StochasticMatrixRoot(Benchmark):
     def pre_step(self):
         if self.vec:
             b, n, m = self.A.shape
-            self.X = torch.randn((self.batch_size, b, 1, m), device=self.A.device, dtype=self.A.dtype, generator=self.rng.torch(self.A.device))
+            self.X = torch.randn((self.batch_size, b, 1, m), device=self.A.device, dtype=self.A.dtype, generator=self.step_rng('X', self.A.device))
 
         else:
-            self.X = torch.randn((self.batch_size, *self.A.shape), device=self.A.device, dtype=self.A.dtype, generator=self.rng.torch(self.A.device))
+            self.X = torch.randn((self.batch_size, *self.A.shape), device=self.A.device, dtype=self.A.dtype, generator=self.step_rng('X', self.A.device))
 
     def get_loss(self):
         B = self.B
@@ -236,10 +236,10 @@ class StochasticMatrixIdempotent(Benchmark):
         A = self.A
         if self.vec:
             b, n, m = A.shape
-            self.X = torch.randn((self.batch_size, b, 1, m), device=A.device, dtype=A.dtype, generator=self.rng.torch(A.device))
+            self.X = torch.randn((self.batch_size, b, 1, m), device=A.device, dtype=A.dtype, generator=self.step_rng('X', A.device))
 
         else:
-            self.X = torch.randn((self.batch_size, *self.A.shape), device=A.device, dtype=A.dtype, generator=self.rng.torch(A.device))
+            self.X = torch.randn((self.batch_size, *self.A.shape), device=A.device, dtype=A.dtype, generator=self.step_rng('X', A.device))
 
     def get_loss(self):
         A = self.A; B = self.B; X = self.X
@@ -307,7 +307,7 @@ class StochasticMatrixSign(Benchmark):
 
     def pre_step(self):
         b, n, m = self.A.shape
-        self.x = self.sampler((self.batch_size, b, m, 1), device=self.A.device, dtype=self.A.dtype, generator=self.rng.torch(self.A.device))
+        self.x = self.sampler((self.batch_size, b, m, 1), device=self.A.device, dtype=self.A.dtype, generator=self.step_rng('x', self.A.device))
 
     def get_loss(self):
         A = self.A.unsqueeze(0)
@@ -55,10 +55,10 @@ class StochasticMatrixRecovery(Benchmark):
     def pre_step(self):
         if self.vec:
             b, n, m = self.A.shape
-            self.X = self.sampler((self.batch_size, b, m, 1), device=self.A.device, dtype=self.A.dtype, generator=self.rng.torch(self.A.device))
+            self.X = self.sampler((self.batch_size, b, m, 1), device=self.A.device, dtype=self.A.dtype, generator=self.step_rng('X', self.A.device))
 
         else:
-            self.X = self.sampler((self.batch_size, *self.A.shape), device=self.A.device, dtype=self.A.dtype, generator=self.rng.torch(self.A.device))
+            self.X = self.sampler((self.batch_size, *self.A.shape), device=self.A.device, dtype=self.A.dtype, generator=self.step_rng('X', self.A.device))
 
     def get_loss(self):
         X = self.X
@@ -1,3 +1,5 @@
+from functools import partial
+
 import cv2
 import matplotlib.pyplot as plt
 import numpy as np
@@ -58,8 +60,7 @@ class ColoredParticles(Benchmark):
         self.point_radius_px = max(3, resolution // 100)
 
     @torch.no_grad
-    def _make_frame(self):
-        points = self.points.data.clone().detach().cpu().numpy()
+    def _make_frame(self, points: np.ndarray):
         group_ids = self.group_ids.cpu().numpy()
 
         frame = np.ones((self.resolution, self.resolution, 3), dtype=np.uint8) * 255
@@ -101,6 +102,6 @@ class ColoredParticles(Benchmark):
         loss = loss + 0.1 * penalty
 
         if self._make_images:
-            self.log_image('points', self._make_frame(), to_uint8=False, show_best=True)
+            self.log_image('points', partial(self._make_frame, self.points.detach().cpu().numpy().copy()), to_uint8=False, show_best=True)
 
         return loss
@@ -1,4 +1,6 @@
 # pylint:disable=no-member
+from functools import partial
+
 import cv2
 import numpy as np
 import torch
@@ -89,7 +91,7 @@ class HeilbronnTrianglesProblem(Benchmark):
         loss = -min_area + self._boundary_penalty()
 
         if self._make_images:
-            frame = self._make_frame(points.detach().cpu().numpy(), smallest_triangle_indices, min_area.item()) # pylint:disable=not-callable
+            frame = partial(self._make_frame, points.detach().cpu().numpy().copy(), smallest_triangle_indices, min_area.item()) # pylint:disable=not-callable
             self.log_image("solution", frame, to_uint8=False, show_best=True)
 
         return loss
@@ -1,5 +1,6 @@
 # pylint:disable=no-member
 import math
+from functools import partial
 
 import cv2
 import numpy as np
@@ -146,7 +147,7 @@ class ParticleDistanceRatio(Benchmark):
         loss = loss + self._oob_penalty()
 
         if self._make_images:
-            frame = self._make_frame(self.points.detach().cpu().numpy(), min_indices, max_indices) # pylint:disable=not-callable
+            frame = partial(self._make_frame, self.points.detach().cpu().numpy().copy(), min_indices, max_indices) # pylint:disable=not-callable
             self.log_image('points', frame, to_uint8=False, show_best=True)
 
         return loss
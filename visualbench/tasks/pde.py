@@ -205,20 +205,19 @@ class WavePINN(Benchmark):
         loss_bc = self.criterion(u_bc_pred_0, self.u_bc_true) + self.criterion(u_bc_pred_1, self.u_bc_true)
 
         total_loss = loss_pde + 100*(loss_ic_u + loss_ic_ut + loss_bc)
+        return total_loss
 
-        if self._make_images:
-            self.net.eval()
-            with torch.no_grad():
-                u_render = self.net(self.render_points)
-                u_render_grid = u_render.view(self.render_res, self.render_res)
-                self.log_image("u predicted", self._touin8(u_render_grid), to_uint8=False, show_best=True)
-
-                error_grid = torch.abs(u_render_grid - self.u_exact_grid)
-                error_grid /= self.vmax_error / 255
-                error_grid.clip_(0, 255)
-                img = error_grid.detach().cpu().numpy().astype(np.uint8)
-                self.log_image("error", cv2.applyColorMap(img, cv2.COLORMAP_JET)[:,:,::-1], to_uint8=False) # pylint:disable=no-member
+    def log_param_images(self):
+        self.net.eval()
+        with torch.no_grad():
+            u_render = self.net(self.render_points)
+            u_render_grid = u_render.view(self.render_res, self.render_res)
+            self.log_image("u predicted", self._touin8(u_render_grid), to_uint8=False, show_best=True)
 
-            self.net.train()
+            error_grid = torch.abs(u_render_grid - self.u_exact_grid)
+            error_grid /= self.vmax_error / 255
+            error_grid.clip_(0, 255)
+            img = error_grid.detach().cpu().numpy().astype(np.uint8)
+            self.log_image("error", cv2.applyColorMap(img, cv2.COLORMAP_JET)[:,:,::-1], to_uint8=False) # pylint:disable=no-member
 
-        return total_loss
+        self.net.train()
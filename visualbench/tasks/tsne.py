@@ -1,3 +1,4 @@
+from functools import partial
 from typing import Any, Literal
 
 import imageio
@@ -192,7 +193,7 @@ class TSNE(Benchmark):
 
         if self._make_images:
             with torch.no_grad():
-                frame = _make_frame(self._colors, self.Y.numpy(force=True), self.resolution)
+                frame = partial(_make_frame, self._colors, self.Y.numpy(force=True).copy(), self.resolution)
                 self.log_image('data', frame, to_uint8=False)
 
         self.iteration += 1
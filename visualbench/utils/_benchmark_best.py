@@ -0,0 +1,65 @@
+"""tracking parameters where best value of a metric was reached"""
+from typing import TYPE_CHECKING, Any
+
+import torch
+
+from . import _benchmark_utils
+
+if TYPE_CHECKING:
+    from ..benchmark import Benchmark
+
+
+class BestState:
+    """best value of a metric, step where it was reached and a copy of trainable parameters at that step.
+
+    In deferred metrics mode ``value`` and ``step`` are on-device tensors so that updating them doesn't need a sync."""
+    def __init__(self, maximize: bool):
+        self.maximize = maximize
+        self.clear()
+
+    def clear(self):
+        self.value: float | torch.Tensor = -float('inf') if self.maximize else float('inf')
+        self.step: int | torch.Tensor | None = None
+        self.params: torch.Tensor | None = None
+
+    def best_value(self) -> float:
+        if isinstance(self.value, torch.Tensor): return self.value.item()
+        return self.value
+
+    def best_step(self) -> int | None:
+        if isinstance(self.step, torch.Tensor): return int(self.step.item())
+        return self.step
+
+
+@torch.no_grad
+def _update_best_(self: "Benchmark", metric: str, value: Any):
+    """copies parameters into the buffer of ``metric`` if ``value`` is better than the best one"""
+    state = self._best_states[metric]
+
+    # value is on device, update without syncing
+    if isinstance(value, torch.Tensor) and self._deferred_chunk_size is not None and self.training:
+        vec = _benchmark_utils._params_to_vec(self)
+        if state.params is None or state.params.shape != vec.shape or state.params.device != vec.device:
+            state.params = vec.clone()
+
+        value = value.detach().reshape(()).to(dtype=torch.float64)
+        # allocated once and then updated in place
+        if not isinstance(state.value, torch.Tensor) or state.value.device != value.device:
+            state.value = torch.tensor(float(state.value), device=value.device, dtype=torch.float64)
+            state.step = torch.tensor(-1 if state.step is None else int(state.step), device=value.device)
+        assert isinstance(state.step, torch.Tensor)
+
+        improved = value > state.value if state.maximize else value < state.value
+        torch.where(improved, vec, state.params, out=state.params)
+        torch.where(improved, value, state.value, out=state.value)
+        state.step.masked_fill_(improved, self.num_forwards)
+        return
+
+    # parameters are only copied when value improves
+    value = float(value)
+    if (value > state.value) if state.maximize else (value < state.value):
+        vec = _benchmark_utils._params_to_vec(self)
+        if state.params is None or state.params.shape != vec.shape or state.params.device != vec.device: state.params = vec.clone()
+        else: state.params.copy_(vec)
+        state.value = value
+        state.step = self.num_forwards
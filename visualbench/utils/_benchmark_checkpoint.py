@@ -0,0 +1,170 @@
+"""periodic checkpoints of a benchmark run and resuming from them"""
+import os
+import random
+import time
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+import torch
+
+from . import _benchmark_images, _benchmark_testing, _benchmark_utils
+from .torch_tools import copy_state_dict
+
+if TYPE_CHECKING:
+    from ..benchmark import Benchmark
+
+_ATTRS = (
+    "num_forwards", "num_backwards", "num_extra", "num_steps", "num_epochs", "_last_train_loss", "_last_test_loss",
+    "_rng_step", "_previous_images", "_image_keys", "_image_lowest_keys", "_plot_keys",
+    "_frame_steps", "_next_frame_step", "_frame_interval", "_best_image_loss", "_best_image_steps", "_last_best_image_step",
+    "_best_states", "_best_snapshot_loss", "_best_snapshot_steps", "_last_best_snapshot_step",
+)
+"""attributes which are saved to and restored from checkpoints as is"""
+
+
+def _generator_state(generator: Any) -> Any:
+    if isinstance(generator, torch.Generator): return generator.get_state()
+    if isinstance(generator, np.random.Generator): return generator.bit_generator.state
+    return None
+
+def _set_generator_state(generator: Any, state: Any):
+    if state is None: return
+    if isinstance(generator, torch.Generator): generator.set_state(state)
+    elif isinstance(generator, np.random.Generator): generator.bit_generator.state = state
+
+def _dataloader_state(dataloader: Any) -> dict[str, Any]:
+    """state of shuffling generator and epoch counter of dataloaders with counter-based shuffling"""
+    return {"generator": _generator_state(getattr(dataloader, "generator", None)), "epoch": getattr(dataloader, "epoch", None)}
+
+def _set_dataloader_state(dataloader: Any, state: dict[str, Any]):
+    _set_generator_state(getattr(dataloader, "generator", None), state["generator"])
+    if state["epoch"] is not None: dataloader.epoch = state["epoch"]
+
+def _rng_state(self: "Benchmark") -> dict[str, Any]:
+    state = {
+        "key": self.rng.key,
+        "random": self.rng.random.getstate(),
+        "numpy": self.rng.numpy.bit_generator.state,
+        "torch": {k: g.get_state() for k, g in self.rng._torch_generators.items() if g is not None},
+        "global random": random.getstate(),
+        "global numpy": np.random.get_state(),
+        "global torch": torch.get_rng_state(),
+        "dltest": _dataloader_state(self._dltest),
+    }
+    if torch.cuda.is_available(): state["global cuda"] = torch.cuda.get_rng_state_all()
+    return state
+
+def _set_rng_state(self: "Benchmark", state: dict[str, Any]):
+    self.rng.key = state["key"]
+    self.rng.random.setstate(state["random"])
+    self.rng.numpy.bit_generator.state = state["numpy"]
+    for (type, index), s in state["torch"].items():
+        generator = self.rng.torch(torch.device(type, index))
+        if generator is not None: generator.set_state(s)
+
+    random.setstate(state["global random"])
+    np.random.set_state(state["global numpy"])
+    torch.set_rng_state(state["global torch"])
+    if "global cuda" in state and torch.cuda.is_available(): torch.cuda.set_rng_state_all(state["global cuda"])
+    _set_dataloader_state(self._dltest, state["dltest"])
+
+
+def _start_epoch_(self: "Benchmark") -> Any:
+    """called at the start of each train epoch, returns batches to iterate over. On first epoch stores state of dataloader shuffling
+    so that it can be replayed, and on each epoch stores state of global torch generator, which dataloaders without
+    a generator (e.g. torch ``DataLoader``) use to shuffle. When resuming returns remaining batches of interrupted epoch."""
+    self._epoch_start_step = self.num_steps - self._skip_batches
+    if self._resume_batches is not None:
+        batches, self._resume_batches, self._skip_batches = self._resume_batches, None, 0
+        return batches
+
+    if self._checkpoint_path is not None:
+        if self.num_epochs == 0: self._dltrain_state = _dataloader_state(self._dltrain)
+        self._epoch_rng_state = torch.get_rng_state()
+    return self._dltrain
+
+def _replay_epochs_(self: "Benchmark", state: Any, num_epochs: int):
+    """restores dataloader generator to state at the start of the run and starts ``num_epochs`` epochs,
+    since dataloaders shuffled by a stateful generator (e.g. dataloaders with non-int seed)
+    advance it every epoch, so order depends on all previous epochs"""
+    if state is None or (state["generator"] is None and state["epoch"] is None): return
+    _set_dataloader_state(self._dltrain, state)
+    for _ in range(num_epochs): next(iter(self._dltrain), None) # type:ignore
+
+def _to_float(value: Any) -> Any:
+    # best losses tracked on device in deferred metrics mode, a float is moved to device of the loss when resumed
+    if isinstance(value, torch.Tensor) and value.ndim == 0: return value.item()
+    return value
+
+def _checkpoint(self: "Benchmark", optimizer: torch.optim.Optimizer | None) -> dict[str, Any]:
+    # make sure logger has everything
+    _benchmark_utils._flush_deferred_metrics_(self)
+    _benchmark_images._join_images_(self)
+    _benchmark_testing._join_tests_(self)
+
+    return {
+        "state_dict": self.state_dict(),
+        "initial_state_dict": self._initial_state_dict,
+        "optimizer": optimizer.state_dict() if optimizer is not None else None,
+        "logger": self.logger,
+        "attrs": {k: _to_float(getattr(self, k)) for k in _ATTRS},
+        "param_snapshots": self._param_snapshots,
+        "rng": _rng_state(self),
+        "seconds": self.seconds_passed,
+        "run_kwargs": self._run_kwargs,
+        "batch_in_epoch": self.num_steps - self._epoch_start_step,
+        "dltrain": self._dltrain_state,
+        "epoch rng": self._epoch_rng_state,
+    }
+
+def save_checkpoint(self: "Benchmark", path: str, optimizer: torch.optim.Optimizer | None):
+    """writes checkpoint to a temporary file and then renames it to ``path`` so that it is never partially written"""
+    tmp = f"{path}.tmp"
+    torch.save(_checkpoint(self, optimizer), tmp)
+    os.replace(tmp, path)
+    self._last_checkpoint_time = time.time()
+
+def _maybe_checkpoint_(self: "Benchmark", optimizer: torch.optim.Optimizer | None):
+    """called after each optimizer step, saves a checkpoint if it is due"""
+    if self._checkpoint_path is None: return
+    due = self._checkpoint_every_steps is not None and self.num_steps % self._checkpoint_every_steps == 0
+    if self._checkpoint_every_seconds is not None and time.time() - self._last_checkpoint_time >= self._checkpoint_every_seconds: due = True
+    if due: save_checkpoint(self, self._checkpoint_path, optimizer)
+
+@torch.no_grad
+def load_checkpoint_(self: "Benchmark", path: str, optimizer: torch.optim.Optimizer | None) -> dict[str, Any]:
+    """loads checkpoint into this benchmark and ``optimizer``, returns run kwargs"""
+    if self._trajectory is not None:
+        raise RuntimeError("trajectory recorder is not saved in checkpoints, call `set_trajectory_recorder(False)` to resume without it")
+    self.reset()
+    # random generator states have to stay on CPU
+    checkpoint = torch.load(path, map_location='cpu', weights_only=False)
+
+    self.load_state_dict(checkpoint["state_dict"])
+    if checkpoint["initial_state_dict"] is not None:
+        self._initial_state_dict = copy_state_dict(checkpoint["initial_state_dict"], device=self.device)
+    if optimizer is not None and checkpoint["optimizer"] is not None: optimizer.load_state_dict(checkpoint["optimizer"])
+    self.logger = checkpoint["logger"]
+    for k, v in checkpoint["attrs"].items(): setattr(self, k, v)
+    self._param_snapshots = {k: v.to(self.device) for k, v in checkpoint["param_snapshots"].items()}
+
+    # dataloader shuffles same as in interrupted epoch, and already done batches are skipped
+    self._dltrain_state = checkpoint["dltrain"]
+    self._epoch_rng_state = checkpoint["epoch rng"]
+    self._skip_batches = checkpoint["batch_in_epoch"]
+    _replay_epochs_(self, self._dltrain_state, self.num_epochs)
+    if self._dltrain is not None:
+        if self._epoch_rng_state is not None: torch.set_rng_state(self._epoch_rng_state)
+        self._resume_batches = iter(self._dltrain)
+        for _ in range(self._skip_batches): next(self._resume_batches, None)
+
+    # after dataloader because ones without a generator shuffle using global torch generator
+    _set_rng_state(self, checkpoint["rng"])
+
+    # timer continues from where it stopped
+    self._current_time = self._last_test_time = self._last_checkpoint_time = time.time()
+    if checkpoint["seconds"] is not None:
+        self.start_time = self._current_time - checkpoint["seconds"]
+        self._category_totals_at_start = self._profiler.category_totals.copy()
+
+    return checkpoint["run_kwargs"]
@@ -0,0 +1,230 @@
+"""vectorized execution of multiple copies of a benchmark"""
+import copy
+import itertools
+import warnings
+from collections.abc import Callable, Iterable
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+import torch
+
+from . import _benchmark_noise, _benchmark_profiling, _benchmark_utils
+from .format import totensor, tonumpy
+
+if TYPE_CHECKING:
+    from ..benchmark import Benchmark
+
+
+class _GetLoss(torch.nn.Module):
+    """wraps a benchmark so that ``torch.func.functional_call`` calls ``get_loss`` instead of ``forward``"""
+    def __init__(self, benchmark: "Benchmark"):
+        super().__init__()
+        self.benchmark = benchmark
+
+    def forward(self):
+        ret = self.benchmark.get_loss()
+        if ret.numel() > 1:
+            if self.benchmark._multiobjective_func is None:
+                raise RuntimeError(f"{self.benchmark.__class__.__name__} returned multiple values but multiobjective "
+                                   "function is not set. Add `self.set_multiobjective_func` to `__init__`.")
+            return self.benchmark._multiobjective_func(ret)
+        return ret.squeeze()
+
+
+def _make_batched_loss(self: "Benchmark") -> Callable[..., torch.Tensor]:
+    """returns function which takes stacked trainable parameters of this benchmark (each has extra leading dimension),
+    and returns vector of losses calculated via ``torch.vmap`` over ``get_loss``."""
+    wrapper = _GetLoss(self)
+    names = [f'benchmark.{n}' for n, p in self.named_parameters() if p.requires_grad]
+
+    def loss_fn(*params):
+        return torch.func.functional_call(wrapper, dict(zip(names, params)), ())
+
+    return torch.vmap(loss_fn)
+
+def _batched_get_loss(self: "Benchmark", params: list[torch.Tensor]) -> torch.Tensor:
+    """evaluates ``get_loss`` on stacked ``params`` without any logging, images are disabled during evaluation."""
+    make_images = self._make_images
+    self._make_images = False
+    try:
+        return _make_batched_loss(self)(*params)
+    finally:
+        self._make_images = make_images
+
+
+def _trainable(self: "Benchmark"):
+    return [p for p in self.parameters() if p.requires_grad]
+
+def _vmap_failed_(self: "Benchmark", e: RuntimeError):
+    """called when ``get_loss`` raised under ``torch.vmap``, after that this benchmark always uses the loop.
+    If the error isn't caused by vmap, the loop raises it again."""
+    self._vmap_supported = False
+    warnings.warn(f"{self.__class__.__name__}.get_loss doesn't support torch.vmap, evaluating one by one instead. Error: {e!r}")
+
+@torch.no_grad
+def _log_forward_(self: "Benchmark", loss: float, backward: bool = True):
+    """does same logging and bookkeeping as ``forward`` followed by ``post_closure(backward)``"""
+    self.log('loss', loss)
+    self._last_train_loss = loss
+    if self.num_forwards == 2: _benchmark_profiling._start_timer_(self)
+    self.post_closure(backward)
+
+
+def _unflatten_batch(self: "Benchmark", X: torch.Tensor) -> list[torch.Tensor]:
+    """splits ``(P, ndim)`` population into stacked parameters"""
+    params = []
+    offset = 0
+    for p in _trainable(self):
+        params.append(X[:, offset:offset+p.numel()].view(X.shape[0], *p.shape))
+        offset += p.numel()
+    return params
+
+@torch.no_grad
+def _loss_at_batch(self: "Benchmark", X: Any) -> Any:
+    from ..benchmark import StopCondition
+
+    Xt = totensor(X, device=self.device, dtype=self.dtype)
+    if Xt.ndim != 2 or Xt.shape[1] != self.ndim:
+        raise ValueError(f"population must have shape (P, {self.ndim}), got {tuple(Xt.shape)}")
+
+    # images are logged on every forward pass so they need the loop,
+    # and parameter noise needs two evaluations per point
+    losses = None
+    if self._vmap_supported is not False and not self._make_images and self._param_noise_alpha == 0 and self.training:
+        if self._initial_state_dict is None: _benchmark_utils._store_initial_state_dict_(self)
+
+        try:
+            with torch.enable_grad(), self._profiler.phase('get_loss'):
+                losses = _batched_get_loss(self, _unflatten_batch(self, Xt.contiguous())).detach()
+            self._vmap_supported = True
+
+        except RuntimeError as e:
+            # get_loss doesn't support vmap, for example because of data-dependent control flow
+            _vmap_failed_(self, e)
+
+    if losses is None:
+        values = [self.loss_at(x) for x in Xt]
+        if isinstance(X, torch.Tensor): return torch.tensor(values).to(X)
+        return np.asarray(values)
+
+    # do same bookkeeping as P evaluations of ``loss_at``,
+    # parameters only need to be set to each point if they are logged or if test epoch may run
+    set_each = self._dltest is not None or (not self._benchmark_mode and (self._log_params is not False or self._num_projections != 0 or self._trajectory is not None or len(self._best_states) != 0))
+    for i, loss in enumerate(losses.cpu().tolist()):
+        msg = _benchmark_utils._should_stop(self)
+        if msg is not None:
+            if i != 0 and not set_each: self._set_x_(Xt[i-1])
+            raise StopCondition(msg)
+        if set_each: self._set_x_(Xt[i])
+        _log_forward_(self, loss, backward=False)
+
+    if not set_each: self._set_x_(Xt[-1])
+
+    if isinstance(X, torch.Tensor): return losses.to(X)
+    return tonumpy(losses)
+
+
+def _run_ensemble(
+    self: "Benchmark",
+    opt_fn: Callable[[list[torch.Tensor], Any], torch.optim.Optimizer],
+    values: Iterable[Any],
+    **run_kwargs,
+) -> "list[Benchmark]":
+    from ..benchmark import StopCondition
+
+    if self._param_noise_alpha != 0: raise RuntimeError("ensemble doesn't support parameter noise")
+    values = list(values)
+
+    # this also stores initial state dict so that all copies start from the same point
+    self._setup_run_(**run_kwargs)
+
+    # copies share dataloaders
+    memo = {id(self._dltrain): self._dltrain, id(self._dltest): self._dltest}
+    members: "list[Benchmark]" = [copy.deepcopy(self, memo.copy()).reset() for _ in values]
+    optimizers = [opt_fn(_trainable(m), v) for m, v in zip(members, values)]
+    for m in members:
+        m.set_print_inverval(None)
+        m._setup_run_(**run_kwargs)
+
+    max_epochs = run_kwargs.get('max_epochs', None)
+    active = list(range(len(members)))
+    use_vmap = self._vmap_supported is not False
+
+    def finish(i: int):
+        active.remove(i)
+        members[i]._finish_run_(optimizers[i])
+
+    try:
+        for _ in range(max_epochs) if max_epochs is not None else itertools.count():
+            for batch in ([None] if self._dltrain is None else self._dltrain):
+                if len(active) == 0: break
+
+                for i in active.copy():
+                    m = members[i]
+                    if batch is not None: m.batch = batch
+                    # otherwise this is done by one_step
+                    if use_vmap:
+                        m._rng_step += 1
+                        _benchmark_noise._update_noise_(m)
+                        m.pre_step()
+                    if _benchmark_utils._should_stop(m) is not None: finish(i)
+
+                if len(active) == 0: break
+
+                # evaluate all copies in one pass
+                losses = None
+                if use_vmap:
+                    if batch is not None: self.batch = batch
+                    self._rng_step += 1 # same as active members, so pre_step samples the same
+                    self.pre_step()
+                    for i in active: members[i].zero_grad()
+
+                    params = [torch.stack(p) for p in zip(*(_trainable(members[i]) for i in active))]
+                    try:
+                        with torch.enable_grad():
+                            losses = _batched_get_loss(self, params)
+                            losses.sum().backward()
+
+                    except RuntimeError as e:
+                        # get_loss doesn't support vmap, for example because of data-dependent control flow
+                        _vmap_failed_(self, e)
+                        use_vmap = False
+                        losses = None
+                        # one_step repeats pre_step of this step
+                        for i in active: members[i]._rng_step -= 1
+
+                if losses is None:
+                    for i in active.copy():
+                        try: members[i].one_step(optimizers[i])
+                        except StopCondition: finish(i)
+                    continue
+
+                cpu_losses = losses.detach().cpu().tolist()
+                for j, (loss, i) in enumerate(zip(cpu_losses, active.copy())):
+                    m = members[i]
+                    _log_forward_(m, loss)
+
+                    # first closure evaluation returns loss that was already evaluated
+                    cache = [losses[j].detach()]
+                    def closure(backward=True, m=m, cache=cache):
+                        if len(cache) != 0: return cache.pop()
+                        return m.closure(backward)
+
+                    try:
+                        optimizers[i].step(closure)
+                    except StopCondition:
+                        finish(i)
+                        continue
+
+                    m.num_steps += 1
+                    m.num_extra += m._extra_passes_per_step
+                    for cb in m._post_step_callbacks: cb(m)
+
+            if len(active) == 0: break
+            for i in active: members[i].num_epochs += 1
+
+    except KeyboardInterrupt:
+        pass
+
+    for i in active.copy(): finish(i)
+    return members
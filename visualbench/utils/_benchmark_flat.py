@@ -0,0 +1,91 @@
+"""storing all trainable parameters and their gradients in a single contiguous buffer"""
+from typing import TYPE_CHECKING
+
+import torch
+
+if TYPE_CHECKING:
+    from ..benchmark import Benchmark
+
+
+def _trainable(self: "Benchmark") -> list[torch.Tensor]:
+    return [p for p in self.parameters() if p.requires_grad]
+
+def _is_view(tensor: torch.Tensor | None, flat: torch.Tensor, offset: int) -> bool:
+    """whether ``tensor`` is stored in ``flat`` starting at ``offset``"""
+    if tensor is None: return False
+    return tensor.is_contiguous() and tensor.data_ptr() == flat.data_ptr() + offset * flat.element_size()
+
+def _params_are_views(self: "Benchmark", params: list[torch.Tensor]) -> bool:
+    flat = self._flat_x
+    if flat is None or flat.device != params[0].device or flat.dtype != params[0].dtype: return False
+    if sum(p.numel() for p in params) != flat.numel(): return False
+
+    offset = 0
+    for p in params:
+        if not _is_view(p, flat, offset): return False
+        offset += p.numel()
+    return True
+
+@torch.no_grad
+def _flatten_(self: "Benchmark"):
+    """makes all trainable parameters and their gradients views into ``self._flat_x`` and ``self._flat_grad``,
+    does nothing if they already are. Parameters are re-flattened if something replaced them, e.g. ``.to`` or ``reset``."""
+    params = _trainable(self)
+    if len(params) == 0: return
+    if _params_are_views(self, params):
+        _ensure_grad_views_(self)
+        return
+
+    ref = params[0]
+    if any(p.device != ref.device or p.dtype != ref.dtype for p in params):
+        raise RuntimeError(f"{self.__class__.__name__} has parameters with different devices or dtypes, they can't be flattened")
+
+    flat = torch.empty(sum(p.numel() for p in params), device=ref.device, dtype=ref.dtype)
+    flat_grad = torch.zeros_like(flat)
+
+    offset = 0
+    for p in params:
+        numel = p.numel()
+        flat[offset:offset+numel].view_as(p).copy_(p)
+        p.data = flat[offset:offset+numel].view_as(p)
+
+        grad = flat_grad[offset:offset+numel].view_as(p)
+        if p.grad is not None: grad.copy_(p.grad)
+        p.grad = grad
+        offset += numel
+
+    self._flat_x = flat
+    self._flat_grad = flat_grad
+
+@torch.no_grad
+def _ensure_grad_views_(self: "Benchmark"):
+    """makes gradients views into ``self._flat_grad`` again if they were replaced or set to None, e.g. by ``zero_grad``"""
+    flat_grad = self._flat_grad
+    assert flat_grad is not None
+
+    offset = 0
+    for p in _trainable(self):
+        numel = p.numel()
+        if not _is_view(p.grad, flat_grad, offset):
+            grad = flat_grad[offset:offset+numel].view_as(p)
+            if p.grad is None: grad.zero_()
+            else: grad.copy_(p.grad)
+            p.grad = grad
+        offset += numel
+
+@torch.no_grad
+def _zero_grad_(self: "Benchmark"):
+    """zeroes the flat gradient buffer in place"""
+    _flatten_(self)
+    assert self._flat_grad is not None
+    self._flat_grad.zero_()
+
+def _flat_grad(self: "Benchmark") -> torch.Tensor:
+    """flat gradient, falls back to concatenation if gradients can't be views, e.g. when they have a graph due to ``create_graph=True``"""
+    params = _trainable(self)
+    if any(p.grad is not None and p.grad.requires_grad for p in params):
+        return torch.cat([p.grad.ravel() if p.grad is not None else torch.zeros_like(p).ravel() for p in params])
+
+    _flatten_(self)
+    assert self._flat_grad is not None
+    return self._flat_grad
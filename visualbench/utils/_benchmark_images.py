@@ -0,0 +1,397 @@
+"""image logging, optionally on a background thread"""
+import bisect
+import queue
+import threading
+from collections.abc import Callable
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+import torch
+
+from . import _benchmark_utils
+from .format import normalize_to_uint8
+
+if TYPE_CHECKING:
+    from ..benchmark import Benchmark
+
+
+class ImageWorker:
+    """Runs submitted functions in order on a background thread.
+
+    The queue holds at most ``max_queue`` items, ``submit`` blocks when it is full.
+    The thread exits after being idle for ``idle_timeout`` seconds and is restarted on next ``submit``.
+    Exceptions are re-raised on next ``submit`` or ``join``.
+    """
+    def __init__(self, max_queue: int = 64, idle_timeout: float = 1):
+        self.max_queue = max_queue
+        self.idle_timeout = idle_timeout
+        self._queue: queue.Queue[tuple[Callable, tuple]] = queue.Queue(max_queue)
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._error: BaseException | None = None
+
+    def __deepcopy__(self, memo):
+        return ImageWorker(self.max_queue, self.idle_timeout)
+
+    def submit(self, fn: Callable, *args):
+        self._raise_error()
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, daemon=True)
+                self._thread.start()
+            self._queue.put((fn, args))
+
+    def join(self):
+        """waits until all submitted functions are done"""
+        self._queue.join()
+        self._raise_error()
+
+    def _raise_error(self):
+        if self._error is not None:
+            error = self._error
+            self._error = None
+            raise error
+
+    def _loop(self):
+        while True:
+            try: fn, args = self._queue.get(timeout=self.idle_timeout)
+            except queue.Empty:
+                with self._lock:
+                    if self._queue.empty():
+                        self._thread = None
+                        return
+                continue
+
+            try:
+                if self._error is None: fn(*args)
+            except Exception as e: # pylint:disable=broad-exception-caught
+                self._error = e
+            finally:
+                self._queue.task_done()
+
+
+def _join_images_(self: "Benchmark"):
+    """waits for all images to be processed if asynchronous image logging is enabled"""
+    if self._image_worker is not None: self._image_worker.join()
+
+@torch.no_grad
+def _process_image_(
+    self: "Benchmark",
+    step: int,
+    name: str,
+    image: "np.ndarray | torch.Tensor | Callable[[], Any]",
+    to_uint8: bool,
+    min: Any,
+    max: Any,
+    log_difference: bool,
+):
+    """converts image, computes difference and logs both, this runs on the worker thread if it is enabled"""
+    if callable(image): image = image()
+    if isinstance(image, torch.Tensor): image = image.detach().cpu()
+
+    if not to_uint8:
+        if image.dtype not in (np.uint8, torch.uint8):
+            raise RuntimeError(f"image needs to be in uint8 dtype, or to_uint8 needs to be True, got {image.dtype}")
+
+    # difference
+    k = difference = None
+    if log_difference:
+        k = f'{name} (difference)'
+
+        if name not in self._previous_images: difference = image
+        else: difference = self._previous_images[name] - image
+
+        self._previous_images[name] = image
+        if to_uint8: difference = normalize_to_uint8(difference)
+
+    # value
+    if to_uint8:
+        image = normalize_to_uint8(image, min=min, max=max)
+
+    self.logger.log(step, name, image)
+
+    # log difference after image so that order is better
+    if (k is not None) and (difference is not None):
+        self.logger.log(step, k, difference)
+
+
+# ------------------------------- frame budget ------------------------------- #
+def _reset_frames_(self: "Benchmark"):
+    self._frame_steps: list[int] = []
+    self._next_frame_step: int = 0
+    if self._image_budget is None or self._image_schedule == 'linear': self._frame_interval: float = 1
+    else: self._frame_interval = max(self._image_budget // 10, 1)
+
+    self._pending_best_images: list[tuple] | None = None
+    self._best_image_loss: float | torch.Tensor = float('inf')
+    self._best_image_steps: set[int] = set()
+    self._last_best_image_step: dict[str, int] = {}
+    self._image_gaps: list[_Gap] = []
+    self._image_gap: _Gap | None = None
+
+    self._param_snapshots: dict[int, torch.Tensor] = {}
+    self._best_snapshot_loss: float | torch.Tensor = float('inf')
+    self._best_snapshot_steps: set[int] = set()
+    self._last_best_snapshot_step: int | None = None
+    self._snapshot_gaps: list[_Gap] = []
+    self._snapshot_gap: _Gap | None = None
+
+def _is_frame_step(self: "Benchmark") -> bool:
+    """whether images should be logged on current forward pass according to image budget"""
+    if self._image_budget is None or not self.training: return True
+    step = self.num_forwards
+    if len(self._frame_steps) != 0 and self._frame_steps[-1] == step: return True
+    return step >= self._next_frame_step
+
+def _max_frames(self: "Benchmark") -> int:
+    """show_best images are also kept on one step between each two frames, so with them frames get half of the budget"""
+    assert self._image_budget is not None
+    if len(self._image_lowest_keys) != 0 or self._deferred_images: return max(self._image_budget // 2, 1)
+    return self._image_budget
+
+def _add_frame_step_(self: "Benchmark") -> bool:
+    """adds current step to frames, returns False if thinning removed it"""
+    step = self.num_forwards
+    if len(self._frame_steps) != 0 and self._frame_steps[-1] == step: return True
+    self._frame_steps.append(step)
+    if len(self._frame_steps) > _max_frames(self): _thin_frames_(self)
+
+    last = self._frame_steps[-1]
+    if self._image_schedule == 'linear': self._next_frame_step = last + int(self._frame_interval)
+    else: self._next_frame_step = last + max(1, int(last / self._frame_interval))
+    return last == step
+
+def _needed_best_steps(frame_steps: list[int], best_steps: set[int]) -> set[int]:
+    """best images shown on ``frame_steps`` - latest step where loss improved before or on each frame, and current best"""
+    if len(best_steps) == 0: return set()
+    best = sorted(best_steps)
+    needed = {best[-1]}
+    for frame in frame_steps:
+        idx = bisect.bisect_right(best, frame)
+        if idx != 0: needed.add(best[idx-1])
+    return needed
+
+def _thin_frames_(self: "Benchmark"):
+    """removes every other frame and doubles the interval between frames,
+    and removes images at steps where loss improved which are no longer shown on any frame"""
+    _resolve_best_(self)
+    dropped = self._frame_steps[1::2]
+    self._frame_steps = self._frame_steps[::2]
+    if self._image_schedule == 'linear': self._frame_interval *= 2
+    else: self._frame_interval /= 2
+
+    best_image_steps = _needed_best_steps(self._frame_steps, self._best_image_steps)
+    dropped.extend(self._best_image_steps - best_image_steps)
+    self._best_image_steps = best_image_steps
+
+    # images at steps where loss improved are kept for show_best
+    keep = {k: set(best_image_steps) for k in self._image_lowest_keys}
+    _submit_(self, _delete_images_, self, list(dropped), keep)
+
+    best_snapshot_steps = _needed_best_steps(self._frame_steps, self._best_snapshot_steps)
+    dropped.extend(self._best_snapshot_steps - best_snapshot_steps)
+    self._best_snapshot_steps = best_snapshot_steps
+    frame_steps = set(self._frame_steps)
+    for step in dropped:
+        if step not in best_snapshot_steps and step not in frame_steps: self._param_snapshots.pop(step, None)
+
+def _delete_images_(self: "Benchmark", steps: list[int], keep: dict[str, set[int]]):
+    for key in self._image_keys:
+        if key not in self.logger: continue
+        history = self.logger[key]
+        for step in steps:
+            if step in keep.get(key, ()): continue
+            if step in history: del history[step]
+
+def _submit_(self: "Benchmark", fn: Callable, *args):
+    """runs ``fn`` on image worker if it is enabled so that it runs after all previously submitted images"""
+    if self._image_worker is None: fn(*args)
+    else: self._image_worker.submit(fn, *args)
+
+class _Gap:
+    """steps between a frame and the next frame in deferred metrics mode, keeps whether loss improved on the frame,
+    latest step after it where loss improved and copies of tensors from that step on device, so that updating doesn't need a sync"""
+    def __init__(self, frame: int, device: torch.device):
+        self.frame = frame
+        self.frame_improved = torch.zeros((), dtype=torch.int64, device=device)
+        self.step = torch.full((), -1, dtype=torch.int64, device=device)
+        self.tensors: dict[str, tuple[torch.Tensor, tuple]] = {}
+        self.resolved_frame = False
+        self.resolved: int | None = None
+
+    def update(self, improved: torch.Tensor, step: int, tensors: dict[str, tuple[torch.Tensor, tuple]]):
+        if step == self.frame:
+            self.frame_improved.masked_fill_(improved, 1)
+            return
+        self.step.masked_fill_(improved, step)
+        for name, (tensor, args) in tensors.items():
+            buffer = self.tensors.get(name, None)
+            if buffer is None or buffer[0].shape != tensor.shape or buffer[0].dtype != tensor.dtype:
+                self.tensors[name] = (tensor.clone(), args)
+            else:
+                torch.where(improved, tensor, buffer[0], out=buffer[0])
+                self.tensors[name] = (buffer[0], args)
+
+def _improved_(best: float | torch.Tensor, loss: torch.Tensor) -> tuple[torch.Tensor, torch.Tensor]:
+    """returns ``(loss <= best, new best)`` on device"""
+    loss = loss.detach().reshape(()).to(dtype=torch.float64)
+    if not isinstance(best, torch.Tensor): best = torch.tensor(best, device=loss.device, dtype=torch.float64)
+    improved = loss <= best
+    torch.where(improved, loss, best, out=best)
+    return improved, best
+
+def _gaps(gaps: list[_Gap], gap: _Gap | None) -> list[_Gap]:
+    if gap is None: return gaps
+    return [*gaps, gap]
+
+def _resolve_best_(self: "Benchmark"):
+    """commits best images and parameter snapshots tracked on device in deferred metrics mode,
+    called when deferred metrics are flushed and before frames are thinned"""
+    image_gaps = _gaps(self._image_gaps, self._image_gap)
+    snapshot_gaps = _gaps(self._snapshot_gaps, self._snapshot_gap)
+    if len(image_gaps) + len(snapshot_gaps) == 0: return
+
+    # one sync for all gaps
+    values = torch.stack([v for g in image_gaps + snapshot_gaps for v in (g.frame_improved, g.step)]).tolist()
+    for i, gap in enumerate(image_gaps + snapshot_gaps):
+        frame_improved, step = values[2*i:2*i+2]
+        commit = _commit_best_images_ if i < len(image_gaps) else _commit_best_snapshot_
+        if frame_improved and not gap.resolved_frame:
+            commit(self, gap.frame, gap.frame, None)
+            gap.resolved_frame = True
+
+        if step < 0 or step == gap.resolved: continue
+        # current gap keeps being updated, so tensors are copied
+        tensors = {name: (t.clone() if gap is self._image_gap or gap is self._snapshot_gap else t, args) for name, (t, args) in gap.tensors.items()}
+        if commit is _commit_best_images_: commit(self, step, gap.frame, [(name, t, *args) for name, (t, args) in tensors.items()])
+        else: commit(self, step, gap.frame, tensors["params"][0])
+        gap.resolved = step
+
+    self._image_gaps.clear()
+    self._snapshot_gaps.clear()
+
+def _commit_best_images_(self: "Benchmark", step: int, last_frame: int, pending: list[tuple] | None):
+    """records that loss improved on ``step`` and processes ``show_best`` images that were made on it if it is not a frame"""
+    self._best_image_steps.add(step)
+
+    # only latest improvement since last frame is needed
+    for key in self._image_lowest_keys:
+        previous = self._last_best_image_step.get(key, None)
+        if previous is not None and previous > last_frame and previous != step:
+            self._best_image_steps.discard(previous)
+            _submit_(self, _delete_images_, self, [previous], {})
+        self._last_best_image_step[key] = step
+
+    if pending is not None:
+        for args in pending: _submit_(self, _process_image_, self, step, *args)
+
+def _update_best_images_(self: "Benchmark", loss: Any, pending: list[tuple] | None):
+    """called after loss is evaluated, commits ``show_best`` images that were logged on non-frame step if loss improved.
+    In deferred metrics mode if loss and images are tensors this doesn't sync, images are kept on device
+    and committed by ``_resolve_best_``. ``pending`` is None on frame steps."""
+    if len(self._image_lowest_keys) == 0: return
+    step = self.num_forwards
+    last_frame = self._frame_steps[-1] if len(self._frame_steps) != 0 else -1
+
+    if isinstance(loss, torch.Tensor) and self._deferred_chunk_size is not None and \
+        (pending is None or all(isinstance(args[1], torch.Tensor) for args in pending)):
+        if self._image_gap is None or self._image_gap.frame != last_frame:
+            if self._image_gap is not None: self._image_gaps.append(self._image_gap)
+            self._image_gap = _Gap(last_frame, loss.device)
+
+        improved, self._best_image_loss = _improved_(self._best_image_loss, loss)
+        tensors = {} if pending is None else {args[0]: (args[1], args[2:]) for args in pending}
+        self._image_gap.update(improved, step, tensors)
+        return
+
+    if isinstance(self._best_image_loss, torch.Tensor):
+        _resolve_best_(self)
+        self._best_image_loss = self._best_image_loss.item()
+        self._image_gap = None
+
+    if isinstance(loss, torch.Tensor): loss = loss.item()
+    if not loss <= self._best_image_loss: return
+    self._best_image_loss = loss
+    _commit_best_images_(self, step, last_frame, pending)
+
+
+# ------------------------------ deferred images ----------------------------- #
+def _commit_best_snapshot_(self: "Benchmark", step: int, last_frame: int, params: torch.Tensor | None):
+    """records that loss improved on ``step`` and stores ``params`` snapshot if it is not a frame"""
+    self._best_snapshot_steps.add(step)
+
+    # only latest improvement since last frame is needed
+    previous = self._last_best_snapshot_step
+    if step != last_frame and previous is not None and previous > last_frame and previous != step:
+        self._best_snapshot_steps.discard(previous)
+        self._param_snapshots.pop(previous, None)
+    self._last_best_snapshot_step = step
+
+    if params is not None: self._param_snapshots[step] = params
+
+@torch.no_grad
+def _snapshot_params_(self: "Benchmark", loss: Any, is_frame: bool):
+    """stores a copy of trainable parameters on frame steps and on steps where loss improved,
+    images are made from them by ``_materialize_images_``.
+    In deferred metrics mode the copy on steps where loss improved is kept in a device buffer
+    and committed by ``_resolve_best_``, so this doesn't sync."""
+    step = self.num_forwards
+    vec = _benchmark_utils._params_to_vec(self)
+
+    if isinstance(loss, torch.Tensor) and self._deferred_chunk_size is not None:
+        if is_frame:
+            self._param_snapshots[step] = vec.clone() if self._flat_params else vec
+            if self._snapshot_gap is not None: self._snapshot_gaps.append(self._snapshot_gap)
+            self._snapshot_gap = _Gap(step, loss.device)
+
+        elif self._snapshot_gap is None:
+            self._snapshot_gap = _Gap(self._frame_steps[-1] if len(self._frame_steps) != 0 else -1, loss.device)
+
+        improved, self._best_snapshot_loss = _improved_(self._best_snapshot_loss, loss)
+        self._snapshot_gap.update(improved, step, {} if is_frame else {"params": (vec, ())})
+        return
+
+    if isinstance(self._best_snapshot_loss, torch.Tensor):
+        _resolve_best_(self)
+        self._best_snapshot_loss = self._best_snapshot_loss.item()
+        self._snapshot_gap = None
+
+    if isinstance(loss, torch.Tensor): loss = loss.item()
+    improved = loss <= self._best_snapshot_loss
+    if not (is_frame or improved): return
+
+    if self._flat_params: vec = vec.clone()
+    if is_frame: self._param_snapshots[step] = vec
+    if improved:
+        self._best_snapshot_loss = loss
+        last_frame = self._frame_steps[-1] if len(self._frame_steps) != 0 else -1
+        _commit_best_snapshot_(self, step, step if is_frame else last_frame, None if is_frame else vec)
+
+@torch.no_grad
+def _materialize_images_(self: "Benchmark"):
+    """runs ``log_param_images`` on all stored parameter snapshots, then restores parameters"""
+    if len(self._param_snapshots) == 0: return
+
+    x = _benchmark_utils._params_to_vec(self).clone()
+    num_forwards = self.num_forwards
+    make_images = self._make_images
+    self._make_images = True
+    frame_steps = set(self._frame_steps)
+    try:
+        for step in sorted(self._param_snapshots):
+            self._set_x_(self._param_snapshots[step])
+            self.num_forwards = step
+
+            # snapshots that aren't frames were stored because loss improved, same as in ``forward``, only show_best images are kept
+            if self._image_budget is None or step in frame_steps: self.log_param_images()
+            else:
+                self._pending_best_images = []
+                self.log_param_images()
+                for args in self._pending_best_images: _submit_(self, _process_image_, self, step, *args)
+                self._pending_best_images = None
+    finally:
+        self._set_x_(x)
+        self.num_forwards = num_forwards
+        self._make_images = make_images
+        self._pending_best_images = None
+        self._param_snapshots.clear()
@@ -0,0 +1,69 @@
+"""peak memory and sizes of optimizer state and logger, logged at the end of a run"""
+import sys
+from collections.abc import Mapping
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+import torch
+
+if TYPE_CHECKING:
+    from ..benchmark import Benchmark
+
+_MB = 2**20
+
+def _tensor_bytes(obj: Any) -> int:
+    """total bytes of all tensors and arrays in possibly nested dicts, lists and tuples"""
+    if isinstance(obj, torch.Tensor): return obj.numel() * obj.element_size()
+    if isinstance(obj, np.ndarray): return obj.nbytes
+    if isinstance(obj, Mapping): return sum(_tensor_bytes(v) for v in obj.values())
+    if isinstance(obj, (list, tuple)): return sum(_tensor_bytes(v) for v in obj)
+    return 0
+
+def _reset_peak_rss():
+    """on linux peak RSS can be reset by writing 5 to clear_refs, elsewhere it is peak of the whole process"""
+    try:
+        with open("/proc/self/clear_refs", "w", encoding="utf8") as f: f.write("5")
+    except OSError:
+        pass
+
+def _peak_rss() -> int | None:
+    """peak resident set size in bytes since ``_reset_peak_rss``, or None if it can't be determined"""
+    try:
+        with open("/proc/self/status", encoding="utf8") as f:
+            for line in f:
+                if line.startswith("VmHWM:"): return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+
+    try: import resource
+    except ImportError: return None # windows
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+def _cuda_device(self: "Benchmark") -> torch.device | None:
+    if not torch.cuda.is_available(): return None
+    if self.device.type == 'cuda': return self.device
+    return torch.device('cuda', torch.cuda.current_device())
+
+def _reset_peaks_(self: "Benchmark"):
+    """called at the start of a run"""
+    if not self._memory_accounting: return
+    _reset_peak_rss()
+    device = _cuda_device(self)
+    if device is not None: torch.cuda.reset_peak_memory_stats(device)
+
+def _log_memory_(self: "Benchmark", optimizer: torch.optim.Optimizer | None):
+    """logs ``memory/*`` metrics in megabytes at the last step, called at the end of a run"""
+    if not self._memory_accounting: return
+
+    rss = _peak_rss()
+    if rss is not None: self.logger.log(self.num_forwards, "memory/peak rss", rss / _MB)
+
+    device = _cuda_device(self)
+    if device is not None: self.logger.log(self.num_forwards, "memory/peak cuda", torch.cuda.max_memory_allocated(device) / _MB)
+
+    if optimizer is not None:
+        self.logger.log(self.num_forwards, "memory/optimizer state", _tensor_bytes(list(optimizer.state.values())) / _MB)
+
+    # this is logged last so that it includes everything else
+    self.logger.log(self.num_forwards, "memory/logger", self.logger.nbytes() / _MB)
@@ -0,0 +1,81 @@
+"""parameter and gradient noise drawn into flat buffers"""
+from typing import TYPE_CHECKING
+
+import torch
+
+if TYPE_CHECKING:
+    from ..benchmark import Benchmark
+
+_PARAM = 0
+_GRAD = 1
+_STREAMS = ("param noise", "grad noise")
+
+def _group(tensors: list[torch.Tensor]) -> dict[tuple[torch.device, torch.dtype], list[torch.Tensor]]:
+    groups = {}
+    for t in tensors: groups.setdefault((t.device, t.dtype), []).append(t)
+    return groups
+
+def _fill_(self: "Benchmark", flat: torch.Tensor, kind: int, alpha: float):
+    """noise only depends on seed, ``kind``, number of steps, device and dtype"""
+    generator = self.step_rng(f"{_STREAMS[kind]}/{flat.device}/{flat.dtype}", flat.device)
+    flat.normal_(generator=generator).mul_(alpha)
+
+def _noise(self: "Benchmark", tensors: list[torch.Tensor], kind: int) -> tuple[list[torch.Tensor], list[torch.Tensor]]:
+    """returns ``(tensors, noise)`` where noise for each tensor is a view into a flat buffer, tensors are reordered
+    to group them by device and dtype. If noise is regenerated, buffers are temporary, otherwise they are filled by ``_update_noise_``,
+    or here if they don't exist yet."""
+    buffers = self._param_noise_buffers if kind == _PARAM else self._grad_noise_buffers
+    alpha = self._param_noise_alpha if kind == _PARAM else self._grad_noise_alpha
+
+    ordered = []; noise = []
+    for (device, dtype), group in _group(tensors).items():
+        numel = sum(t.numel() for t in group)
+
+        flat = None if self._regenerate_noise else buffers.get((device, dtype), None)
+        if flat is None or flat.numel() != numel:
+            flat = torch.empty(numel, device=device, dtype=dtype)
+            _fill_(self, flat, kind, alpha)
+            if not self._regenerate_noise: buffers[(device, dtype)] = flat
+
+        ordered.extend(group)
+        noise.extend(v.view_as(t) for v, t in zip(flat.split([t.numel() for t in group]), group))
+
+    return ordered, noise
+
+def _trainable(self: "Benchmark") -> list[torch.Tensor]:
+    return [p for p in self.parameters() if p.requires_grad]
+
+@torch.no_grad
+def _update_noise_(self: "Benchmark"):
+    """draws new noise for current ``_rng_step``, one RNG call per device and dtype. Does nothing if noise is regenerated"""
+    if self._regenerate_noise: return
+
+    for kind, alpha, buffers in ((_PARAM, self._param_noise_alpha, self._param_noise_buffers), (_GRAD, self._grad_noise_alpha, self._grad_noise_buffers)):
+        if alpha == 0: continue
+        for key, group in _group(_trainable(self)).items():
+            numel = sum(p.numel() for p in group)
+            flat = buffers.get(key, None)
+            if flat is None or flat.numel() != numel: flat = buffers[key] = torch.empty(numel, device=key[0], dtype=key[1])
+            _fill_(self, flat, kind, alpha)
+
+@torch.no_grad
+def _add_param_noise_(self: "Benchmark", sub: bool):
+    assert self.training and self._is_perturbed
+    if self._param_noise_alpha != 0:
+        params, noise = _noise(self, _trainable(self), _PARAM)
+        if sub: torch._foreach_sub_(params, noise)
+        else: torch._foreach_add_(params, noise)
+
+@torch.no_grad
+def _add_grad_noise_(self: "Benchmark"):
+    assert self.training
+    if self._grad_noise_alpha != 0:
+        # noise is generated for all parameters so that it doesn't depend on which ones have gradients
+        params, noise = _noise(self, _trainable(self), _GRAD)
+        grads = []; grad_noise = []
+        for p, n in zip(params, noise):
+            if p.grad is not None:
+                grads.append(p.grad)
+                grad_noise.append(n)
+
+        if len(grads) != 0: torch._foreach_add_(grads, grad_noise)
@@ -21,6 +21,9 @@ def _key_exists(logger, k:str, plot_perturbed: bool):
 
 
 def plot_trajectory(self: "Benchmark", cmap = 'coolwarm', loss_scale:Any = 'symlog', projector: Literal['pca'] | Any = 'pca', use_diff: bool = False, ax=None):
+    if self._trajectory is not None and len(self._trajectory) != 0:
+        return _plot_recorded_trajectory(self, cmap=cmap, loss_scale=loss_scale, projector=projector, use_diff=use_diff, ax=ax)
+
     if 'params' in self.logger: trajectory = self.logger.numpy('params') # n_points, n_dims
     elif 'projected' in self.logger: trajectory = self.logger.numpy('projected')
     else: raise RuntimeError("Either params or projections must be logged to plot trajectory")
@@ -66,6 +69,26 @@ def plot_trajectory(self: "Benchmark", cmap = 'coolwarm', loss_scale:Any = 'syml
 
     return ax
 
+def _plot_recorded_trajectory(self: "Benchmark", cmap, loss_scale, projector, use_diff: bool, ax):
+    """plots trajectory recorded by ``set_trajectory_recorder``, which is read from disk in chunks"""
+    from ._benchmark_trajectory import _project_trajectory
+    assert self._trajectory is not None
+    ndim = self._trajectory.width
+    trajectory, loss, projector = _project_trajectory(self, projector=projector, use_diff=use_diff)
+
+    if trajectory.shape[1] == 1: trajectory = np.concat([trajectory, trajectory], 1)
+    if ax is None: ax = plt.gca()
+    ax.scatter(x=trajectory[:,0], y=trajectory[:,1], alpha=0.4, s=4, c=loss, cmap=cmap, norm=loss_scale)
+
+    tgt = "params" if self._trajectory.subsample is None or self._trajectory.subsample >= self.ndim else f"{ndim} subsampled params"
+    if use_diff: tgt = f"{tgt} difference"
+
+    if ndim > 2: title = f"trajectory ({projector.__class__.__name__} on {tgt})"
+    else: title = f"trajectory ({tgt})"
+    ax.set_title(title)
+
+    return ax
+
 def plot_summary(
     self: "Benchmark",
     ylim: tuple[float, float] | Literal["auto"] | None,
@@ -80,7 +103,8 @@ def plot_summary(
     plot_keys = [k for k in self._plot_keys if _key_exists(self.logger, k, self._plot_perturbed)]
 
     n = len(image_keys) + len(plot_keys) + len(self._reference_images)
-    if 'params' in self.logger or 'projected' in self.logger: n += 1
+    has_trajectory = 'params' in self.logger or 'projected' in self.logger or (self._trajectory is not None and len(self._trajectory) != 0)
+    if has_trajectory: n += 1
 
     axes = make_axes(n, axsize=axsize, dpi=dpi, fig=fig)
     axes_iter = iter(axes)
@@ -111,7 +135,7 @@ def plot_summary(
             ax.set_ylabel(k)
 
     # -------------------------------- trajectory -------------------------------- #
-    if 'params' in self.logger or 'projected' in self.logger:
+    if has_trajectory:
         ax = next(axes_iter)
         plot_trajectory(self, ax=ax, loss_scale=yscale)
 
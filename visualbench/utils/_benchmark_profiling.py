@@ -0,0 +1,158 @@
+"""per-phase timing of benchmark steps"""
+import time
+import tracemalloc
+from collections import defaultdict
+from typing import TYPE_CHECKING
+
+import torch
+
+if TYPE_CHECKING:
+    from ..benchmark import Benchmark
+
+
+class _Phase:
+    __slots__ = ("profiler", "name", "absorb")
+    def __init__(self, profiler: "Profiler", name: str, absorb: bool):
+        self.profiler = profiler
+        self.name = name
+        self.absorb = absorb
+
+    def __enter__(self): self.profiler._enter(self.name, self.absorb)
+    def __exit__(self, *args): self.profiler._exit()
+
+
+class _NullPhase:
+    __slots__ = ()
+    def __enter__(self): pass
+    def __exit__(self, *args): pass
+
+_NULL_PHASE = _NullPhase()
+
+
+PHASE_CATEGORIES: dict[str, str] = {
+    "get_loss": "objective",
+    "backward": "objective",
+    "pre_step": "objective",
+    "optimizer": "optimizer",
+    "images": "framework",
+    "params": "framework",
+    "logging": "framework",
+    "test epoch": "framework",
+    "callbacks": "framework",
+    "checkpoint": "framework",
+}
+"""category of each phase, ``framework`` time is excluded from ``seconds`` metric"""
+
+class Profiler:
+    """Accumulates exclusive time spent in each phase, i.e. time of nested phases is not counted towards the parent phase.
+
+    If a phase is entered with ``absorb=True``, all phases nested in it are counted towards it.
+
+    Args:
+        enabled (bool): if False, ``phase`` returns a no-op context manager.
+        memory (bool): if True, also records peak python allocations via ``tracemalloc`` and peak CUDA memory per phase.
+    """
+    def __init__(self, enabled: bool = False, memory: bool = False):
+        self.enabled = enabled
+        self.memory = memory
+        self.clear()
+
+    def clear(self):
+        self.totals: defaultdict[str, float] = defaultdict(float)
+        """exclusive seconds spent in each phase"""
+        self.counts: defaultdict[str, int] = defaultdict(int)
+        """number of times each phase was entered"""
+        self.peak_memory: defaultdict[str, int] = defaultdict(int)
+        """peak bytes allocated in each phase (including nested phases), only if ``memory=True``"""
+        self.category_totals: dict[str, float] = {c: 0. for c in set(PHASE_CATEGORIES.values())}
+        """exclusive seconds spent in phases of each category from ``PHASE_CATEGORIES``"""
+
+        self._stack: list[str] = []
+        self._memory_start: list[int] = []
+        self._absorbing: int = 0
+        self._start: float = 0
+        self._phases: dict[tuple[str, bool], _Phase] = {}
+
+    def phase(self, name: str, absorb: bool = False) -> "_Phase | _NullPhase":
+        if not self.enabled: return _NULL_PHASE
+        key = (name, absorb)
+        if key not in self._phases: self._phases[key] = _Phase(self, name, absorb)
+        return self._phases[key]
+
+    def _enter(self, name: str, absorb: bool):
+        if self._absorbing > 0:
+            self._absorbing += 1
+            return
+
+        now = time.perf_counter()
+        if len(self._stack) != 0: self._add(self._stack[-1], now - self._start)
+        self._stack.append(name)
+        self._start = now
+        if absorb: self._absorbing = 1
+        if self.memory: self._memory_start.append(_current_memory())
+
+    def _exit(self):
+        if self._absorbing > 1:
+            self._absorbing -= 1
+            return
+
+        self._absorbing = 0
+        now = time.perf_counter()
+        name = self._stack.pop()
+        self._add(name, now - self._start)
+        self.counts[name] += 1
+        self._start = now
+        if self.memory:
+            peak = _peak_memory() - self._memory_start.pop()
+            if peak > self.peak_memory[name]: self.peak_memory[name] = peak
+
+    def _add(self, name: str, seconds: float):
+        self.totals[name] += seconds
+        category = PHASE_CATEGORIES.get(name, None)
+        if category is not None: self.category_totals[category] += seconds
+
+    def table(self) -> str:
+        """returns a table with time spent in each phase, sorted by total time"""
+        total = sum(self.totals.values())
+        rows = [("phase", "total (s)", "%", "calls", "per call (ms)")]
+        if self.memory: rows[0] = (*rows[0], "peak memory (MB)")
+
+        for name, t in sorted(self.totals.items(), key=lambda x: x[1], reverse=True):
+            n = self.counts[name]
+            row = (name, f"{t:.4f}", f"{100 * t / total:.1f}" if total > 0 else "0", str(n), f"{1000 * t / max(n, 1):.4f}")
+            if self.memory: row = (*row, f"{self.peak_memory[name] / 2**20:.2f}")
+            rows.append(row)
+
+        widths = [max(len(r[i]) for r in rows) for i in range(len(rows[0]))]
+        return "\n".join("  ".join(v.ljust(w) for v, w in zip(r, widths)) for r in rows)
+
+
+def _current_memory() -> int:
+    """starts tracemalloc if needed, resets peaks, returns current allocated bytes"""
+    if not tracemalloc.is_tracing(): tracemalloc.start()
+    tracemalloc.reset_peak()
+    memory = tracemalloc.get_traced_memory()[0]
+    if torch.cuda.is_available():
+        torch.cuda.reset_peak_memory_stats()
+        memory += torch.cuda.memory_allocated()
+    return memory
+
+def _peak_memory() -> int:
+    memory = tracemalloc.get_traced_memory()[1]
+    if torch.cuda.is_available(): memory += torch.cuda.max_memory_allocated()
+    return memory
+
+
+def _category_seconds(self: "Benchmark", category: str) -> float:
+    """seconds spent in phases of ``category`` since timer has been started"""
+    if self.start_time is None: return 0
+    return self._profiler.category_totals[category] - self._category_totals_at_start[category]
+
+def _start_timer_(self: "Benchmark"):
+    self.start_time = time.time()
+    self._category_totals_at_start = self._profiler.category_totals.copy()
+
+def _log_profiling_(self: "Benchmark"):
+    """logs cumulative time spent in each phase"""
+    for name, t in self._profiler.totals.items():
+        self.logger.log(self.num_forwards, f"time/{name}", t)
@@ -0,0 +1,111 @@
+"""random projections of parameter vectors for plotting trajectories"""
+from typing import TYPE_CHECKING, Literal
+
+import torch
+
+if TYPE_CHECKING:
+    from ..benchmark import Benchmark
+
+ProjectionEngine = Literal['bernoulli', 'sparse', 'srht', 'seeded']
+
+
+class BernoulliProjection:
+    """dense basis of pairs of complementary bernoulli masks, uses O(k·ndim) memory and time"""
+    def __init__(self, ndim: int, num_projections: int, generator: torch.Generator | None, device, dtype):
+        basis_vecs = []
+        while len(basis_vecs) < num_projections:
+            projections = torch.ones((2, ndim), dtype = torch.bool, device = device)
+            projections[0] = torch.bernoulli(projections[0].float(), p = 0.5, generator = generator).to(dtype = torch.bool)
+            projections[1] = ~projections[0]
+            basis_vecs.extend(projections.unbind(0))
+
+        self.basis = torch.stack(basis_vecs).to(device=device, dtype=dtype)
+
+    def __call__(self, x: torch.Tensor) -> torch.Tensor:
+        return self.basis @ x
+
+
+class SparseSignProjection:
+    """CountSketch, each coordinate is added with a random sign to one randomly chosen projection,
+    uses O(ndim) memory and time"""
+    def __init__(self, ndim: int, num_projections: int, generator: torch.Generator | None, device, dtype):
+        self.num_projections = num_projections
+        self.bucket = torch.randint(0, num_projections, (ndim,), generator=generator, device=device, dtype=torch.int64)
+        self.sign = torch.randint(0, 2, (ndim,), generator=generator, device=device).mul_(2).sub_(1).to(dtype)
+
+    def __call__(self, x: torch.Tensor) -> torch.Tensor:
+        return torch.zeros(self.num_projections, device=x.device, dtype=x.dtype).index_add_(0, self.bucket, x * self.sign)
+
+
+def _hadamard(size: int, device, dtype) -> torch.Tensor:
+    H = torch.ones((1, 1), device=device, dtype=dtype)
+    while H.shape[0] < size: H = torch.cat([torch.cat([H, H], 1), torch.cat([H, -H], 1)], 0)
+    return H
+
+def _fwht(x: torch.Tensor, block: int = 16) -> torch.Tensor:
+    """unnormalized fast Walsh-Hadamard transform of a vector whose length is a power of 2.
+    Levels of the butterfly are applied ``log2(block)`` at a time as a matmul with ``block x block`` Hadamard matrix."""
+    n = x.numel()
+    h = 1
+    while h < n:
+        size = min(block, n // h)
+        x = torch.matmul(_hadamard(size, x.device, x.dtype), x.view(-1, size, h))
+        h *= size
+    return x.view(n)
+
+class SRHTProjection:
+    """subsampled randomized Hadamard transform, random signs followed by Walsh-Hadamard transform
+    and selecting random rows, uses O(ndim) memory and O(ndim·log(ndim)) time"""
+    def __init__(self, ndim: int, num_projections: int, generator: torch.Generator | None, device, dtype):
+        self.ndim = ndim
+        self.size = 1 << max(ndim - 1, 0).bit_length()
+        self.sign = torch.randint(0, 2, (ndim,), generator=generator, device=device).mul_(2).sub_(1).to(dtype)
+        self.rows = torch.randperm(self.size, generator=generator, device=device)[:num_projections]
+
+    def __call__(self, x: torch.Tensor) -> torch.Tensor:
+        padded = torch.zeros(self.size, device=x.device, dtype=x.dtype)
+        padded[:self.ndim] = x * self.sign
+        return _fwht(padded)[self.rows]
+
+
+def _random_signs(rows: int, cols: int, generator: torch.Generator, dtype) -> torch.Tensor:
+    """random ±1 matrix, each random int64 gives 64 signs which is faster than generating each one"""
+    words = torch.randint(-2**63, 2**63-1, (rows, -(-cols // 64)), generator=generator, device=generator.device, dtype=torch.int64)
+    shifts = torch.arange(64, device=generator.device)
+    bits = (words.unsqueeze(-1) >> shifts).bitwise_and_(1).view(rows, -1)[:, :cols]
+    return bits.to(dtype).mul_(2).sub_(1)
+
+class SeededProjection:
+    """random sign basis which is regenerated from a fixed seed in chunks on every call and never stored,
+    uses O(chunk_size) memory and O(k·ndim) time"""
+    def __init__(self, ndim: int, num_projections: int, seed: int, chunk_size: int = 2**20):
+        self.ndim = ndim
+        self.num_projections = num_projections
+        self.seed = seed
+        self.chunk_size = chunk_size
+
+    def __call__(self, x: torch.Tensor) -> torch.Tensor:
+        generator = torch.Generator(x.device).manual_seed(self.seed)
+        projected = torch.zeros(self.num_projections, device=x.device, dtype=x.dtype)
+        step = max(self.chunk_size // self.num_projections, 1)
+        for start in range(0, self.ndim, step):
+            chunk = x[start:start+step]
+            projected.add_(_random_signs(self.num_projections, chunk.numel(), generator, x.dtype) @ chunk)
+        return projected
+
+
+def _project_(self: "Benchmark", param_vec: torch.Tensor) -> torch.Tensor:
+    """projects ``param_vec``, creates projection on first call"""
+    if self._projector is None:
+        ndim = param_vec.numel()
+        k = self._num_projections
+        engine = self._projection_engine
+        generator = self.rng.torch(param_vec.device)
+
+        if engine == 'bernoulli': self._projector = BernoulliProjection(ndim, k, generator, param_vec.device, param_vec.dtype)
+        elif engine == 'sparse': self._projector = SparseSignProjection(ndim, k, generator, param_vec.device, param_vec.dtype)
+        elif engine == 'srht': self._projector = SRHTProjection(ndim, k, generator, param_vec.device, param_vec.dtype)
+        elif engine == 'seeded': self._projector = SeededProjection(ndim, k, seed=self.rng.random.getrandbits(63))
+        else: raise ValueError(f"unknown projection engine {engine}")
+
+    return self._projector(param_vec)
@@ -0,0 +1,84 @@
+"""running test epochs on a copy of the benchmark on a background thread"""
+import copy
+import time
+from typing import TYPE_CHECKING
+
+import torch
+
+if TYPE_CHECKING:
+    from ..benchmark import Benchmark
+
+
+def _make_shadow(self: "Benchmark") -> "Benchmark":
+    """copy of the benchmark which shares dataloaders, logger, best states and initial state dict with this one"""
+    memo = {id(self._dltrain): self._dltrain, id(self._dltest): self._dltest, id(self.logger): self.logger, id(self._best_states): self._best_states}
+    if self._initial_state_dict is not None: memo[id(self._initial_state_dict)] = self._initial_state_dict
+    worker, self._test_worker = self._test_worker, None
+    memo[id(self._test_shadow)] = []
+    try: shadow = copy.deepcopy(self, memo)
+    finally: self._test_worker = worker
+
+    shadow._image_worker = None
+    shadow._trajectory = None
+    shadow._print_interval_s = None
+    shadow._profiling = shadow._exclude_overhead = False
+    shadow._update_profiler()
+    return shadow
+
+@torch.no_grad
+def _copy_state_(self: "Benchmark") -> bool:
+    """copies parameters and buffers into the shadow copy, returns False if shadow has to be recreated"""
+    src = self.state_dict(keep_vars=True)
+    dst = self._test_shadow[0].state_dict(keep_vars=True)
+    if src.keys() != dst.keys(): return False
+
+    src_list = []; dst_list = []
+    for k, v in src.items():
+        d = dst[k]
+        if not (isinstance(v, torch.Tensor) and isinstance(d, torch.Tensor)): return False
+        if v.shape != d.shape or v.dtype != d.dtype or v.device != d.device: return False
+        src_list.append(v.data); dst_list.append(d.data)
+
+    if len(dst_list) != 0: torch._foreach_copy_(dst_list, src_list)
+    return True
+
+def _submit_test_epoch_(self: "Benchmark"):
+    """snapshots parameters and buffers into the shadow copy and runs test epoch on it on a background thread,
+    metrics are logged at current step. Waits for previous test epoch to finish first since it uses the same copy."""
+    assert self._test_worker is not None
+    self._test_worker.join()
+
+    if len(self._test_shadow) == 0 or not _copy_state_(self):
+        self._test_shadow = [_make_shadow(self)]
+
+    shadow = self._test_shadow[0]
+    shadow.logger = self.logger
+    shadow.num_forwards = self.num_forwards
+    shadow.num_steps = self.num_steps
+    shadow.num_epochs = self.num_epochs
+    shadow._rng_step = self._rng_step
+    self._last_test_time = time.time()
+
+    # on CUDA test epoch runs on a separate stream which waits for the copy
+    event = stream = None
+    if self.device.type == 'cuda':
+        event = torch.cuda.Event()
+        event.record()
+        stream = torch.cuda.Stream(self.device)
+
+    self._test_worker.submit(_run_test_epoch_, self, shadow, stream, event)
+
+def _run_test_epoch_(self: "Benchmark", shadow: "Benchmark", stream: "torch.cuda.Stream | None", event: "torch.cuda.Event | None"):
+    if stream is None: shadow._test_epoch()
+    else:
+        assert event is not None
+        with torch.cuda.stream(stream):
+            stream.wait_event(event)
+            shadow._test_epoch()
+        stream.synchronize()
+
+    self._last_test_loss = shadow._last_test_loss
+
+def _join_tests_(self: "Benchmark"):
+    """waits for test epoch running on background thread if there is one"""
+    if self._test_worker is not None: self._test_worker.join()
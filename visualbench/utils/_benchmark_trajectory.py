@@ -0,0 +1,158 @@
+"""recording parameter trajectories to a memory-mapped file on disk"""
+import os
+import tempfile
+import weakref
+from collections.abc import Iterator
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+import torch
+
+if TYPE_CHECKING:
+    from ..benchmark import Benchmark
+
+
+def _remove(path: str):
+    if os.path.exists(path): os.remove(path)
+
+class TrajectoryRecorder:
+    """Streams parameter vectors to a memory-mapped array on disk, so that trajectories of models with
+    millions of parameters can be stored without keeping them in memory.
+
+    Args:
+        dtype (Any): dtype of stored values, float16 halves the size.
+        stride (int): records every ``stride``-th vector passed to ``record``.
+        subsample (int | None): if not None, only stores this many randomly chosen coordinates.
+        directory (str | None): directory for the file, if None uses default temporary directory.
+        seed (int): seed for choosing subsampled coordinates.
+    """
+    def __init__(self, dtype: Any = np.float16, stride: int = 1, subsample: int | None = None, directory: str | None = None, seed: int = 0):
+        self.dtype = np.dtype(dtype)
+        self.stride = stride
+        self.subsample = subsample
+        self.directory = directory
+        self.seed = seed
+        self.clear()
+
+    def __deepcopy__(self, memo):
+        # copies record to their own files
+        return TrajectoryRecorder(dtype=self.dtype, stride=self.stride, subsample=self.subsample, directory=self.directory, seed=self.seed)
+
+    def clear(self):
+        """removes the file and all recorded vectors"""
+        if getattr(self, "_finalizer", None) is not None: self._finalizer() # pylint:disable=not-callable
+        self._finalizer = None
+        self.path: str | None = None
+        self._array: np.memmap | None = None
+        self._steps = np.empty(0, dtype=np.int64)
+        self._indices: torch.Tensor | None = None
+        self._num_calls = 0
+        self._n = 0
+
+    def __len__(self): return self._n
+
+    @property
+    def width(self) -> int:
+        assert self._array is not None
+        return self._array.shape[1]
+
+    def _open(self, ndim: int, capacity: int = 256):
+        if self.subsample is not None and self.subsample < ndim:
+            generator = torch.Generator().manual_seed(self.seed)
+            self._indices = torch.randperm(ndim, generator=generator)[:self.subsample].sort()[0]
+            ndim = self.subsample
+
+        fd, self.path = tempfile.mkstemp(suffix='.trajectory', dir=self.directory)
+        os.close(fd)
+        self._finalizer = weakref.finalize(self, _remove, self.path)
+        self._resize(capacity, ndim)
+
+    def _resize(self, capacity: int, width: int):
+        assert self.path is not None
+        if self._array is not None: self._array.flush()
+        with open(self.path, 'r+b') as f: f.truncate(capacity * width * self.dtype.itemsize)
+        self._array = np.memmap(self.path, dtype=self.dtype, mode='r+', shape=(capacity, width))
+        steps = np.empty(capacity, dtype=np.int64); steps[:self._n] = self._steps[:self._n]
+        self._steps = steps
+
+    @torch.no_grad
+    def record(self, step: int, vec: torch.Tensor):
+        """appends ``vec`` if this is a ``stride``-th call"""
+        self._num_calls += 1
+        if (self._num_calls - 1) % self.stride != 0: return
+
+        if self._array is None: self._open(vec.numel())
+        assert self._array is not None
+        if self._n == len(self._array): self._resize(len(self._array) * 2, self.width)
+
+        if self._indices is not None:
+            if self._indices.device != vec.device: self._indices = self._indices.to(vec.device)
+            vec = vec[self._indices]
+
+        self._array[self._n] = vec.detach().float().cpu().numpy()
+        self._steps[self._n] = step
+        self._n += 1
+
+    def steps(self) -> np.ndarray:
+        return self._steps[:self._n].copy()
+
+    def rows(self, start: int = 0, stop: int | None = None) -> np.ndarray:
+        """reads rows as float32 array"""
+        assert self._array is not None
+        if stop is None: stop = self._n
+        return np.asarray(self._array[start:min(stop, self._n)], dtype=np.float32)
+
+    def chunks(self, max_elements: int = 2**24, min_rows: int = 1) -> Iterator[np.ndarray]:
+        """iterates over rows in chunks of at most ``max_elements`` elements, each chunk has at least ``min_rows`` rows"""
+        rows = max(max_elements // max(self.width, 1), min_rows)
+        num_chunks = max(self._n // rows, 1)
+        for idxs in np.array_split(np.arange(self._n), num_chunks):
+            if len(idxs) != 0: yield self.rows(idxs[0], idxs[-1] + 1)
+
+    def closest(self, step: int) -> np.ndarray:
+        """returns vector recorded closest to ``step``"""
+        if self._n == 0: raise RuntimeError("nothing was recorded")
+        steps = self._steps[:self._n]
+        idx = int(np.searchsorted(steps, step))
+        if idx == self._n or (idx != 0 and step - steps[idx-1] <= steps[idx] - step): idx -= 1
+        return self.rows(idx, idx+1)[0]
+
+
+def _project_trajectory(self: "Benchmark", projector: Any, use_diff: bool) -> tuple[np.ndarray, np.ndarray, Any]:
+    """reduces recorded trajectory to 2D, returns ``(trajectory, loss, projector)``.
+    With ``projector='pca'`` this uses incremental PCA which reads the file in chunks."""
+    recorder = self._trajectory
+    assert recorder is not None
+
+    loss = np.asarray([self.logger.closest('train loss', int(s)) for s in recorder.steps()], dtype=np.float64)
+    mask = np.isfinite(loss)
+
+    def iterate(diff: bool):
+        previous = None
+        for chunk in recorder.chunks(min_rows=3):
+            chunk = np.nan_to_num(chunk, nan=0, posinf=0, neginf=0)
+            if diff:
+                # np.gradient along first axis chunk by chunk, last row of each chunk uses one-sided difference
+                full = chunk if previous is None else np.concatenate([previous, chunk])
+                grad = np.gradient(full, axis=0) if len(full) > 1 else np.zeros_like(full)
+                if previous is not None: grad = grad[1:]
+                previous = chunk[-1:]
+                chunk = grad
+            yield chunk
+
+    if recorder.width <= 2: return np.concatenate(list(iterate(False)))[mask], loss[mask], projector
+
+    if projector == 'pca':
+        from sklearn.decomposition import IncrementalPCA
+        projector = IncrementalPCA(n_components=2)
+        if len(recorder) < 2: projector.n_components = 1
+        for chunk in iterate(use_diff): projector.partial_fit(chunk)
+
+    else:
+        trajectory = np.concatenate(list(iterate(use_diff)))
+        projector.fit(trajectory, loss)
+
+    # projector is applied to same rows it was fitted on, differences are summed back into a path
+    trajectory = np.concatenate([projector.transform(chunk) for chunk in iterate(use_diff)])
+    if use_diff: trajectory = np.cumsum(trajectory, axis=0)
+    return trajectory[mask], loss[mask], projector
@@ -7,7 +7,9 @@ import time
 import numpy as np
 import torch
 
+from ._benchmark_projections import _project_
 from .python_tools import format_number
+from .torch_tools import copy_state_dict
 
 if TYPE_CHECKING:
     from ..benchmark import Benchmark
@@ -73,6 +75,11 @@ def _grad_params_to_vec(params: Iterable[torch.Tensor]):
     if isinstance(params, torch.Tensor): raise RuntimeError("got a tensor")
     return torch.cat([p.ravel() for p in params if p.requires_grad])
 
+def _params_to_vec(self: "Benchmark") -> torch.Tensor:
+    """vector of trainable parameters, in flat params mode this is a view of parameter storage and not a copy"""
+    if self._flat_params: return self.flat_params()
+    return _grad_params_to_vec(self.parameters()).detach()
+
 @torch.no_grad
 def _log_params_and_projections_(self: "Benchmark") -> None:
     """conditionally logs parameters and projections if that is enabled, all in one function to reuse parameter_to_vector
@@ -81,82 +88,92 @@ def _log_params_and_projections_(self: "Benchmark") -> None:
     if self._is_perturbed or self._benchmark_mode: return
     param_vec = None
 
+    # ------------------------- record to memory-mapped file ------------------------ #
+    # this replaces logging parameter vectors to the logger
+    if self._trajectory is not None:
+        param_vec = _params_to_vec(self)
+        self._trajectory.record(self.num_forwards, param_vec)
+
     # --------------------------- log parameter vectors -------------------------- #
-    if self._log_params is None:
-        if param_vec is None: param_vec = _grad_params_to_vec(self.parameters()).detach()
+    elif self._log_params is None:
+        if param_vec is None: param_vec = _params_to_vec(self)
         if param_vec.numel() < 1000: self._log_params = True
         else: self._log_params = False
 
-    if self._log_params:
-        param_vec = _grad_params_to_vec(self.parameters()).detach()
-        self.logger.log(self.num_forwards, 'params', param_vec.cpu())
+    if self._log_params and self._trajectory is None:
+        if param_vec is None: param_vec = _params_to_vec(self)
+        # flat vector is a view so it has to be copied
+        self.logger.log(self.num_forwards, 'params', param_vec.to('cpu', copy=True) if self._flat_params else param_vec.cpu())
 
     # ------------------------------ log projections ----------------------------- #
     if self._num_projections != 0:
-        if param_vec is None: param_vec = _grad_params_to_vec(self.parameters()).detach()
-
-        # create projections if they are none, one is a bernoulli vector and the other one is the inverse
-        if self._basis is None:
-            basis_vecs = []
-            while len(basis_vecs) < self._num_projections:
-                projections = torch.ones((2, param_vec.numel()), dtype = torch.bool, device = param_vec.device)
-                projections[0] = torch.bernoulli(
-                    projections[0].float(), p = 0.5, generator = self.rng.torch(param_vec.device),
-                ).to(dtype = torch.bool, device = param_vec.device)
-
-                projections[1] = ~projections[0]
-                basis_vecs.extend(projections.unbind(0))
+        if param_vec is None: param_vec = _params_to_vec(self)
 
-            self._basis = torch.stack(basis_vecs).to(param_vec)
-
-        # log projections
-        projected = self._basis @ param_vec
+        # projection is created on first call and reused
+        projected = _project_(self, param_vec)
         self.logger.log(self.num_forwards, 'projected', projected.cpu())
 
 @torch.no_grad
-def _update_noise_(self: "Benchmark"):
-    if self._param_noise_alpha != 0:
-        for i,p in enumerate(self.parameters()):
-            if not p.requires_grad: continue
-            k = f"_param_noise_{i}"
-            v = torch.randn(p.shape, device=p.device, dtype=p.dtype, generator=self.rng.torch(p.device)) * self._param_noise_alpha
-            if not hasattr(self, k): self.register_buffer(k, v)
-            else: getattr(self, k).set_(v)
-
-    if self._grad_noise_alpha != 0:
-        for i,p in enumerate(self.parameters()):
-            if not p.requires_grad: continue
-            k = f"_grad_noise_{i}"
-            v = torch.randn(p.shape, device=p.device, dtype=p.dtype, generator=self.rng.torch(p.device)) * self._grad_noise_alpha
-            if not hasattr(self, k): self.register_buffer(k, v)
-            else: getattr(self, k).set_(v)
+def _defer_metric_(self: "Benchmark", metric: str, value: torch.Tensor):
+    """writes scalar ``value`` into on-device buffer for ``metric``, flushes all buffers when it is full"""
+    assert self._deferred_chunk_size is not None
+    if metric not in self._deferred_metrics:
+        buffer = torch.empty(self._deferred_chunk_size, device=value.device, dtype=value.dtype)
+        self._deferred_metrics[metric] = (buffer, [])
+
+    buffer, steps = self._deferred_metrics[metric]
+    buffer[len(steps)] = value.detach().reshape(())
+    steps.append(self.num_forwards)
+    if len(steps) >= len(buffer): _flush_deferred_metrics_(self)
+
+@torch.no_grad
+def _flush_deferred_metrics_(self: "Benchmark"):
+    """moves all values from on-device buffers to the logger, one device->host copy per metric"""
+    for metric, (buffer, steps) in self._deferred_metrics.items():
+        if len(steps) == 0: continue
+        values = buffer[:len(steps)].tolist()
+        for step, value in zip(steps, values): self.logger.log(step, metric, value)
+        if metric == 'train loss': self._last_train_loss = values[-1]
+        steps.clear()
+
+    # best images and snapshots tracked on device are committed at the same time
+    from ._benchmark_images import _resolve_best_ # circular import
+    _resolve_best_(self)
 
 @torch.no_grad
-def _add_param_noise_(self: "Benchmark", sub: bool):
-    assert self.training and self._is_perturbed
-    if self._param_noise_alpha != 0:
-        noise = []
-        params = tuple(self.parameters())
-        for i,p in enumerate(params):
-            if not p.requires_grad: continue
-            noise.append(getattr(self, f"_param_noise_{i}"))
-
-        if sub: torch._foreach_sub_(params, noise)
-        else: torch._foreach_add_(params, noise)
+def _store_initial_state_dict_(self: "Benchmark"):
+    """stores a copy of the state dict on the same device so that ``reset`` can restore it in place"""
+    self._initial_state_dict = copy_state_dict(self.state_dict())
 
 @torch.no_grad
-def _add_grad_noise_(self: "Benchmark"):
-    assert self.training
-    if self._grad_noise_alpha != 0:
-        noise = []
-        params = tuple(self.parameters())
-        grads = []
-        for i,p in enumerate(params):
-            if p.grad is not None:
-                grads.append(p.grad)
-                noise.append(getattr(self, f"_grad_noise_{i}"))
-
-        torch._foreach_add_(grads, noise)
+def _restore_initial_state_dict_(self: "Benchmark"):
+    """copies initial state dict into existing parameters and buffers with a single ``_foreach_copy_``,
+    if something changed their shapes, dtypes or devices, falls back to ``load_state_dict``"""
+    initial = self._initial_state_dict
+    assert initial is not None
+    state = self.state_dict(keep_vars=True)
+
+    dst = []; src = []
+    inplace = state.keys() == initial.keys()
+    if inplace:
+        for k, v in state.items():
+            init = initial[k]
+            if not (isinstance(v, torch.Tensor) and isinstance(init, torch.Tensor)) or \
+                v.shape != init.shape or v.dtype != init.dtype or v.device != init.device:
+                inplace = False
+                break
+            dst.append(v.data); src.append(init)
+
+    if not inplace:
+        self.load_state_dict(copy_state_dict(initial, device=self.device), assign=True)
+        return
+
+    if len(dst) != 0: torch._foreach_copy_(dst, src)
+
+    # parameters are the same objects so gradients have to be cleared
+    if self._flat_params and self._flat_grad is not None: self._flat_grad.zero_()
+    else:
+        for p in self.parameters(): p.grad = None
 
 def _ensure_stop_criteria_exists_(self) -> None:
     """warns if no stopping criteria is specified (another one is KeyboardInterrupt)"""
@@ -200,9 +217,11 @@ def _should_run_test_epoch(self: "Benchmark", check_dltest:bool=True) -> bool:
 @torch.no_grad
 def _aggregate_test_metrics_(self: "Benchmark"):
     """Log test metric means into the logger and clear self._test_*_metrics"""
+    from ._benchmark_best import _update_best_ # circular import
     # mean test scalar metrics
     for k,v in self._test_scalar_metrics.items():
         self.logger.log(self.num_forwards, k, np.mean(v))
+        if k in self._best_states: _update_best_(self, k, np.mean(v))
     self._test_scalar_metrics.clear()
 
     # other metrics like images
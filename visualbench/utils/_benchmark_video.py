@@ -143,12 +143,20 @@ def _render(self: "Benchmark", file: str, fps: int = 60, scale: int | float = 1,
     lowest_images = {}
     length = max(len(v) for v in self.logger.values())
 
+    # with image budget images are only logged on frame steps
+    budget = self._image_budget is not None
+    frame_steps = set(self._frame_steps)
+
     # initialize all keys
     for key, value in self.logger.items():
         if key in self._image_keys:
             if (not self._plot_perturbed) and key.endswith(' (perturbed)'): continue
+            if len(value) != 0: _check_image(next(iter(value.values())))
+            if budget:
+                logger_images[key] = value
+                continue
+
             images_list = logger_images[key] = list(value.values())
-            if len(images_list) != 0: _check_image(images_list[0])
             assert _isclose(len(logger_images[key]), length), f'images must be logged on all steps, "{key}" was logged {len(logger_images[key])} times, expected {length} times'
             while len(logger_images[key]) < length:
                 logger_images[key].append(logger_images[key][-1])
@@ -156,7 +164,7 @@ def _render(self: "Benchmark", file: str, fps: int = 60, scale: int | float = 1,
                 logger_images[key] = logger_images[key][:-1]
 
         if key in self._image_lowest_keys:
-            lowest_images[key] = logger_images[key][0]
+            lowest_images[key] = self.logger.first(key) if budget else logger_images[key][0]
 
 
     for key, value in self._reference_images.items():
@@ -170,26 +178,29 @@ def _render(self: "Benchmark", file: str, fps: int = 60, scale: int | float = 1,
     with OpenCVRenderer(file, fps = fps, scale=1) as renderer:
         lowest_loss = float('inf')
 
-        for step, loss in enumerate(_maybe_progress(list(self.logger['train loss'].values()), enable=progress)):
-            # add current and best image
-            images: dict[str, np.ndarray | torch.Tensor] = {}
-
-            # add reference image
-            for k, image in self._reference_images.items():
-                images[k] = image
-
+        train_loss = self.logger['train loss']
+        for i, (step, loss) in enumerate(_maybe_progress(train_loss.items(), enable=progress)):
             # check if new params are better
             if loss <= lowest_loss:
                 lowest_loss = loss
 
-                # set to new best images
+                # set to new best images, with image budget they are logged on each step where loss improved
                 for key in lowest_images:
                     if key in logger_images:
-                        lowest_images[key] = logger_images[key][step]
+                        lowest_images[key] = self.logger.closest(key, step) if budget else logger_images[key][i]
+
+            if budget and step not in frame_steps: continue
+
+            # add current and best image
+            images: dict[str, np.ndarray | torch.Tensor] = {}
+
+            # add reference image
+            for k, image in self._reference_images.items():
+                images[k] = image
 
             # add logger images
             for key, value in logger_images.items():
-                images[key] = value[step]
+                images[key] = self.logger.closest(key, step) if budget else value[i]
 
             # add best images
             for key, image in lowest_images.items():
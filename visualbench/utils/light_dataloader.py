@@ -15,6 +15,8 @@ from typing import Any, Generic, Protocol, TypeVar, Union
 import numpy as np
 import torch
 
+from ..rng import stream_seed
+
 __all__ = ["TensorDataLoader", "LightDataLoader"]
 # ----------------------------------- types ---------------------------------- #
 _T_co = TypeVar("_T_co", covariant=True)
@@ -56,6 +58,7 @@ class TensorDataLoader(Generic[_TensorOrTuple]):
                 It is slightly slower on my laptop, but much faster on Google Colab (default: False).
             seed (int | torch.Generator | None, optional):
                 seed for shuffling, set to None to let pytorch use a random seed.
+                If int, permutation of each epoch is derived from `(seed, epoch)`, so it doesn't depend on other random calls.
                 Can also be a torch.Generator, but make sure it is on the same device as `data`. Defaults to None.
         """
 
@@ -67,11 +70,17 @@ class TensorDataLoader(Generic[_TensorOrTuple]):
         self._istensor = isinstance(self.data, torch.Tensor)
         self.device = self.data.device if isinstance(self.data, torch.Tensor) else self.data[0].device
 
+        self.epoch = 0
+        """number of started epochs"""
         self.seed = seed
         if isinstance(self.seed, torch.Generator): self.generator = self.seed
         elif seed is not None: self.generator = torch.Generator(self.device).manual_seed(seed)
         else: self.generator = None
 
+    def _permutation(self, epoch: int) -> torch.Tensor:
+        if isinstance(self.seed, int): self.generator.manual_seed(stream_seed(self.seed, "shuffle", epoch)) # type:ignore
+        return torch.randperm(self.data_length(), generator = self.generator, device = self.device)
+
     def data_length(self):
         ref = self.data if self._istensor else self.data[0]
         return ref.size(0)
@@ -79,22 +88,24 @@ class TensorDataLoader(Generic[_TensorOrTuple]):
     def __len__(self):
         return math.ceil(self.data_length() / self.batch_size)
 
-    def _fast_iter(self) -> Generator[_TensorOrTuple, None, None]:
+    def _fast_iter(self, epoch: int) -> Generator[_TensorOrTuple, None, None]:
+        # shuffle a copy so that order of each epoch only depends on its own permutation
+        data = self.data
         if self.shuffle:
-            idxs = torch.randperm(self.data_length(), generator = self.generator, device = self.device)
+            idxs = self._permutation(epoch)
             if self._istensor:
-                self.data = torch.index_select(self.data, 0, idxs)
+                data = torch.index_select(self.data, 0, idxs) # type:ignore
             else:
-                self.data = [torch.index_select(i, 0, idxs) for i in self.data]
+                data = [torch.index_select(i, 0, idxs) for i in self.data]
 
         if self._istensor:
-            yield from self.data.split(self.batch_size)
+            yield from data.split(self.batch_size) # type:ignore
         else:
-            yield from zip(*(i.split(self.batch_size) for i in self.data))
+            yield from zip(*(i.split(self.batch_size) for i in data))
 
-    def _memory_efficient_iter(self) -> Generator[_TensorOrTuple, None, None]:
+    def _memory_efficient_iter(self, epoch: int) -> Generator[_TensorOrTuple, None, None]:
         if self.shuffle:
-            idxs = torch.randperm(self.data_length(), generator = self.generator, device = self.device)
+            idxs = self._permutation(epoch)
 
             for batch_indices in idxs.split(self.batch_size):
                 if self._istensor:
@@ -109,8 +120,10 @@ class TensorDataLoader(Generic[_TensorOrTuple]):
                 yield from zip(*(i.split(self.batch_size) for i in self.data))
 
     def __iter__(self) -> Generator[_TensorOrTuple, None, None]:
-        if self.memory_efficient: return self._memory_efficient_iter()
-        return self._fast_iter()
+        epoch = self.epoch
+        self.epoch += 1
+        if self.memory_efficient: return self._memory_efficient_iter(epoch)
+        return self._fast_iter(epoch)
 
 # ----------------------------- light dataloader ----------------------------- #
 class _SupportsLenAndGetitems(Protocol[_T_co]):
@@ -141,6 +154,7 @@ class LightDataLoader(Generic[_SampleOrTuple]):
             shuffle (bool, optional): set to True to have the data reshuffled at every epoch (default: False).
             seed (int | np.random.Generator | None, optional):
                 seed for shuffling, set to None to let numpy use a random seed.
+                If int, permutation of each epoch is derived from `(seed, epoch)`, so it doesn't depend on other random calls.
                 Can also be a numpy.random.Generator. Defaults to None.
         """
         self.data: _SupportsLenAndGetitem[_SampleOrTuple] = data
@@ -149,6 +163,8 @@ class LightDataLoader(Generic[_SampleOrTuple]):
 
         self._use_getitems = hasattr(self.data, "__getitems__")
 
+        self.epoch = 0
+        """number of started epochs"""
         self.seed = seed
         if isinstance(self.seed, np.random.Generator): self.generator = self.seed
         else: self.generator = np.random.default_rng(seed)
@@ -157,8 +173,15 @@ class LightDataLoader(Generic[_SampleOrTuple]):
         return math.ceil(len(self.data) / self.batch_size)
 
     def __iter__(self) -> Generator[_SampleOrTuple, None, None]:
+        epoch = self.epoch
+        self.epoch += 1
+        return self._iter(epoch)
+
+    def _iter(self, epoch: int) -> Generator[_SampleOrTuple, None, None]:
+        generator = self.generator
+        if isinstance(self.seed, int): generator = np.random.Generator(np.random.Philox(key=stream_seed(self.seed, "shuffle", epoch)))
 
-        if self.shuffle: indices = self.generator.permutation(len(self.data))
+        if self.shuffle: indices = generator.permutation(len(self.data))
         else: indices = range(len(self.data))
 
         for batch_indices in batched(indices, self.batch_size):